@@ -0,0 +1,26 @@
+"""document ingest idempotency key
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("documents", sa.Column("ingest_key", sa.String(length=64), nullable=True))
+    op.create_unique_constraint("documents_ingest_key_key", "documents", ["ingest_key"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("documents_ingest_key_key", "documents", type_="unique")
+    op.drop_column("documents", "ingest_key")
@@ -0,0 +1,46 @@
+"""chunk tombstones for local index replicas
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "chunk_tombstones",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column("chunk_id", sa.Integer(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=False),
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION record_chunk_tombstone() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO chunk_tombstones (chunk_id, deleted_at)
+            VALUES (OLD.id, now() AT TIME ZONE 'utc');
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER chunks_tombstone AFTER DELETE ON chunks "
+        "FOR EACH ROW EXECUTE FUNCTION record_chunk_tombstone()"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS chunks_tombstone ON chunks")
+    op.execute("DROP FUNCTION IF EXISTS record_chunk_tombstone()")
+    op.drop_table("chunk_tombstones")
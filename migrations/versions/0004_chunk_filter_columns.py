@@ -0,0 +1,55 @@
+"""denormalized filter columns on chunks
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("chunks", sa.Column("compliance_framework", sa.String(length=32), nullable=True))
+    op.add_column("chunks", sa.Column("document_type", sa.String(length=32), nullable=True))
+    op.add_column("chunks", sa.Column("doc_status", sa.String(length=32), nullable=True))
+    op.add_column("chunks", sa.Column("effective_date", sa.DateTime(), nullable=True))
+    op.create_index("ix_chunks_document_id_ordinal", "chunks", ["document_id", "ordinal"])
+    op.create_index(
+        "ix_chunks_filters", "chunks", ["compliance_framework", "doc_status", "document_type"]
+    )
+    op.create_index("ix_chunks_effective_date", "chunks", ["effective_date"])
+    # Backfill from GRC metadata when the GRC tables exist.
+    op.execute(
+        """
+        DO $$
+        BEGIN
+            IF to_regclass('grc_documents') IS NOT NULL THEN
+                UPDATE chunks c
+                SET compliance_framework = g.compliance_framework::text,
+                    document_type = g.document_type::text,
+                    doc_status = g.status::text,
+                    effective_date = g.effective_date
+                FROM grc_documents g
+                WHERE g.document_id = c.document_id;
+            END IF;
+        END $$
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_chunks_effective_date", table_name="chunks")
+    op.drop_index("ix_chunks_filters", table_name="chunks")
+    op.drop_index("ix_chunks_document_id_ordinal", table_name="chunks")
+    op.drop_column("chunks", "effective_date")
+    op.drop_column("chunks", "doc_status")
+    op.drop_column("chunks", "document_type")
+    op.drop_column("chunks", "compliance_framework")
@@ -0,0 +1,34 @@
+"""document summaries and summary embeddings
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from pgvector.sqlalchemy import Vector
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("documents", sa.Column("summary", sa.Text(), nullable=True))
+    op.add_column("documents", sa.Column("summary_embedding", Vector(1536), nullable=True))
+    op.add_column("documents", sa.Column("summarized_at", sa.DateTime(), nullable=True))
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_documents_summary_embedding "
+        "ON documents USING hnsw (summary_embedding vector_cosine_ops)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_documents_summary_embedding")
+    op.drop_column("documents", "summarized_at")
+    op.drop_column("documents", "summary_embedding")
+    op.drop_column("documents", "summary")
@@ -0,0 +1,64 @@
+"""control embeddings and control-to-chunk matches
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from pgvector.sqlalchemy import Vector
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The GRC tables are created by ensure_schema() (with these columns) when they do not exist yet.
+    if not sa.inspect(op.get_bind()).has_table("compliance_controls"):
+        return
+    op.add_column("compliance_controls", sa.Column("embedding", Vector(1536), nullable=True))
+    op.add_column(
+        "compliance_controls", sa.Column("embedding_sha256", sa.String(length=64), nullable=True)
+    )
+    op.create_table(
+        "grc_control_matches",
+        sa.Column(
+            "compliance_control_id",
+            sa.Integer(),
+            sa.ForeignKey("compliance_controls.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column(
+            "chunk_id", sa.Integer(), sa.ForeignKey("chunks.id", ondelete="CASCADE"), nullable=False
+        ),
+        sa.Column(
+            "document_id",
+            sa.Integer(),
+            sa.ForeignKey("documents.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.Column("matched_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("compliance_control_id", "chunk_id"),
+    )
+    op.create_index(
+        "ix_grc_control_matches_control_score",
+        "grc_control_matches",
+        ["compliance_control_id", "score"],
+    )
+    op.create_index("ix_grc_control_matches_document_id", "grc_control_matches", ["document_id"])
+
+
+def downgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table("grc_control_matches"):
+        return
+    op.drop_index("ix_grc_control_matches_document_id", table_name="grc_control_matches")
+    op.drop_index("ix_grc_control_matches_control_score", table_name="grc_control_matches")
+    op.drop_table("grc_control_matches")
+    op.drop_column("compliance_controls", "embedding_sha256")
+    op.drop_column("compliance_controls", "embedding")
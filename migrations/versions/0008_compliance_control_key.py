@@ -0,0 +1,37 @@
+"""unique (framework, control_id) on compliance_controls
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table("compliance_controls"):
+        return
+    # Keep the oldest row of any duplicated control so the key can be enforced.
+    op.execute(
+        """
+        DELETE FROM compliance_controls a
+        USING compliance_controls b
+        WHERE a.framework = b.framework AND a.control_id = b.control_id AND a.id > b.id
+        """
+    )
+    op.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_compliance_controls_framework_control_id "
+        "ON compliance_controls (framework, control_id)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS uq_compliance_controls_framework_control_id")
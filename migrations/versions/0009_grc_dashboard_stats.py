@@ -0,0 +1,53 @@
+"""trigger-maintained dashboard aggregates
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+from grc.models import DASHBOARD_STATS_TRIGGERS
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Without the GRC tables ensure_schema() creates all of this on first use.
+    if not sa.inspect(op.get_bind()).has_table("grc_documents"):
+        return
+    op.create_table(
+        "grc_dashboard_stats",
+        sa.Column("dimension", sa.String(length=32), nullable=False),
+        sa.Column("value", sa.String(length=64), nullable=False),
+        sa.Column("count", sa.BigInteger(), nullable=False),
+        sa.Column("compliance_score_sum", sa.Float(), nullable=False),
+        sa.Column("compliance_score_count", sa.BigInteger(), nullable=False),
+        sa.Column("risk_score_sum", sa.Float(), nullable=False),
+        sa.Column("risk_score_count", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("dimension", "value"),
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_grc_documents_created_at ON grc_documents (created_at)"
+    )
+    # Functions, triggers and the initial backfill, as ensure_schema() installs them.
+    op.execute(DASHBOARD_STATS_TRIGGERS)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS risk_assessments_dashboard_stats ON risk_assessments")
+    op.execute("DROP TRIGGER IF EXISTS grc_documents_dashboard_stats ON grc_documents")
+    op.execute("DROP FUNCTION IF EXISTS grc_dashboard_risks()")
+    op.execute("DROP FUNCTION IF EXISTS grc_dashboard_documents()")
+    op.execute(
+        "DROP FUNCTION IF EXISTS "
+        "grc_dashboard_bump(text, text, integer, double precision, double precision)"
+    )
+    op.execute("DROP INDEX IF EXISTS ix_grc_documents_created_at")
+    op.execute("DROP TABLE IF EXISTS grc_dashboard_stats")
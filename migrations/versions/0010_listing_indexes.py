@@ -0,0 +1,47 @@
+"""composite indexes for keyset-paginated document listings
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19
+
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+GRC_INDEXES = {
+    "ix_grc_documents_created_at_id": "created_at, id",
+    "ix_grc_documents_framework_created_at": "compliance_framework, created_at, id",
+    "ix_grc_documents_type_created_at": "document_type, created_at, id",
+    "ix_grc_documents_status_created_at": "status, created_at, id",
+    "ix_grc_documents_risk_level_created_at": "risk_level, created_at, id",
+}
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_documents_created_at_id ON documents (created_at, id)"
+    )
+    # Without the GRC tables ensure_schema() creates these on first use.
+    if not sa.inspect(op.get_bind()).has_table("grc_documents"):
+        return
+    for name, columns in GRC_INDEXES.items():
+        op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON grc_documents ({columns})")
+    # Superseded by ix_grc_documents_created_at_id
+    op.execute("DROP INDEX IF EXISTS ix_grc_documents_created_at")
+
+
+def downgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("grc_documents"):
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_grc_documents_created_at ON grc_documents (created_at)"
+        )
+        for name in GRC_INDEXES:
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute("DROP INDEX IF EXISTS ix_documents_created_at_id")
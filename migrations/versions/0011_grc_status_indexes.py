@@ -0,0 +1,36 @@
+"""per-document indexes for the single-query compliance status
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19
+
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Without the GRC tables ensure_schema() creates these on first use.
+    if not sa.inspect(op.get_bind()).has_table("grc_documents"):
+        return
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_document_audit_logs_grc_document_id_timestamp "
+        "ON document_audit_logs (grc_document_id, timestamp)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_risk_assessments_grc_document_id "
+        "ON risk_assessments (grc_document_id)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_document_audit_logs_grc_document_id_timestamp")
+    # ix_risk_assessments_grc_document_id predates this revision on databases built by
+    # grc.migrations.
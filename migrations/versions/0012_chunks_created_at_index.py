@@ -0,0 +1,28 @@
+"""index chunks.created_at for local index syncs
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19
+
+"""
+from __future__ import annotations
+
+from alembic import op
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # chunks is the largest table; build without blocking ingest.
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chunks_created_at ON chunks (created_at)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_chunks_created_at")
@@ -0,0 +1,88 @@
+"""spread dashboard totals over slot rows
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-19
+
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+from grc.models import DASHBOARD_STATS_FUNCTIONS
+
+revision = "0013"
+down_revision = "0012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table("grc_dashboard_stats"):
+        return
+    # Writers wait while the key changes, so no trigger update targets the old one.
+    op.execute("LOCK TABLE grc_documents, risk_assessments IN SHARE ROW EXCLUSIVE MODE")
+    op.add_column(
+        "grc_dashboard_stats",
+        sa.Column("slot", sa.SmallInteger(), nullable=False, server_default="0"),
+    )
+    op.drop_constraint("grc_dashboard_stats_pkey", "grc_dashboard_stats", type_="primary")
+    op.create_primary_key(
+        "grc_dashboard_stats_pkey", "grc_dashboard_stats", ["dimension", "value", "slot"]
+    )
+    op.execute(DASHBOARD_STATS_FUNCTIONS)
+
+
+def downgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table("grc_dashboard_stats"):
+        return
+    op.execute("LOCK TABLE grc_documents, risk_assessments IN SHARE ROW EXCLUSIVE MODE")
+    op.execute(
+        """
+        CREATE TEMPORARY TABLE grc_dashboard_stats_merged ON COMMIT DROP AS
+        SELECT dimension, value, sum(count) AS count,
+               sum(compliance_score_sum) AS compliance_score_sum,
+               sum(compliance_score_count) AS compliance_score_count,
+               sum(risk_score_sum) AS risk_score_sum,
+               sum(risk_score_count) AS risk_score_count
+        FROM grc_dashboard_stats GROUP BY dimension, value
+        """
+    )
+    op.execute("DELETE FROM grc_dashboard_stats")
+    op.drop_constraint("grc_dashboard_stats_pkey", "grc_dashboard_stats", type_="primary")
+    op.drop_column("grc_dashboard_stats", "slot")
+    op.execute(
+        """
+        INSERT INTO grc_dashboard_stats
+            (dimension, value, count, compliance_score_sum, compliance_score_count,
+             risk_score_sum, risk_score_count)
+        SELECT * FROM grc_dashboard_stats_merged
+        """
+    )
+    op.create_primary_key("grc_dashboard_stats_pkey", "grc_dashboard_stats", ["dimension", "value"])
+    # grc_dashboard_bump as migration 0009 installed it, keyed on (dimension, value).
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION grc_dashboard_bump(
+            dim text, val text, delta integer, cscore double precision, rscore double precision
+        ) RETURNS void AS $$
+        BEGIN
+            INSERT INTO grc_dashboard_stats AS t
+                (dimension, value, count, compliance_score_sum, compliance_score_count,
+                 risk_score_sum, risk_score_count)
+            VALUES (
+                dim, coalesce(val, ''), delta,
+                coalesce(cscore, 0) * delta, CASE WHEN cscore IS NULL THEN 0 ELSE delta END,
+                coalesce(rscore, 0) * delta, CASE WHEN rscore IS NULL THEN 0 ELSE delta END
+            )
+            ON CONFLICT (dimension, value) DO UPDATE SET
+                count = t.count + EXCLUDED.count,
+                compliance_score_sum = t.compliance_score_sum + EXCLUDED.compliance_score_sum,
+                compliance_score_count = t.compliance_score_count + EXCLUDED.compliance_score_count,
+                risk_score_sum = t.risk_score_sum + EXCLUDED.risk_score_sum,
+                risk_score_count = t.risk_score_count + EXCLUDED.risk_score_count;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
@@ -0,0 +1,31 @@
+"""trigger-maintained chunk filter columns
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-19
+
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+from grc.models import CHUNK_FILTERS_TRIGGER
+
+revision = "0014"
+down_revision = "0013"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Without the GRC tables ensure_schema() creates all of this on first use.
+    if not sa.inspect(op.get_bind()).has_table("grc_documents"):
+        return
+    # Function, trigger and a backfill of statuses changed outside the application.
+    op.execute(CHUNK_FILTERS_TRIGGER)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS grc_documents_chunk_filters ON grc_documents")
+    op.execute("DROP FUNCTION IF EXISTS grc_chunk_filters()")
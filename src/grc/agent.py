@@ -1,25 +1,76 @@
 from __future__ import annotations
 
-from typing import Dict, List, Optional
-from openai import OpenAI
+from collections.abc import Iterator, Sequence
+from typing import Any
 
-from rag.retriever import retrieve_similar
+from opentelemetry import trace
+from sqlalchemy import text as sql_text
+from sqlalchemy.orm import Session
+
+from rag.context import pack_context
+from rag.filters import RetrievalFilters
 from rag.openai_utils import _client
-from .models import ComplianceFramework, DocumentType, RiskLevel
+from rag.rerank import context_top_k
+from rag.retriever import retrieve_similar
+from rag.singleflight import coalesce, request_key
+
+from .models import ComplianceFramework
+from .report import build_compliance_report, stream_compliance_report
+
+tracer = trace.get_tracer(__name__)
+
+
+def rag_document_ids(s: Session, grc_document_ids: Sequence[int]) -> list[int]:
+    """``documents.id`` of the given GRC documents, the ids chunk filters match on."""
+    rows = s.execute(
+        sql_text("SELECT DISTINCT document_id FROM grc_documents WHERE id = ANY(:ids)"),
+        {"ids": list(grc_document_ids)},
+    )
+    return sorted(int(row[0]) for row in rows)
 
 
 class GRCAgent:
     """Specialized AI agent for GRC document management and compliance queries"""
     
-    def __init__(self):
+    def __init__(self) -> None:
         self.client = _client()
     
-    def answer_grc_question(self, question: str, context_documents: Optional[List[int]] = None) -> Dict:
+    def answer_grc_question(
+        self,
+        question: str,
+        context_documents: list[int] | None = None,
+        filters: RetrievalFilters | None = None,
+    ) -> dict[str, Any]:
         """Answer GRC-specific questions with enhanced context"""
         
+        # Restrict retrieval to the requested documents inside the vector search. They are
+        # GRC document ids; chunks belong to the RAG documents behind them.
+        if context_documents:
+            from rag.db import read_session
+
+            with read_session() as s:
+                document_ids = rag_document_ids(s, context_documents)
+            filters = (filters or RetrievalFilters()).model_copy(
+                update={"document_ids": document_ids}
+            )
+
+        # Identical concurrent questions (same filters) share one retrieval + generation
+        key = request_key(question, filters.model_dump(mode="json") if filters else None)
+        return coalesce("grc.answer", key, lambda: self._answer_grc_question(question, filters))
+
+    def _answer_grc_question(
+        self, question: str, filters: RetrievalFilters | None
+    ) -> dict[str, Any]:
         # Retrieve relevant document chunks
-        contexts = retrieve_similar(question, top_k=8)
-        context_text = "\n\n".join(t for t, _, _ in contexts)
+        with tracer.start_as_current_span("grc.retrieve_context") as span:
+            contexts = retrieve_similar(question, top_k=context_top_k(8), filters=filters)
+            packed = pack_context(contexts)
+            context_text = packed.text
+            span.set_attributes({
+                "rag.context_count": len(contexts),
+                "rag.context_tokens": packed.tokens,
+                "rag.context_tokens_saved": packed.tokens_saved,
+            })
         
         # Enhanced GRC-specific prompt
         prompt = f"""
@@ -62,7 +113,7 @@ class GRCAgent:
         **Follow-up Questions:**
         - [Suggested follow-up question 1]
         - [Suggested follow-up question 2]
-        """
+        """  # noqa: E501
         
         try:
             response = self.client.chat.completions.create(
@@ -75,8 +126,11 @@ class GRCAgent:
             answer = response.choices[0].message.content or ""
             
             # Extract citations
+            used = {cid for p in packed.passages for cid in p.chunk_ids}
             citations = []
             for _, score, meta in contexts:
+                if meta.get("chunk_id") not in used:
+                    continue
                 citations.append({
                     "chunk_id": meta.get("chunk_id"),
                     "score": score,
@@ -93,49 +147,29 @@ class GRCAgent:
             
         except Exception as e:
             return {
-                "answer": f"I apologize, but I encountered an error processing your GRC question: {str(e)}",
+                "answer": (
+                    "I apologize, but I encountered an error processing your GRC question: "
+                    f"{str(e)}"
+                ),
                 "citations": [],
                 "question_type": "ERROR",
                 "compliance_frameworks": [],
-                "risk_level": "UNKNOWN"
+                "risk_level": "UNKNOWN",
             }
-    
-    def generate_compliance_report(self, framework: ComplianceFramework, document_ids: List[int]) -> Dict:
-        """Generate a comprehensive compliance report for a specific framework"""
-        
-        # Get document context for the specified documents
-        context_prompt = f"""
-        Generate a comprehensive compliance report for {framework.value} framework.
-        
-        Analyze the following aspects:
-        1. Control coverage and implementation status
-        2. Identified gaps and deficiencies
-        3. Risk assessment and mitigation strategies
-        4. Recommendations for improvement
-        5. Compliance score and maturity level
-        
-        Provide specific, actionable insights based on the document analysis.
+
+    def generate_compliance_report(
+        self, framework: ComplianceFramework, document_ids: list[int]
+    ) -> dict[str, Any]:
+        """Generate a compliance report for a framework from the given GRC documents
+        
+        Each document is analysed against the framework in parallel (map), then
+        the results are merged and summarised (reduce); see ``grc.report``. With
+        no ``document_ids`` the framework's current documents are used.
         """
-        
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": context_prompt}],
-                temperature=0.1,
-                max_tokens=3000
+            return build_compliance_report(
+                framework, self.stream_compliance_report(framework, document_ids)
             )
-            
-            report = response.choices[0].message.content or ""
-            
-            return {
-                "framework": framework.value,
-                "report": report,
-                "compliance_score": self._calculate_compliance_score(report),
-                "maturity_level": self._assess_maturity_level(report),
-                "key_findings": self._extract_key_findings(report),
-                "recommendations": self._extract_recommendations(report)
-            }
-            
         except Exception as e:
             return {
                 "framework": framework.value,
@@ -143,10 +177,16 @@ class GRCAgent:
                 "compliance_score": 0.0,
                 "maturity_level": "UNKNOWN",
                 "key_findings": [],
-                "recommendations": []
+                "recommendations": [],
             }
+
+    def stream_compliance_report(
+        self, framework: ComplianceFramework, document_ids: list[int]
+    ) -> Iterator[dict[str, Any]]:
+        """Report sections as they are produced: scope, one per document, coverage, summary"""
+        return stream_compliance_report(framework, document_ids, client=self.client)
     
-    def assess_risk_factors(self, question: str, context: str) -> Dict:
+    def assess_risk_factors(self, question: str, context: str) -> dict[str, Any]:
         """Assess risk factors in a specific context"""
         
         prompt = f"""
@@ -207,7 +247,7 @@ class GRCAgent:
         else:
             return "GENERAL_GRC"
     
-    def _extract_frameworks(self, text: str) -> List[str]:
+    def _extract_frameworks(self, text: str) -> list[str]:
         """Extract mentioned compliance frameworks from text"""
         frameworks = []
         text_upper = text.upper()
@@ -231,57 +271,6 @@ class GRCAgent:
         else:
             return "UNKNOWN"
     
-    def _calculate_compliance_score(self, report: str) -> float:
-        """Calculate compliance score from report text"""
-        # Simple heuristic - could be enhanced with more sophisticated analysis
-        positive_indicators = ["compliant", "implemented", "effective", "adequate", "meets requirements"]
-        negative_indicators = ["non-compliant", "deficient", "gap", "missing", "inadequate"]
-        
-        text_lower = report.lower()
-        positive_count = sum(1 for indicator in positive_indicators if indicator in text_lower)
-        negative_count = sum(1 for indicator in negative_indicators if indicator in text_lower)
-        
-        if positive_count + negative_count == 0:
-            return 0.5
-        
-        return positive_count / (positive_count + negative_count)
-    
-    def _assess_maturity_level(self, report: str) -> str:
-        """Assess maturity level from report"""
-        text_lower = report.lower()
-        
-        if any(word in text_lower for word in ["mature", "advanced", "optimized", "excellent"]):
-            return "ADVANCED"
-        elif any(word in text_lower for word in ["developing", "basic", "initial", "improving"]):
-            return "DEVELOPING"
-        elif any(word in text_lower for word in ["ad-hoc", "reactive", "inconsistent"]):
-            return "BASIC"
-        else:
-            return "UNKNOWN"
-    
-    def _extract_key_findings(self, report: str) -> List[str]:
-        """Extract key findings from report"""
-        # Simple extraction - could be enhanced with NLP
-        lines = report.split('\n')
-        findings = []
-        
-        for line in lines:
-            if any(keyword in line.lower() for keyword in ["finding", "issue", "gap", "deficiency", "strength"]):
-                findings.append(line.strip())
-        
-        return findings[:5]  # Limit to top 5 findings
-    
-    def _extract_recommendations(self, report: str) -> List[str]:
-        """Extract recommendations from report"""
-        lines = report.split('\n')
-        recommendations = []
-        
-        for line in lines:
-            if any(keyword in line.lower() for keyword in ["recommend", "suggest", "should", "must", "action"]):
-                recommendations.append(line.strip())
-        
-        return recommendations[:5]  # Limit to top 5 recommendations
-    
     def _extract_risk_score(self, assessment: str) -> float:
         """Extract risk score from assessment text"""
         import re
@@ -300,24 +289,30 @@ class GRCAgent:
         
         return 0.0
     
-    def _extract_risk_factors(self, assessment: str) -> List[str]:
+    def _extract_risk_factors(self, assessment: str) -> list[str]:
         """Extract risk factors from assessment"""
         lines = assessment.split('\n')
         factors = []
         
         for line in lines:
-            if any(keyword in line.lower() for keyword in ["risk", "threat", "vulnerability", "exposure"]):
+            if any(
+                keyword in line.lower()
+                for keyword in ["risk", "threat", "vulnerability", "exposure"]
+            ):
                 factors.append(line.strip())
         
         return factors[:10]  # Limit to top 10 factors
     
-    def _extract_mitigation_strategies(self, assessment: str) -> List[str]:
+    def _extract_mitigation_strategies(self, assessment: str) -> list[str]:
         """Extract mitigation strategies from assessment"""
         lines = assessment.split('\n')
         strategies = []
         
         for line in lines:
-            if any(keyword in line.lower() for keyword in ["mitigate", "control", "prevent", "reduce", "address"]):
+            if any(
+                keyword in line.lower()
+                for keyword in ["mitigate", "control", "prevent", "reduce", "address"]
+            ):
                 strategies.append(line.strip())
         
         return strategies[:5]  # Limit to top 5 strategies
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, cast
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from mcp_server.logging_config import get_logger
+from rag.metrics import GRC_ANALYSIS_CACHE
+from rag.settings import RAGSettings, get_rag_settings
+
+from .models import AnalysisCacheEntry
+
+logger = get_logger(__name__)
+
+CacheKey = tuple[str, str, str, str]
+
+
+def prompt_version(template: str) -> str:
+    """Short hash of a prompt template; editing the template invalidates its cached results."""
+    return hashlib.sha256(template.encode()).hexdigest()[:12]
+
+
+def content_hash(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+class AnalysisCache:
+    """Cache of raw LLM analysis results: an in-process LRU in front of ``grc_analysis_cache``.
+
+    Entries are keyed by ``(kind, content hash, prompt version, model)`` and never
+    expire, since the same input, prompt and model should give the same analysis.
+    Database errors only cost a cache miss.
+    """
+
+    def __init__(self, max_entries: int, use_db: bool = True):
+        self.max_entries = max_entries
+        self.use_db = use_db
+        self._entries: OrderedDict[CacheKey, dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _put_local(self, key: CacheKey, result: dict[str, Any]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(
+        self, kind: str, content_sha256: str, version: str, model: str
+    ) -> dict[str, Any] | None:
+        key = (kind, content_sha256, version, model)
+        with self._lock:
+            result: dict[str, Any] | None = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+        if result is not None:
+            GRC_ANALYSIS_CACHE.labels(kind=kind, result="local_hit").inc()
+            return result
+        if self.use_db:
+            from rag.db import db_session
+
+            try:
+                with db_session() as s:
+                    row = s.execute(
+                        select(AnalysisCacheEntry.result).where(
+                            AnalysisCacheEntry.kind == kind,
+                            AnalysisCacheEntry.content_sha256 == content_sha256,
+                            AnalysisCacheEntry.prompt_version == version,
+                            AnalysisCacheEntry.model == model,
+                        )
+                    ).scalar_one_or_none()
+                    result = cast("dict[str, Any] | None", row)
+            except Exception:  # noqa: BLE001
+                logger.warning("grc_analysis_cache_unavailable", exc_info=True)
+        if result is not None:
+            self._put_local(key, result)
+            GRC_ANALYSIS_CACHE.labels(kind=kind, result="db_hit").inc()
+            return result
+        GRC_ANALYSIS_CACHE.labels(kind=kind, result="miss").inc()
+        return None
+
+    def put(
+        self, kind: str, content_sha256: str, version: str, model: str, result: dict[str, Any]
+    ) -> None:
+        self._put_local((kind, content_sha256, version, model), result)
+        if not self.use_db:
+            return
+        from rag.db import db_session
+
+        try:
+            with db_session() as s:
+                s.execute(
+                    insert(AnalysisCacheEntry)
+                    .values(
+                        kind=kind,
+                        content_sha256=content_sha256,
+                        prompt_version=version,
+                        model=model,
+                        result=result,
+                        created_at=datetime.utcnow(),
+                    )
+                    .on_conflict_do_nothing()
+                )
+        except Exception:  # noqa: BLE001
+            logger.warning("grc_analysis_cache_unavailable", exc_info=True)
+
+
+@lru_cache(maxsize=1)
+def _cache_for(max_entries: int) -> AnalysisCache:
+    return AnalysisCache(max_entries)
+
+
+def get_analysis_cache(settings: RAGSettings | None = None) -> AnalysisCache | None:
+    """The process-wide analysis cache, or None when ``GRC_ANALYSIS_CACHE=0``."""
+    settings = settings or get_rag_settings()
+    if not settings.grc_analysis_cache_enable:
+        return None
+    return _cache_for(settings.grc_analysis_cache_size)
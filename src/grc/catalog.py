@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import csv
+import json
+import time
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from pathlib import Path
+from typing import Any, TextIO, cast
+
+from opentelemetry import trace
+from sqlalchemy import CursorResult
+from sqlalchemy import text as sql_text
+
+from mcp_server.logging_config import get_logger
+
+from .models import ComplianceFramework
+
+tracer = trace.get_tracer(__name__)
+logger = get_logger(__name__)
+
+CATALOG_FORMATS = ("csv", "json", "jsonl", "oscal")
+
+# Accepted source column names for each compliance_controls field, first match wins.
+_ALIASES = {
+    "framework": ("framework", "compliance_framework"),
+    "control_id": ("control_id", "id", "identifier", "control", "ref"),
+    "title": ("title", "name", "control_name"),
+    "description": ("description", "text", "statement", "requirement"),
+    "category": ("category", "family", "group", "domain", "section"),
+    "is_active": ("is_active", "active"),
+}
+# Column sizes of compliance_controls
+_LIMITS = {"control_id": 100, "title": 500, "category": 200}
+
+
+def _pick(item: dict[str, Any], field: str) -> str | None:
+    for name in _ALIASES[field]:
+        value = item.get(name)
+        if value not in (None, ""):
+            return str(value).strip()
+    return None
+
+
+def _framework_key(name: str) -> str:
+    return "".join(c for c in name.upper() if c.isalnum())
+
+
+# Framework names compared without separators, so "ISO 27001", "SOC-2" and "pci dss" all match.
+_FRAMEWORKS = {_framework_key(f.value): f.value for f in ComplianceFramework}
+
+
+def normalize_control(item: dict[str, Any], framework: str | None = None) -> dict[str, Any]:
+    """Map a source record onto compliance_controls columns.
+
+    Raises ValueError if it cannot be imported.
+    """
+    item = {str(k).strip().lower().replace(" ", "_"): v for k, v in item.items() if k is not None}
+    control_id = _pick(item, "control_id")
+    if not control_id:
+        raise ValueError("missing control id")
+    name = _pick(item, "framework") or framework or ""
+    framework_value = _FRAMEWORKS.get(_framework_key(name))
+    if framework_value is None:
+        raise ValueError(f"unknown framework {name!r}")
+    title = _pick(item, "title") or control_id
+    active = _pick(item, "is_active")
+    row: dict[str, Any] = {
+        "framework": framework_value,
+        "control_id": control_id,
+        "title": title,
+        "description": _pick(item, "description") or title,
+        "category": _pick(item, "category") or "General",
+        "is_active": active is None or active.lower() in ("1", "true", "yes", "y"),
+    }
+    for field, limit in _LIMITS.items():
+        row[field] = row[field][:limit]
+    return row
+
+
+def _oscal_prose(parts: Iterable[dict[str, Any]] | None) -> list[str]:
+    out: list[str] = []
+    for part in parts or []:
+        if part.get("prose"):
+            out.append(part["prose"].strip())
+        out.extend(_oscal_prose(part.get("parts")))
+    return out
+
+
+def _oscal_controls(
+    controls: Iterable[dict[str, Any]] | None, category: str
+) -> Iterator[dict[str, Any]]:
+    for control in controls or []:
+        label = next(
+            (p["value"] for p in control.get("props", []) if p.get("name") == "label"), None
+        )
+        statement = [p for p in control.get("parts", []) if p.get("name") == "statement"]
+        yield {
+            "control_id": label or control.get("id"),
+            "title": control.get("title"),
+            "description": "\n".join(_oscal_prose(statement)),
+            "category": category,
+        }
+        # Enhancements (e.g. AC-2(1)) are nested controls of the same group.
+        yield from _oscal_controls(control.get("controls"), category)
+
+
+def _oscal_groups(groups: Iterable[dict[str, Any]] | None) -> Iterator[dict[str, Any]]:
+    for group in groups or []:
+        yield from _oscal_controls(
+            group.get("controls"), group.get("title") or group.get("id") or "General"
+        )
+        yield from _oscal_groups(group.get("groups"))
+
+
+def read_records(f: TextIO, fmt: str) -> Iterator[dict[str, Any]]:
+    """Raw control records from a catalog stream.
+
+    CSV and JSON Lines are read row by row. A JSON array and an OSCAL catalog
+    (``{"catalog": {"groups": ...}}``) are parsed as one document.
+    """
+    if fmt == "csv":
+        yield from csv.DictReader(f)
+    elif fmt == "jsonl":
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+    elif fmt in ("json", "oscal"):
+        data = json.load(f)
+        if isinstance(data, dict) and "catalog" in data:
+            catalog = data["catalog"]
+            yield from _oscal_controls(catalog.get("controls"), "General")
+            yield from _oscal_groups(catalog.get("groups"))
+        elif isinstance(data, dict):
+            yield from data.get("controls", [])
+        else:
+            yield from data
+    else:
+        raise ValueError(f"unknown catalog format {fmt!r}; expected one of {CATALOG_FORMATS}")
+
+
+def detect_format(path: Path) -> str:
+    suffix = path.suffix.lower().lstrip(".")
+    if suffix in ("csv", "jsonl"):
+        return suffix
+    if suffix == "ndjson":
+        return "jsonl"
+    return "json"
+
+
+def _staged_rows(
+    records: Iterable[dict[str, Any]], framework: str | None, stats: dict[str, Any]
+) -> Iterator[tuple[Any, ...]]:
+    for n, item in enumerate(records, start=1):
+        try:
+            row = normalize_control(item, framework)
+        except ValueError as exc:
+            stats["skipped"] += 1
+            logger.warning("grc_control_import_skipped", record=n, error=str(exc))
+            continue
+        stats["rows"] += 1
+        yield (
+            n,
+            row["framework"],
+            row["control_id"],
+            row["title"],
+            row["description"],
+            row["category"],
+            row["is_active"],
+        )
+
+
+_STAGING_DDL = """
+    CREATE TEMP TABLE grc_controls_staging (
+        ord integer, framework text, control_id text, title text,
+        description text, category text, is_active boolean
+    ) ON COMMIT DROP
+"""
+
+# The last occurrence of a control in the file wins; unchanged rows are not rewritten.
+_MERGE_SQL = """
+    INSERT INTO compliance_controls
+        (framework, control_id, title, description, category, is_active, created_at, updated_at)
+    SELECT CAST(framework AS complianceframework), control_id, title, description, category,
+           is_active, :now, :now
+    FROM (
+        SELECT DISTINCT ON (framework, control_id) * FROM grc_controls_staging
+        ORDER BY framework, control_id, ord DESC
+    ) AS latest
+    ON CONFLICT (framework, control_id) DO UPDATE
+    SET title = EXCLUDED.title, description = EXCLUDED.description, category = EXCLUDED.category,
+        is_active = EXCLUDED.is_active, updated_at = EXCLUDED.updated_at
+    WHERE (compliance_controls.title, compliance_controls.description,
+           compliance_controls.category, compliance_controls.is_active)
+        IS DISTINCT FROM
+        (EXCLUDED.title, EXCLUDED.description, EXCLUDED.category, EXCLUDED.is_active)
+    RETURNING (xmax = 0) AS inserted
+"""
+
+_DEACTIVATE_SQL = """
+    UPDATE compliance_controls c SET is_active = false, updated_at = :now
+    WHERE c.is_active
+      AND c.framework::text IN (SELECT DISTINCT framework FROM grc_controls_staging)
+      AND NOT EXISTS (
+          SELECT 1 FROM grc_controls_staging st
+          WHERE st.framework = c.framework::text AND st.control_id = c.control_id
+      )
+"""
+
+
+def import_controls(
+    records: Iterable[dict[str, Any]],
+    framework: str | None = None,
+    deactivate_missing: bool = False,
+    embed: bool = True,
+) -> dict[str, Any]:
+    """Upsert a control catalog into ``compliance_controls``.
+
+    Records are normalized as they stream in and written with ``COPY`` into a
+    temporary staging table, then merged with a single ``INSERT ... ON CONFLICT``
+    keyed on ``(framework, control_id)``. Re-importing the same catalog changes
+    nothing. With ``deactivate_missing``, active controls of the imported
+    frameworks that are absent from the catalog are deactivated. Embeddings of
+    new and edited controls are then computed in batches (``update_coverage``).
+    """
+    from rag.db import db_session
+    from rag.ingest import ensure_schema
+
+    from .coverage import update_coverage
+
+    ensure_schema()
+    stats: dict[str, Any] = {
+        "rows": 0, "skipped": 0, "inserted": 0, "updated": 0, "unchanged": 0, "deactivated": 0
+    }
+    start = time.perf_counter()
+    with tracer.start_as_current_span("grc.import_controls") as span, db_session() as s:
+        s.execute(sql_text(_STAGING_DDL))
+        raw = s.connection().connection.driver_connection
+        assert raw is not None  # a checked-out connection always has its driver connection
+        with raw.cursor() as cur:
+            with cur.copy(
+                "COPY grc_controls_staging "
+                "(ord, framework, control_id, title, description, category, is_active) FROM STDIN"
+            ) as copy:
+                for row in _staged_rows(records, framework, stats):
+                    copy.write_row(row)
+        now = datetime.utcnow()
+        merged = s.execute(sql_text(_MERGE_SQL), {"now": now}).scalars().all()
+        stats["inserted"] = sum(1 for inserted in merged if inserted)
+        stats["updated"] = len(merged) - stats["inserted"]
+        distinct = s.execute(
+            sql_text(
+                "SELECT count(*) FROM "
+                "(SELECT DISTINCT framework, control_id FROM grc_controls_staging) d"
+            )
+        ).scalar_one()
+        stats["unchanged"] = int(distinct) - len(merged)
+        if deactivate_missing:
+            result = s.execute(sql_text(_DEACTIVATE_SQL), {"now": now})
+            deactivated = cast("CursorResult[Any]", result)
+            stats["deactivated"] = deactivated.rowcount
+        span.set_attributes({f"grc.controls_{k}": v for k, v in stats.items()})
+    elapsed = time.perf_counter() - start
+    stats["seconds"] = round(elapsed, 3)
+    stats["rows_per_second"] = round(stats["rows"] / elapsed, 1) if elapsed else 0.0
+    if embed:
+        embed_start = time.perf_counter()
+        stats["coverage"] = update_coverage()
+        stats["embed_seconds"] = round(time.perf_counter() - embed_start, 3)
+    logger.info("grc_controls_imported", **{k: v for k, v in stats.items() if k != "coverage"})
+    return stats
+
+
+def import_catalog_file(
+    path: Path,
+    framework: str | None = None,
+    fmt: str | None = None,
+    deactivate_missing: bool = False,
+    embed: bool = True,
+) -> dict[str, Any]:
+    """``import_controls`` from a CSV, JSON, JSON Lines or OSCAL catalog file."""
+    with path.open(newline="", encoding="utf-8-sig") as f:
+        return import_controls(
+            read_records(f, fmt or detect_format(path)),
+            framework=framework,
+            deactivate_missing=deactivate_missing,
+            embed=embed,
+        )
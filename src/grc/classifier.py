@@ -1,33 +1,32 @@
 from __future__ import annotations
 
-import os
-from typing import Dict, List, Tuple
-from openai import OpenAI
+import json
+from typing import Any, Callable
 
-from .models import ComplianceFramework, DocumentType, RiskLevel
+from mcp_server.logging_config import get_logger
 from rag.openai_utils import _client
 
+from .analysis_cache import content_hash, get_analysis_cache, prompt_version
+from .models import ComplianceFramework, DocumentType, RiskLevel
 
-class GRCDocumentClassifier:
-    """AI-powered document classifier for GRC documents"""
-    
-    def __init__(self):
-        self.client = _client()
-    
-    def classify_document(self, text: str, filename: str) -> Dict:
-        """Classify a document for GRC purposes"""
-        
-        prompt = f"""
+logger = get_logger(__name__)
+
+ANALYSIS_MODEL = "gpt-4o-mini"
+
+# Prompt templates are versioned by their hash in the analysis cache; editing one re-runs its
+# analyses. The allowed enum values are template fields (see taxonomy_fields), so taxonomy changes
+# do too. Their long lines are prompt text and stay unwrapped for the same reason.
+CLASSIFY_PROMPT = """
         Analyze the following document and classify it for GRC (Governance, Risk, and Compliance) purposes.
         
         Filename: {filename}
-        Content: {text[:2000]}...
+        Content: {text}...
         
         Please provide a JSON response with the following structure:
         {{
-            "document_type": "one of: POLICY, PROCEDURE, CONTROL, RISK_ASSESSMENT, AUDIT_REPORT, COMPLIANCE_REPORT, INCIDENT_REPORT, TRAINING_MATERIAL, CONTRACT, OTHER",
-            "compliance_framework": "one of: SOX, GDPR, ISO27001, NIST, COSO, PCI_DSS, HIPAA, SOC2",
-            "risk_level": "one of: LOW, MEDIUM, HIGH, CRITICAL",
+            "document_type": "one of: {document_types}",
+            "compliance_framework": "one of: {frameworks}",
+            "risk_level": "one of: {risk_levels}",
             "title": "extracted or generated title",
             "description": "brief description of the document",
             "control_id": "relevant control identifier if applicable",
@@ -42,56 +41,51 @@ class GRCDocumentClassifier:
         3. Assessing risk level based on content
         4. Extracting relevant control identifiers
         5. Identifying key compliance topics
-        """
-        
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1,
-                response_format={"type": "json_object"}
-            )
-            
-            result = response.choices[0].message.content
-            if result:
-                import json
-                classification = json.loads(result)
-                
-                # Validate and convert enums
-                return {
-                    "document_type": DocumentType(classification.get("document_type", "OTHER")),
-                    "compliance_framework": ComplianceFramework(classification.get("compliance_framework", "SOX")),
-                    "risk_level": RiskLevel(classification.get("risk_level", "MEDIUM")),
-                    "title": classification.get("title", filename),
-                    "description": classification.get("description", ""),
-                    "control_id": classification.get("control_id"),
-                    "key_topics": classification.get("key_topics", []),
-                    "compliance_keywords": classification.get("compliance_keywords", []),
-                    "confidence_score": classification.get("confidence_score", 0.5)
-                }
-        except Exception as e:
-            print(f"Classification error: {e}")
+        """  # noqa: E501
+
+
+ANALYZE_PROMPT = """
+        Analyze the following document for GRC (Governance, Risk, and Compliance) purposes:
+        classify it and assess its risk factors.
         
-        # Fallback classification
-        return {
-            "document_type": DocumentType.OTHER,
-            "compliance_framework": ComplianceFramework.SOX,
-            "risk_level": RiskLevel.MEDIUM,
-            "title": filename,
-            "description": "Document classification failed",
-            "control_id": None,
-            "key_topics": [],
-            "compliance_keywords": [],
-            "confidence_score": 0.0
-        }
-    
-    def extract_compliance_requirements(self, text: str) -> List[Dict]:
-        """Extract specific compliance requirements from document text"""
+        Filename: {filename}
+        Content: {text}...
         
-        prompt = f"""
+        Please provide a JSON response with the following structure:
+        {{
+            "summary": "at most 150 words: what the document is, its scope and its main obligations",
+            "classification": {{
+                "document_type": "one of: {document_types}",
+                "compliance_framework": "one of: {frameworks}",
+                "risk_level": "one of: {risk_levels}",
+                "title": "extracted or generated title",
+                "description": "brief description of the document",
+                "control_id": "relevant control identifier if applicable",
+                "key_topics": ["list", "of", "key", "topics"],
+                "compliance_keywords": ["list", "of", "compliance", "keywords"],
+                "confidence_score": 0.95
+            }},
+            "risk_assessment": {{
+                "overall_risk_score": 0.75,
+                "risk_factors": [
+                    {{
+                        "factor": "risk factor description",
+                        "severity": "LOW/MEDIUM/HIGH/CRITICAL",
+                        "likelihood": "LOW/MEDIUM/HIGH",
+                        "impact": "LOW/MEDIUM/HIGH"
+                    }}
+                ],
+                "mitigation_suggestions": ["suggestion1", "suggestion2"],
+                "compliance_gaps": ["gap1", "gap2"]
+            }}
+        }}
+        """  # noqa: E501
+
+
+REQUIREMENTS_PROMPT = """
         Extract specific compliance requirements, controls, and obligations from the following document:
         
-        {text[:3000]}...
+        {text}...
         
         Return a JSON array of requirements with this structure:
         [
@@ -104,33 +98,13 @@ class GRCDocumentClassifier:
                 "category": "category of requirement"
             }}
         ]
-        """
-        
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1,
-                response_format={"type": "json_object"}
-            )
-            
-            result = response.choices[0].message.content
-            if result:
-                import json
-                data = json.loads(result)
-                return data.get("requirements", [])
-        except Exception as e:
-            print(f"Requirement extraction error: {e}")
-        
-        return []
-    
-    def assess_risk_factors(self, text: str) -> Dict:
-        """Assess risk factors in the document"""
-        
-        prompt = f"""
+        """  # noqa: E501
+
+
+RISK_PROMPT = """
         Analyze the following document for risk factors and provide a risk assessment:
         
-        {text[:2000]}...
+        {text}...
         
         Return a JSON response with:
         {{
@@ -147,25 +121,215 @@ class GRCDocumentClassifier:
             "compliance_gaps": ["gap1", "gap2"]
         }}
         """
+
+
+
+def taxonomy_fields() -> dict[str, str]:
+    """Current enum values offered to the model by the classification prompts"""
+    return {
+        "document_types": ", ".join(t.value for t in DocumentType),
+        "frameworks": ", ".join(f.value for f in ComplianceFramework),
+        "risk_levels": ", ".join(r.value for r in RiskLevel),
+    }
+
+
+def classification_fields(text: str, filename: str) -> dict[str, str]:
+    return {"text": text[:2000], "filename": filename, **taxonomy_fields()}
+
+
+def chat_request(template: str, **fields: str) -> dict[str, Any]:
+    """Chat completion request body for a prompt template, as sent online or in a batch file"""
+    return {
+        "model": ANALYSIS_MODEL,
+        "messages": [{"role": "user", "content": template.format(**fields)}],
+        "temperature": 0.1,
+        "response_format": {"type": "json_object"},
+    }
+
+
+def complete_json(
+    client: Any,
+    kind: str,
+    template: str,
+    rate_limiter: Any = None,
+    validate: Callable[[dict[str, Any]], object] | None = None,
+    **fields: str,
+) -> dict[str, Any] | None:
+    """Run one JSON-mode completion, reusing a cached result for identical input
+    
+    The cache key covers every template field, the template's version hash and
+    the model, so edited prompts are re-run instead of served stale. The
+    ``rate_limiter`` (anything with ``acquire()``) is only consulted on a miss.
+    ``validate`` is called on a fresh reply and raises to reject it; rejected
+    replies are not cached, so the next call asks the model again.
+    """
+    cache = get_analysis_cache()
+    key = content_hash(*(fields[name] for name in sorted(fields)))
+    version = prompt_version(template)
+    if cache is not None:
+        cached = cache.get(kind, key, version, ANALYSIS_MODEL)
+        if cached is not None:
+            return cached
+    
+    if rate_limiter is not None:
+        rate_limiter.acquire()
+    response = client.chat.completions.create(**chat_request(template, **fields))
+    result = response.choices[0].message.content
+    if not result:
+        return None
+    data: dict[str, Any] = json.loads(result)
+    if validate is not None:
+        validate(data)
+    if cache is not None:
+        cache.put(kind, key, version, ANALYSIS_MODEL, data)
+    return data
+
+
+class GRCDocumentClassifier:
+    """AI-powered document classifier for GRC documents"""
+    
+    def __init__(self, rate_limiter: Any = None) -> None:
+        self.client = _client()
+        # Optional object whose ``acquire()`` is called before each API request
+        # (cache hits are free).
+        self.rate_limiter = rate_limiter
+    
+    def _complete_json(
+        self,
+        kind: str,
+        template: str,
+        validate: Callable[[dict[str, Any]], object] | None = None,
+        **fields: str,
+    ) -> dict[str, Any] | None:
+        return complete_json(
+            self.client,
+            kind,
+            template,
+            rate_limiter=self.rate_limiter,
+            validate=validate,
+            **fields,
+        )
+    
+    def classify_strict(self, text: str, filename: str) -> dict[str, Any]:
+        """Like ``classify_document`` but raises instead of returning the fallback classification"""
+        data = self._complete_json(
+            "classify",
+            CLASSIFY_PROMPT,
+            validate=lambda d: _classification_from(d, filename),
+            **classification_fields(text, filename),
+        )
+        if data is None:
+            raise ValueError("Empty classification response")
+        return _classification_from(data, filename)
+    
+    def classify_document(self, text: str, filename: str) -> dict[str, Any]:
+        """Classify a document for GRC purposes"""
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1,
-                response_format={"type": "json_object"}
+            return self.classify_strict(text, filename)
+        except Exception as e:  # noqa: BLE001
+            logger.warning("grc_classification_failed", error=str(e))
+        
+        return _fallback_classification(filename)
+    
+    def analyze_document(self, text: str, filename: str) -> dict[str, Any]:
+        """Classify a document and assess its risk factors in one LLM call
+        
+        Returns ``{"summary": ..., "classification": ..., "risk_assessment": ...}``
+        with the same shapes as ``classify_document`` and ``assess_risk_factors``;
+        the summary is empty when the analysis fails.
+        """
+        
+        try:
+            data = self._complete_json(
+                "analyze",
+                ANALYZE_PROMPT,
+                validate=lambda d: _classification_from(d.get("classification") or {}, filename),
+                text=text[:3000],
+                filename=filename,
+                **taxonomy_fields(),
             )
-            
-            result = response.choices[0].message.content
-            if result:
-                import json
-                return json.loads(result)
-        except Exception as e:
-            print(f"Risk assessment error: {e}")
+            if data is not None:
+                return {
+                    "summary": str(data.get("summary") or "").strip(),
+                    "classification": _classification_from(
+                        data.get("classification") or {}, filename
+                    ),
+                    "risk_assessment": {
+                        **_fallback_risk_assessment(),
+                        **(data.get("risk_assessment") or {}),
+                    },
+                }
+        except Exception as e:  # noqa: BLE001
+            logger.warning("grc_document_analysis_failed", error=str(e))
         
         return {
-            "overall_risk_score": 0.5,
-            "risk_factors": [],
-            "mitigation_suggestions": [],
-            "compliance_gaps": []
+            "summary": "",
+            "classification": _fallback_classification(filename),
+            "risk_assessment": _fallback_risk_assessment(),
         }
+    
+    def extract_compliance_requirements(self, text: str) -> list[dict[str, Any]]:
+        """Extract specific compliance requirements from document text"""
+        
+        try:
+            data = self._complete_json("requirements", REQUIREMENTS_PROMPT, text=text[:3000])
+            if data is not None:
+                requirements: list[dict[str, Any]] = data.get("requirements", [])
+                return requirements
+        except Exception as e:  # noqa: BLE001
+            logger.warning("grc_requirement_extraction_failed", error=str(e))
+        
+        return []
+    
+    def assess_risk_factors(self, text: str) -> dict[str, Any]:
+        """Assess risk factors in the document"""
+        
+        try:
+            data = self._complete_json("risk", RISK_PROMPT, text=text[:2000])
+            if data is not None:
+                return data
+        except Exception as e:  # noqa: BLE001
+            logger.warning("grc_risk_assessment_failed", error=str(e))
+        
+        return _fallback_risk_assessment()
+
+
+def _classification_from(classification: dict[str, Any], filename: str) -> dict[str, Any]:
+    """Validate an LLM classification and convert its enums"""
+    return {
+        "document_type": DocumentType(classification.get("document_type", "OTHER")),
+        "compliance_framework": ComplianceFramework(
+            classification.get("compliance_framework", "SOX")
+        ),
+        "risk_level": RiskLevel(classification.get("risk_level", "MEDIUM")),
+        "title": classification.get("title", filename),
+        "description": classification.get("description", ""),
+        "control_id": classification.get("control_id"),
+        "key_topics": classification.get("key_topics", []),
+        "compliance_keywords": classification.get("compliance_keywords", []),
+        "confidence_score": classification.get("confidence_score", 0.5),
+    }
+
+
+def _fallback_classification(filename: str) -> dict[str, Any]:
+    return {
+        "document_type": DocumentType.OTHER,
+        "compliance_framework": ComplianceFramework.SOX,
+        "risk_level": RiskLevel.MEDIUM,
+        "title": filename,
+        "description": "Document classification failed",
+        "control_id": None,
+        "key_topics": [],
+        "compliance_keywords": [],
+        "confidence_score": 0.0
+    }
+
+
+def _fallback_risk_assessment() -> dict[str, Any]:
+    return {
+        "overall_risk_score": 0.5,
+        "risk_factors": [],
+        "mitigation_suggestions": [],
+        "compliance_gaps": []
+    }
@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, TypeVar
+
+import click
+
+from rag.cli import echo_jsonl, list_options
+
+
+@click.group()
+def grc() -> None:
+    """GRC utilities."""
+
+
+_FILTERS = [
+    click.option(
+        "--framework", "frameworks", multiple=True, help="Only documents in this framework"
+    ),
+    click.option("--type", "document_types", multiple=True, help="Only documents of this type"),
+    click.option("--status", "statuses", multiple=True, help="Only documents with this status"),
+    click.option("--id", "ids", multiple=True, type=int, help="Only this GRC document id"),
+    click.option("--limit", type=int, default=None, help="Stop after this many documents"),
+]
+
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def _filters(fn: F) -> F:
+    for option in reversed(_FILTERS):
+        fn = option(fn)
+    return fn
+
+
+@grc.command("reclassify")
+@_filters
+@click.option("--concurrency", type=int, default=8, show_default=True, help="Parallel LLM calls")
+@click.option(
+    "--rpm",
+    type=float,
+    default=300,
+    show_default=True,
+    help="Max LLM requests per minute (0: no limit)",
+)
+@click.option(
+    "--batch-size", type=int, default=100, show_default=True, help="Documents per committed batch"
+)
+@click.option(
+    "--checkpoint",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="JSON progress file; an interrupted run resumes from it",
+)
+@click.option(
+    "--user", "user_id", default="system", show_default=True, help="User recorded in the audit log"
+)
+@click.option(
+    "--write-batch",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Write a Batch API request file (JSONL) instead of calling the model",
+)
+@click.option(
+    "--ingest-results",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    default=None,
+    help="Apply a Batch API output file (JSONL) instead of calling the model",
+)
+def reclassify_cmd(
+    frameworks: tuple[str, ...],
+    document_types: tuple[str, ...],
+    statuses: tuple[str, ...],
+    ids: tuple[int, ...],
+    limit: int | None,
+    concurrency: int,
+    rpm: float,
+    batch_size: int,
+    checkpoint: Path | None,
+    user_id: str,
+    write_batch: Path | None,
+    ingest_results: Path | None,
+) -> None:
+    """Re-run classification over GRC documents, e.g. after a taxonomy change.
+
+    Online mode classifies with bounded concurrency and a request rate limit,
+    committing label updates and audit entries per batch. Batch mode is two
+    steps: --write-batch exports the requests, and --ingest-results applies the
+    provider's output file.
+    """
+    from .reclassify import (
+        ReclassifyCheckpoint,
+        apply_batch_results,
+        export_batch_requests,
+        reclassify,
+    )
+
+    filters: dict[str, Any] = {
+        "frameworks": frameworks,
+        "document_types": document_types,
+        "statuses": statuses,
+        "ids": ids,
+    }
+    if write_batch is not None and ingest_results is not None:
+        raise click.UsageError("--write-batch and --ingest-results are separate steps")
+    if write_batch is not None:
+        count = export_batch_requests(write_batch, limit=limit, **filters)
+        click.echo(json.dumps({"requests": count, "path": str(write_batch)}))
+        return
+    if ingest_results is not None:
+        click.echo(json.dumps(apply_batch_results(ingest_results, user_id=user_id)))
+        return
+    summary = reclassify(
+        user_id=user_id,
+        limit=limit,
+        concurrency=concurrency,
+        requests_per_minute=rpm,
+        batch_size=batch_size,
+        checkpoint=ReclassifyCheckpoint(checkpoint),
+        **filters,
+    )
+    click.echo(json.dumps(summary))
+
+
+@grc.command("run-batch-locally")
+@click.argument("requests_path", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.argument("results_path", type=click.Path(dir_okay=False, path_type=Path))
+def run_batch_locally_cmd(requests_path: Path, results_path: Path) -> None:
+    """Execute a Batch API request file with synchronous calls and write its output file."""
+    from .reclassify import run_batch_locally
+
+    click.echo(json.dumps({"results": run_batch_locally(requests_path, results_path)}))
+
+
+@grc.command("import-controls")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option(
+    "--framework", default=None, help="Framework of rows that do not name one (e.g. NIST, ISO27001)"
+)
+@click.option(
+    "--format", "fmt", type=click.Choice(["csv", "json", "jsonl", "oscal"]), default=None,
+    help="Catalog format (default: from the file extension)",
+)
+@click.option(
+    "--deactivate-missing",
+    is_flag=True,
+    help="Deactivate controls of these frameworks absent from the file",
+)
+@click.option("--no-embed", is_flag=True, help="Skip control embeddings and coverage refresh")
+def import_controls_cmd(
+    path: Path,
+    framework: str | None,
+    fmt: str | None,
+    deactivate_missing: bool,
+    no_embed: bool,
+) -> None:
+    """Upsert a control catalog (CSV, JSON, JSON Lines or OSCAL) into compliance_controls."""
+    from .catalog import import_catalog_file
+
+    click.echo(
+        json.dumps(
+            import_catalog_file(
+                path,
+                framework=framework,
+                fmt=fmt,
+                deactivate_missing=deactivate_missing,
+                embed=not no_embed,
+            )
+        )
+    )
+
+
+@grc.command("update-coverage")
+@click.option(
+    "--document",
+    "document_ids",
+    multiple=True,
+    type=int,
+    help="Also merge in this document's chunks",
+)
+def update_coverage_cmd(document_ids: tuple[int, ...]) -> None:
+    """Embed new or edited controls and refresh their document matches."""
+    from .coverage import update_coverage
+
+    click.echo(json.dumps(update_coverage(list(document_ids))))
+
+
+@grc.command("coverage")
+@click.argument("framework")
+@click.option("--gaps", is_flag=True, help="Only list controls without sufficient evidence")
+def coverage_cmd(framework: str, gaps: bool) -> None:
+    """Show per-control coverage of FRAMEWORK."""
+    from .coverage import get_framework_coverage
+    from .models import ComplianceFramework
+
+    try:
+        framework_enum = ComplianceFramework(framework.upper())
+    except ValueError:
+        raise click.BadParameter(
+            f"expected one of {[f.value for f in ComplianceFramework]}", param_hint="FRAMEWORK"
+        )
+    click.echo(json.dumps(get_framework_coverage(framework_enum, gaps_only=gaps), indent=2))
+
+
+@grc.command("list-docs")
+@click.option("--framework", "frameworks", multiple=True, help="Only documents in this framework")
+@click.option("--type", "document_types", multiple=True, help="Only documents of this type")
+@click.option("--status", "statuses", multiple=True, help="Only documents with this status")
+@click.option(
+    "--risk-level", "risk_levels", multiple=True, help="Only documents with this risk level"
+)
+@list_options
+def list_docs_cmd(
+    frameworks: tuple[str, ...],
+    document_types: tuple[str, ...],
+    statuses: tuple[str, ...],
+    risk_levels: tuple[str, ...],
+    created_after: datetime | None,
+    created_before: datetime | None,
+    cursor: str | None,
+    limit: int | None,
+) -> None:
+    """Stream GRC documents, newest first, as JSON Lines."""
+    from pydantic import ValidationError
+
+    from rag.db import read_session
+
+    from .listing import GRCListFilters, iter_grc_documents
+
+    try:
+        filters = GRCListFilters.model_validate(
+            {
+                "frameworks": list(frameworks) or None,
+                "document_types": list(document_types) or None,
+                "statuses": list(statuses) or None,
+                "risk_levels": list(risk_levels) or None,
+                "created_after": created_after,
+                "created_before": created_before,
+            }
+        )
+    except ValidationError as exc:
+        raise click.UsageError(str(exc))
+    with read_session() as s:
+        echo_jsonl(iter_grc_documents(s, filters, cursor=cursor, limit=limit), limit)
+
+
+@grc.command("rebuild-stats")
+def rebuild_stats_cmd() -> None:
+    """Recompute the dashboard totals from the GRC tables."""
+    from .dashboard import rebuild_dashboard_stats
+
+    click.echo(json.dumps({"rows": rebuild_dashboard_stats()}))
+
+
+def main() -> None:
+    grc()
+
+
+if __name__ == "__main__":
+    main()
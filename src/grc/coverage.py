@@ -0,0 +1,343 @@
+from __future__ import annotations
+
+import hashlib
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any
+
+import numpy as np
+from opentelemetry import trace
+from sqlalchemy import distinct, func, select
+from sqlalchemy import text as sql_text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from mcp_server.logging_config import get_logger
+from rag.openai_utils import embed_texts
+from rag.settings import RAGSettings, get_rag_settings
+from rag.vector_index import prepare_search, search_many_sql
+
+from .models import ComplianceControl, ComplianceFramework, ControlMatch
+
+tracer = trace.get_tracer(__name__)
+logger = get_logger(__name__)
+
+# Chunks of GRC documents: the grc_documents_chunk_filters trigger sets their framework column.
+GRC_CHUNKS_PREDICATE = "compliance_framework IS NOT NULL"
+
+# (compliance_control_id, chunk_id, document_id, score) columns
+Matches = tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def control_text(control_id: str, title: str, description: str) -> str:
+    return f"{control_id} {title}\n{description}".strip()
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    normalized: np.ndarray = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+    return normalized
+
+
+def embed_controls(s: Session, settings: RAGSettings) -> list[int]:
+    """Embed active controls whose text changed since they were last embedded; returns their ids."""
+    rows = s.execute(
+        select(
+            ComplianceControl.id,
+            ComplianceControl.control_id,
+            ComplianceControl.title,
+            ComplianceControl.description,
+            ComplianceControl.embedding_sha256,
+        ).where(ComplianceControl.is_active.is_(True))
+    ).all()
+    stale = []
+    for pk, control_id, title, description, current in rows:
+        text = control_text(control_id, title, description)
+        sha = hashlib.sha256(text.encode()).hexdigest()
+        if sha != current:
+            stale.append((pk, text, sha))
+    batch_size = max(1, settings.embed_batch_size)
+    for i in range(0, len(stale), batch_size):
+        batch = stale[i : i + batch_size]
+        vectors = embed_texts([text for _, text, _ in batch])
+        s.execute(
+            sql_text(
+                "UPDATE compliance_controls SET embedding = :embedding, embedding_sha256 = :sha "
+                "WHERE id = :id"
+            ),
+            [{"id": pk, "embedding": vec, "sha": sha} for (pk, _, sha), vec in zip(batch, vectors)],
+        )
+    return [pk for pk, _, _ in stale]
+
+
+def control_matrix(
+    s: Session, control_ids: Sequence[int] | None = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """Ids and unit-normalized ``(n_controls, dim)`` embeddings of the active, embedded controls."""
+    stmt = (
+        select(ComplianceControl.id, ComplianceControl.embedding)
+        .where(ComplianceControl.is_active.is_(True), ComplianceControl.embedding.is_not(None))
+        .order_by(ComplianceControl.id)
+    )
+    if control_ids is not None:
+        stmt = stmt.where(ComplianceControl.id.in_(control_ids))
+    rows = s.execute(stmt).all()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+    ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    return ids, _normalize(np.vstack([np.asarray(r[1], dtype=np.float32) for r in rows]))
+
+
+def top_matches(
+    chunk_ids: np.ndarray,
+    document_ids: np.ndarray,
+    chunk_matrix: np.ndarray,
+    control_ids: np.ndarray,
+    controls: np.ndarray,
+    k: int,
+) -> Matches:
+    """The ``k`` most similar chunks of a block for every control.
+
+    Similarity is one ``(n_chunks, n_controls)`` matrix product of unit vectors
+    (cosine, as in the vector index); the per-control top-k is an
+    ``argpartition`` down each column.
+    """
+    scores = _normalize(np.asarray(chunk_matrix, dtype=np.float32)) @ controls.T
+    k = min(k, scores.shape[0])
+    if k < scores.shape[0]:
+        rows = np.argpartition(-scores, k - 1, axis=0)[:k]
+    else:
+        rows = np.broadcast_to(np.arange(scores.shape[0])[:, None], scores.shape)
+    picked = np.take_along_axis(scores, rows, axis=0)
+    return (
+        np.broadcast_to(control_ids, rows.shape).ravel(),
+        chunk_ids[rows].ravel(),
+        document_ids[rows].ravel(),
+        picked.ravel(),
+    )
+
+
+def _floors(s: Session, control_ids: np.ndarray, k: int) -> np.ndarray:
+    """Score a new match must beat per control: the current k-th best, or -inf while below k."""
+    rows = s.execute(
+        sql_text("""
+            SELECT compliance_control_id, count(*), min(score) FROM grc_control_matches
+            WHERE compliance_control_id = ANY(:ids) GROUP BY compliance_control_id
+        """),
+        {"ids": control_ids.tolist()},
+    ).all()
+    floors = np.full(len(control_ids), -np.inf)
+    position = {int(cid): i for i, cid in enumerate(control_ids)}
+    for cid, count, lowest in rows:
+        if count >= k:
+            floors[position[int(cid)]] = lowest
+    return floors
+
+
+def _prune(s: Session, control_ids: Sequence[int], k: int) -> None:
+    """Drop matches ranked below ``k`` for the given controls."""
+    s.execute(
+        sql_text("""
+            DELETE FROM grc_control_matches m
+            USING (
+                SELECT compliance_control_id, chunk_id,
+                       row_number() OVER (
+                           PARTITION BY compliance_control_id ORDER BY score DESC, chunk_id
+                       ) AS rn
+                FROM grc_control_matches WHERE compliance_control_id = ANY(:ids)
+            ) ranked
+            WHERE m.compliance_control_id = ranked.compliance_control_id
+              AND m.chunk_id = ranked.chunk_id AND ranked.rn > :k
+        """),
+        {"ids": list(control_ids), "k": k},
+    )
+
+
+def _write_matches(s: Session, matches: Matches) -> int:
+    control_ids, chunk_ids, document_ids, scores = matches
+    if not len(control_ids):
+        return 0
+    now = datetime.utcnow()
+    stmt = insert(ControlMatch)
+    s.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[ControlMatch.compliance_control_id, ControlMatch.chunk_id],
+            set_={"score": stmt.excluded.score, "matched_at": stmt.excluded.matched_at},
+        ),
+        [
+            {
+                "compliance_control_id": int(control_id),
+                "chunk_id": int(chunk_id),
+                "document_id": int(document_id),
+                "score": float(score),
+                "matched_at": now,
+            }
+            for control_id, chunk_id, document_id, score in zip(
+                control_ids, chunk_ids, document_ids, scores
+            )
+        ],
+    )
+    return len(control_ids)
+
+
+def match_documents(s: Session, document_ids: Sequence[int], settings: RAGSettings) -> int:
+    """Merge the chunks of ``document_ids`` into every control's top-k; returns the matches written.
+
+    Chunks are scored against all controls in blocks of
+    ``GRC_COVERAGE_BATCH_SIZE``. Only candidates that beat a control's current
+    k-th match are written, and the controls they touched are pruned back to k.
+    """
+    k = settings.grc_coverage_top_k
+    control_ids, controls = control_matrix(s)
+    if not len(control_ids) or not document_ids:
+        return 0
+    written, after_id = 0, 0
+    while True:
+        rows = s.execute(
+            sql_text("""
+                SELECT id, document_id, embedding FROM chunks
+                WHERE document_id = ANY(:doc_ids) AND id > :after_id ORDER BY id LIMIT :n
+            """),
+            {
+                "doc_ids": list(document_ids),
+                "after_id": after_id,
+                "n": settings.grc_coverage_batch_size,
+            },
+        ).all()
+        if not rows:
+            break
+        after_id = rows[-1][0]
+        chunk_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        doc_ids = np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows))
+        matrix = np.vstack([np.asarray(r[2], dtype=np.float32) for r in rows])
+        found, found_chunks, found_docs, scores = top_matches(
+            chunk_ids, doc_ids, matrix, control_ids, controls, k
+        )
+        floors = _floors(s, control_ids, k)
+        keep = scores > floors[np.searchsorted(control_ids, found)]
+        matches: Matches = (found[keep], found_chunks[keep], found_docs[keep], scores[keep])
+        written += _write_matches(s, matches)
+        touched = np.unique(matches[0])
+        if len(touched):
+            _prune(s, touched.tolist(), k)
+    return written
+
+
+def rebuild_control_matches(s: Session, control_ids: Sequence[int], settings: RAGSettings) -> int:
+    """Recompute the top-k of ``control_ids`` from scratch with one batched k-NN chunk query."""
+    ids, controls = control_matrix(s, control_ids)
+    s.execute(
+        sql_text("DELETE FROM grc_control_matches WHERE compliance_control_id = ANY(:ids)"),
+        {"ids": list(control_ids)},
+    )
+    if not len(ids):
+        return 0
+    params = prepare_search(s, settings, settings.grc_coverage_top_k, filtered=True)
+    rows = s.execute(
+        sql_text(f"""
+            SELECT hit.ord, hit.id, c.document_id, hit.score
+            FROM ({search_many_sql(settings, GRC_CHUNKS_PREDICATE)}) AS hit
+            JOIN chunks c ON c.id = hit.id
+        """),
+        {"query_embeddings": list(controls), **params},
+    ).all()
+    if not rows:
+        return 0
+    ords, chunk_ids, document_ids, scores = (np.asarray(column) for column in zip(*rows))
+    return _write_matches(s, (ids[ords.astype(np.int64) - 1], chunk_ids, document_ids, scores))
+
+
+def _underfull_controls(s: Session, k: int) -> list[int]:
+    """Active controls with fewer than ``k`` matches, e.g. after documents were deleted."""
+    rows = s.execute(
+        sql_text("""
+            SELECT c.id FROM compliance_controls c
+            LEFT JOIN grc_control_matches m ON m.compliance_control_id = c.id
+            WHERE c.is_active AND c.embedding IS NOT NULL
+            GROUP BY c.id HAVING count(m.chunk_id) < :k
+        """),
+        {"k": k},
+    )
+    return [int(r[0]) for r in rows]
+
+
+def update_coverage(document_ids: Sequence[int] = ()) -> dict[str, Any]:
+    """Bring control matches up to date: embed new or edited controls, rebuild them and
+    controls left short by deleted documents, then merge in ``document_ids``' chunks.
+    """
+    from rag.db import db_session
+
+    settings = get_rag_settings()
+    with tracer.start_as_current_span("grc.update_coverage") as span, db_session() as s:
+        embedded = embed_controls(s, settings)
+        rebuilt = sorted(set(embedded) | set(_underfull_controls(s, settings.grc_coverage_top_k)))
+        if rebuilt:
+            rebuild_control_matches(s, rebuilt, settings)
+        matched = match_documents(s, document_ids, settings)
+        summary = {
+            "embedded_controls": len(embedded),
+            "rebuilt_controls": len(rebuilt),
+            "matches": matched,
+        }
+        span.set_attributes({f"grc.{k}": v for k, v in summary.items()})
+    logger.info("grc_coverage_updated", **summary)
+    return summary
+
+
+def framework_coverage(
+    s: Session, framework: ComplianceFramework, threshold: float, gaps_only: bool = False
+) -> dict[str, Any]:
+    """Per-control coverage of a framework from the stored matches.
+
+    A control is covered when its best match scores at least ``threshold``; its
+    evidence is the documents with matches above the threshold.
+    """
+    evidence = func.array_agg(distinct(ControlMatch.document_id)).filter(
+        ControlMatch.score >= threshold
+    )
+    stmt = (
+        select(
+            ComplianceControl.id,
+            ComplianceControl.control_id,
+            ComplianceControl.title,
+            ComplianceControl.category,
+            func.max(ControlMatch.score),
+            evidence,
+        )
+        .outerjoin(ControlMatch, ControlMatch.compliance_control_id == ComplianceControl.id)
+        .where(ComplianceControl.framework == framework, ComplianceControl.is_active.is_(True))
+        .group_by(ComplianceControl.id)
+        .order_by(ComplianceControl.control_id)
+    )
+    controls = []
+    for pk, control_id, title, category, best, document_ids in s.execute(stmt):
+        controls.append({
+            "id": pk,
+            "control_id": control_id,
+            "title": title,
+            "category": category,
+            "best_score": round(float(best), 4) if best is not None else None,
+            "covered": best is not None and best >= threshold,
+            "document_ids": sorted(document_ids or []),
+        })
+    covered = sum(1 for c in controls if c["covered"])
+    return {
+        "framework": framework.value,
+        "threshold": threshold,
+        "controls": len(controls),
+        "covered": covered,
+        "coverage": round(covered / len(controls), 4) if controls else None,
+        "items": [c for c in controls if not c["covered"]] if gaps_only else controls,
+    }
+
+
+def get_framework_coverage(
+    framework: ComplianceFramework, gaps_only: bool = False
+) -> dict[str, Any]:
+    """``framework_coverage`` at ``GRC_COVERAGE_THRESHOLD``, read from a replica when configured."""
+    from rag.db import read_session
+
+    with read_session() as s:
+        return framework_coverage(
+            s, framework, get_rag_settings().grc_coverage_threshold, gaps_only
+        )
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Callable
+
+from sqlalchemy import func, select
+from sqlalchemy import text as sql_text
+from sqlalchemy.orm import Session
+
+from .ingest import _enum_value
+from .models import DASHBOARD_STATS_REBUILD, DashboardStat, GRCDocument
+
+StatKey = tuple[str, str]
+
+
+def load_stats(s: Session) -> dict[StatKey, DashboardStat]:
+    """All running totals, slots summed; the table size does not grow with the document count."""
+    stmt = select(
+        DashboardStat.dimension,
+        DashboardStat.value,
+        func.sum(DashboardStat.count),
+        func.sum(DashboardStat.compliance_score_sum),
+        func.sum(DashboardStat.compliance_score_count),
+        func.sum(DashboardStat.risk_score_sum),
+        func.sum(DashboardStat.risk_score_count),
+    ).group_by(DashboardStat.dimension, DashboardStat.value)
+    return {
+        (dimension, value): DashboardStat(
+            dimension=dimension,
+            value=value,
+            count=int(count),
+            compliance_score_sum=float(cscore),
+            compliance_score_count=int(ccount),
+            risk_score_sum=float(rscore),
+            risk_score_count=int(rcount),
+        )
+        for dimension, value, count, cscore, ccount, rscore, rcount in s.execute(stmt)
+    }
+
+
+def _average(total: float, count: int) -> float | None:
+    return round(total / count, 4) if count else None
+
+
+def _counts(stats: dict[StatKey, DashboardStat], dimension: str) -> dict[str, int]:
+    return {
+        value: row.count
+        for (dim, value), row in sorted(stats.items())
+        if dim == dimension and row.count > 0
+    }
+
+
+def dashboard_stats(stats: dict[StatKey, DashboardStat]) -> dict[str, Any]:
+    total = stats.get(("all", ""))
+    risks = stats.get(("risk_assessment", ""))
+    frameworks = _counts(stats, "framework")
+    return {
+        "totalDocuments": total.count if total else 0,
+        "complianceScore": _average(total.compliance_score_sum, total.compliance_score_count)
+        if total
+        else None,
+        "averageRiskScore": _average(total.risk_score_sum, total.risk_score_count)
+        if total
+        else None,
+        "riskAssessments": risks.count if risks else 0,
+        "averageAssessedRisk": _average(risks.risk_score_sum, risks.risk_score_count)
+        if risks
+        else None,
+        "activeFrameworks": len(frameworks),
+        "byFramework": frameworks,
+        "byDocumentType": _counts(stats, "document_type"),
+        "byStatus": _counts(stats, "status"),
+        "byRiskLevel": _counts(stats, "risk_level"),
+    }
+
+
+def compliance_status(stats: dict[StatKey, DashboardStat]) -> dict[str, Any]:
+    total = stats.get(("all", ""))
+    frameworks = [
+        {
+            "name": value,
+            "score": _average(row.compliance_score_sum, row.compliance_score_count),
+            "documents": row.count,
+            "averageRiskScore": _average(row.risk_score_sum, row.risk_score_count),
+        }
+        for (dim, value), row in sorted(stats.items())
+        if dim == "framework" and row.count > 0
+    ]
+    return {
+        "overallScore": _average(total.compliance_score_sum, total.compliance_score_count)
+        if total
+        else None,
+        "frameworks": frameworks,
+    }
+
+
+def recent_documents(s: Session, limit: int = 10) -> list[dict[str, Any]]:
+    """Newest GRC documents, read through the ``created_at`` index."""
+    rows = s.execute(
+        select(GRCDocument).order_by(GRCDocument.created_at.desc()).limit(limit)
+    ).scalars()
+    return [
+        {
+            "id": doc.id,
+            "title": doc.title,
+            "documentType": _enum_value(doc.document_type),
+            "framework": _enum_value(doc.compliance_framework),
+            "riskLevel": _enum_value(doc.risk_level),
+            "status": _enum_value(doc.status),
+            "complianceScore": doc.compliance_score,
+            "uploadDate": doc.created_at.isoformat() if doc.created_at else None,
+            "updatedAt": doc.updated_at.isoformat() if doc.updated_at else None,
+        }
+        for doc in rows
+    ]
+
+
+def rebuild_dashboard_stats() -> int:
+    """Recompute the totals from ``grc_documents`` and ``risk_assessments`` (after a restore)."""
+    from rag.db import db_session
+
+    with db_session() as s:
+        # Writers wait until the rebuilt totals are committed, so no trigger update is lost.
+        s.execute(
+            sql_text("LOCK TABLE grc_documents, risk_assessments IN SHARE ROW EXCLUSIVE MODE")
+        )
+        s.execute(sql_text(DASHBOARD_STATS_REBUILD))
+        return int(s.execute(sql_text("SELECT count(*) FROM grc_dashboard_stats")).scalar_one())
+
+
+class ResponseCache:
+    """Serialized JSON responses with their ETag, rebuilt at most once per ``ttl_seconds``."""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._entries: dict[str, tuple[float, bytes, str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, build: Callable[[], object]) -> tuple[bytes, str]:
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1], entry[2]
+        with self._lock:
+            # Another request may have rebuilt it while this one waited.
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1], entry[2]
+            body = json.dumps(build(), separators=(",", ":"), default=str).encode()
+            etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, body, etag)
+            return body, etag
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return "*" in tags or etag in tags
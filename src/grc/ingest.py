@@ -1,101 +1,155 @@
 from __future__ import annotations
 
-import hashlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional
+from typing import Any
 
+from opentelemetry import trace
 from sqlalchemy.orm import Session
 
-from rag.ingest import ingest_file as base_ingest_file
-from rag.models import Document
-from .models import GRCDocument, DocumentAuditLog, ComplianceControl, RiskAssessment
+from mcp_server.logging_config import get_logger
+from rag.ingest import _chunk_text, _embed_chunks, _parse_content, ensure_schema, write_document
+from rag.openai_utils import embed_texts
+from rag.summaries import write_summaries
+
 from .classifier import GRCDocumentClassifier
+from .coverage import update_coverage
+from .models import (
+    ComplianceFramework,
+    DocumentAuditLog,
+    DocumentType,
+    GRCDocument,
+    RiskAssessment,
+    RiskLevel,
+)
+from .status import get_compliance_statuses, invalidate_status
+
+tracer = trace.get_tracer(__name__)
+logger = get_logger(__name__)
 
 
 def ingest_grc_document(
     filename: str, 
     data: bytes, 
     user_id: str,
-    source_path: Optional[str] = None,
-    session: Optional[Session] = None
+    source_path: str | None = None,
+    session: Session | None = None
 ) -> int:
-    """Enhanced document ingestion with GRC classification"""
+    """Enhanced document ingestion with GRC classification
     
-    # First, ingest the document using the base RAG system
-    document_id = base_ingest_file(filename, data, source_path=source_path)
-    
-    # Get the document text for classification
-    from rag.db import db_session
-    from sqlalchemy import text as sql_text
+    The file is parsed once. The LLM analysis (classification plus risk
+    assessment in one call) runs on a worker thread while the chunks are
+    embedded. The same call returns the document summary, which is stored with
+    its embedding for hierarchical retrieval. The document, its chunks and its
+    GRC records are then written in one transaction, after which the new
+    chunks are merged into the control coverage matches.
+    """
     
-    with db_session() as s:
-        # Get document text from chunks
-        sql = sql_text("""
-            SELECT string_agg(text, ' ') as full_text 
-            FROM chunks 
-            WHERE document_id = :doc_id 
-            ORDER BY ordinal
-        """)
-        result = s.execute(sql, {"doc_id": document_id}).fetchone()
-        document_text = result[0] if result else ""
+    with tracer.start_as_current_span("grc.ingest_document") as span:
+        span.set_attributes({"rag.filename": filename, "rag.file_size_bytes": len(data)})
+        content_type, document_text = _parse_content(filename, data)
+        chunks = _chunk_text(document_text)
+        span.set_attribute("rag.chunk_count", len(chunks))
         
-        # Classify the document
         classifier = GRCDocumentClassifier()
-        classification = classifier.classify_document(document_text, filename)
-        
-        # Create GRC document metadata
-        grc_doc = GRCDocument(
-            document_id=document_id,
-            document_type=classification["document_type"],
-            compliance_framework=classification["compliance_framework"],
-            control_id=classification["control_id"],
-            risk_level=classification["risk_level"],
-            title=classification["title"],
-            description=classification["description"],
-            created_by=user_id,
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow()
-        )
-        
-        s.add(grc_doc)
-        s.flush()
-        
-        # Create audit log
-        audit_log = DocumentAuditLog(
-            grc_document_id=grc_doc.id,
-            action="CREATE",
-            user_id=user_id,
-            timestamp=datetime.utcnow(),
-            details=f"Document uploaded and classified as {classification['document_type']} for {classification['compliance_framework']}",
-            ip_address=None  # Could be passed from request context
-        )
-        s.add(audit_log)
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="grc-analyze") as pool:
+            pending = pool.submit(
+                contextvars.copy_context().run, classifier.analyze_document, document_text, filename
+            )
+            with tracer.start_as_current_span("rag.embed_chunks"):
+                embeddings, _ = _embed_chunks(chunks)
+            with tracer.start_as_current_span("grc.await_analysis"):
+                analysis = pending.result()
+        classification = analysis["classification"]
+        risk_assessment = analysis["risk_assessment"]
+        summary = analysis.get("summary") or ""
+        summary_embedding = None
+        if summary:
+            try:
+                summary_embedding = embed_texts([summary])[0]
+            except Exception as exc:  # noqa: BLE001
+                # The document stays unsummarized; `rag summarize` picks it up later.
+                logger.warning("grc_summary_embed_failed", filename=filename, error=str(exc))
         
-        # Extract and store compliance requirements
-        requirements = classifier.extract_compliance_requirements(document_text)
-        for req in requirements:
-            # Store requirements in a separate table or as JSON
-            pass
+        ensure_schema()
+        from rag.db import db_session
         
-        # Perform risk assessment
-        risk_assessment = classifier.assess_risk_factors(document_text)
-        if risk_assessment["risk_factors"]:
-            for risk_factor in risk_assessment["risk_factors"]:
-                risk = RiskAssessment(
-                    grc_document_id=grc_doc.id,
-                    risk_category=risk_factor.get("factor", "General"),
-                    risk_description=risk_factor.get("factor", ""),
-                    likelihood=self._convert_severity_to_score(risk_factor.get("likelihood", "MEDIUM")),
-                    impact=self._convert_severity_to_score(risk_factor.get("impact", "MEDIUM")),
-                    risk_score=risk_assessment.get("overall_risk_score", 0.5) * 5,  # Convert to 1-5 scale
-                    mitigation_strategy="; ".join(risk_assessment.get("mitigation_suggestions", [])),
-                    assessed_by=user_id,
-                    assessed_at=datetime.utcnow()
-                )
-                s.add(risk)
+        with db_session() as s:
+            document_id = write_document(
+                s, filename, content_type, data, source_path, chunks, embeddings
+            )
+            if summary_embedding is not None:
+                write_summaries(s, [(document_id, summary, summary_embedding)])
+            
+            # Create GRC document metadata
+            grc_doc = GRCDocument(
+                document_id=document_id,
+                document_type=classification["document_type"],
+                compliance_framework=classification["compliance_framework"],
+                control_id=classification["control_id"],
+                risk_level=classification["risk_level"],
+                title=classification["title"],
+                description=classification["description"],
+                ai_summary=summary or None,
+                created_by=user_id,
+                created_at=datetime.utcnow(),
+                updated_at=datetime.utcnow()
+            )
+            
+            # The grc_documents_chunk_filters trigger copies its metadata onto the chunks.
+            s.add(grc_doc)
+            s.flush()
+            
+            # Create audit log
+            audit_log = DocumentAuditLog(
+                grc_document_id=grc_doc.id,
+                action="CREATE",
+                user_id=user_id,
+                timestamp=datetime.utcnow(),
+                details=(
+                    f"Document uploaded and classified as {classification['document_type']} "
+                    f"for {classification['compliance_framework']}"
+                ),
+                ip_address=None,  # Could be passed from request context
+            )
+            s.add(audit_log)
+            
+            # Store the risk assessment
+            if risk_assessment["risk_factors"]:
+                for risk_factor in risk_assessment["risk_factors"]:
+                    risk = RiskAssessment(
+                        grc_document_id=grc_doc.id,
+                        risk_category=risk_factor.get("factor", "General"),
+                        risk_description=risk_factor.get("factor", ""),
+                        likelihood=_convert_severity_to_score(
+                            risk_factor.get("likelihood", "MEDIUM")
+                        ),
+                        impact=_convert_severity_to_score(risk_factor.get("impact", "MEDIUM")),
+                        risk_score=risk_assessment.get("overall_risk_score", 0.5)
+                        * 5,  # Convert to 1-5 scale
+                        mitigation_strategy="; ".join(
+                            risk_assessment.get("mitigation_suggestions", [])
+                        ),
+                        assessed_by=user_id,
+                        assessed_at=datetime.utcnow(),
+                    )
+                    s.add(risk)
+            
+            span.set_attribute("rag.document_id", document_id)
+            grc_document_id = grc_doc.id
         
-        s.commit()
-        return grc_doc.id
+        invalidate_status([grc_document_id])
+        try:
+            update_coverage([document_id])
+        except Exception as exc:  # noqa: BLE001
+            # Matches stay stale until the next update; `grc update-coverage` catches up.
+            logger.warning("grc_coverage_update_failed", document_id=document_id, error=str(exc))
+        return grc_document_id
+
+
+def _enum_value(value: Any) -> Any:
+    return getattr(value, "value", value)
 
 
 def _convert_severity_to_score(severity: str) -> int:
@@ -112,15 +166,22 @@ def _convert_severity_to_score(severity: str) -> int:
 def update_document_classification(
     grc_document_id: int,
     user_id: str,
-    document_type: Optional[str] = None,
-    compliance_framework: Optional[str] = None,
-    risk_level: Optional[str] = None,
-    control_id: Optional[str] = None,
-    session: Optional[Session] = None
+    document_type: str | None = None,
+    compliance_framework: str | None = None,
+    risk_level: str | None = None,
+    control_id: str | None = None,
+    session: Session | None = None
 ) -> bool:
-    """Update document classification"""
+    """Update document classification
+
+    Raises ``ValueError`` for a label outside the taxonomy in ``grc.models``.
+    """
     
     from rag.db import db_session
+
+    new_type = DocumentType(document_type) if document_type else None
+    new_framework = ComplianceFramework(compliance_framework) if compliance_framework else None
+    new_risk = RiskLevel(risk_level) if risk_level else None
     
     with db_session() as s:
         grc_doc = s.query(GRCDocument).filter(GRCDocument.id == grc_document_id).first()
@@ -128,12 +189,12 @@ def update_document_classification(
             return False
         
         # Update fields
-        if document_type:
-            grc_doc.document_type = document_type
-        if compliance_framework:
-            grc_doc.compliance_framework = compliance_framework
-        if risk_level:
-            grc_doc.risk_level = risk_level
+        if new_type:
+            grc_doc.document_type = new_type
+        if new_framework:
+            grc_doc.compliance_framework = new_framework
+        if new_risk:
+            grc_doc.risk_level = new_risk
         if control_id:
             grc_doc.control_id = control_id
         
@@ -145,62 +206,21 @@ def update_document_classification(
             action="UPDATE_CLASSIFICATION",
             user_id=user_id,
             timestamp=datetime.utcnow(),
-            details=f"Classification updated: type={document_type}, framework={compliance_framework}, risk={risk_level}",
-            ip_address=None
+            details=(
+                f"Classification updated: type={document_type}, "
+                f"framework={compliance_framework}, risk={risk_level}"
+            ),
+            ip_address=None,
         )
         s.add(audit_log)
         
         s.commit()
-        return True
+    
+    invalidate_status([grc_document_id])
+    return True
 
 
-def get_document_compliance_status(grc_document_id: int) -> dict:
-    """Get comprehensive compliance status for a document"""
+def get_document_compliance_status(grc_document_id: int) -> dict[str, Any]:
+    """Get comprehensive compliance status for a document (one query, cached; see grc.status)"""
     
-    from rag.db import db_session
-    
-    with db_session() as s:
-        grc_doc = s.query(GRCDocument).filter(GRCDocument.id == grc_document_id).first()
-        if not grc_doc:
-            return {}
-        
-        # Get risk assessments
-        risks = s.query(RiskAssessment).filter(RiskAssessment.grc_document_id == grc_document_id).all()
-        
-        # Get audit logs
-        audit_logs = s.query(DocumentAuditLog).filter(
-            DocumentAuditLog.grc_document_id == grc_document_id
-        ).order_by(DocumentAuditLog.timestamp.desc()).limit(10).all()
-        
-        return {
-            "document": {
-                "id": grc_doc.id,
-                "title": grc_doc.title,
-                "type": grc_doc.document_type,
-                "framework": grc_doc.compliance_framework,
-                "risk_level": grc_doc.risk_level,
-                "status": grc_doc.status,
-                "compliance_score": grc_doc.compliance_score,
-                "created_at": grc_doc.created_at,
-                "updated_at": grc_doc.updated_at
-            },
-            "risks": [
-                {
-                    "id": risk.id,
-                    "category": risk.risk_category,
-                    "description": risk.risk_description,
-                    "score": risk.risk_score,
-                    "mitigation": risk.mitigation_strategy
-                }
-                for risk in risks
-            ],
-            "audit_trail": [
-                {
-                    "action": log.action,
-                    "user": log.user_id,
-                    "timestamp": log.timestamp,
-                    "details": log.details
-                }
-                for log in audit_logs
-            ]
-        }
+    return get_compliance_statuses([grc_document_id]).get(grc_document_id, {})
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Optional
+
+from pydantic import BaseModel, Field, field_validator
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from rag.listing import MAX_PAGE_SIZE, keyset, page, stream
+
+from .ingest import _enum_value
+from .models import ComplianceFramework, DocumentStatus, DocumentType, GRCDocument, RiskLevel
+
+if TYPE_CHECKING:
+    from rag.listing import AnySelect
+
+
+class GRCListFilters(BaseModel):
+    """Filters of the GRC document listing; each list matches any of its values."""
+
+    frameworks: Optional[list[ComplianceFramework]] = Field(default=None)
+    document_types: Optional[list[DocumentType]] = Field(default=None)
+    statuses: Optional[list[DocumentStatus]] = Field(default=None)
+    risk_levels: Optional[list[RiskLevel]] = Field(default=None)
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+    @field_validator("frameworks", "document_types", "statuses", "risk_levels", mode="before")
+    @classmethod
+    def _upper(cls, values: Any) -> Any:
+        if values is None:
+            return None
+        return [v.upper() if isinstance(v, str) else v for v in values] or None
+
+
+_COLUMNS = (
+    GRCDocument.id,
+    GRCDocument.document_id,
+    GRCDocument.title,
+    GRCDocument.document_type,
+    GRCDocument.compliance_framework,
+    GRCDocument.risk_level,
+    GRCDocument.status,
+    GRCDocument.control_id,
+    GRCDocument.version,
+    GRCDocument.compliance_score,
+    GRCDocument.risk_score,
+    GRCDocument.effective_date,
+    GRCDocument.created_at,
+    GRCDocument.updated_at,
+)
+
+
+def grc_documents_stmt(
+    filters: Optional[GRCListFilters], cursor: Optional[str] = None
+) -> AnySelect:
+    stmt = select(*_COLUMNS)
+    if filters is not None:
+        for column, values in (
+            (GRCDocument.compliance_framework, filters.frameworks),
+            (GRCDocument.document_type, filters.document_types),
+            (GRCDocument.status, filters.statuses),
+            (GRCDocument.risk_level, filters.risk_levels),
+        ):
+            if values:
+                # A single value compares with = so the (column, created_at, id) index
+                # serves the order too.
+                stmt = stmt.where(column == values[0] if len(values) == 1 else column.in_(values))
+        if filters.created_after is not None:
+            stmt = stmt.where(GRCDocument.created_at >= filters.created_after)
+        if filters.created_before is not None:
+            stmt = stmt.where(GRCDocument.created_at < filters.created_before)
+    return keyset(stmt, GRCDocument.created_at, GRCDocument.id, cursor)
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _grc_document_dict(row: Any) -> dict[str, Any]:
+    return {
+        "id": row.id,
+        "document_id": row.document_id,
+        "title": row.title,
+        "document_type": _enum_value(row.document_type),
+        "compliance_framework": _enum_value(row.compliance_framework),
+        "risk_level": _enum_value(row.risk_level),
+        "status": _enum_value(row.status),
+        "control_id": row.control_id,
+        "version": row.version,
+        "compliance_score": row.compliance_score,
+        "risk_score": row.risk_score,
+        "effective_date": _isoformat(row.effective_date),
+        "created_at": row.created_at.isoformat(),
+        "updated_at": _isoformat(row.updated_at),
+    }
+
+
+def list_grc_documents(
+    s: Session,
+    filters: Optional[GRCListFilters] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> dict[str, Any]:
+    """One page of GRC documents, newest first: ``{"items": [...], "next_cursor": ...}``."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    rows = s.execute(grc_documents_stmt(filters, cursor).limit(limit + 1)).all()
+    return page([_grc_document_dict(r) for r in rows], limit)
+
+
+def iter_grc_documents(
+    s: Session,
+    filters: Optional[GRCListFilters] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Iterator[dict[str, Any]]:
+    """Every matching GRC document after ``cursor``, streamed through a server-side cursor."""
+    return stream(s, grc_documents_stmt(filters, cursor), _grc_document_dict, limit)
@@ -2,10 +2,29 @@ from __future__ import annotations
 
 from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import Any, Optional
 
-from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, String, Text, Enum as SQLEnum, Float, Boolean
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import (
+    DDL,
+    BigInteger,
+    Boolean,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    SmallInteger,
+    String,
+    Text,
+    event,
+)
+from sqlalchemy import Enum as SQLEnum
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+# GRC tables reference ``documents``, so they share the RAG declarative base and metadata.
+from rag.models import EMBEDDING_DIM, Base
 
 
 class ComplianceFramework(str, Enum):
@@ -47,10 +66,6 @@ class DocumentStatus(str, Enum):
     SUPERSEDED = "SUPERSEDED"
 
 
-class Base(DeclarativeBase):
-    pass
-
-
 class GRCDocument(Base):
     __tablename__ = "grc_documents"
 
@@ -59,11 +74,15 @@ class GRCDocument(Base):
     
     # GRC-specific fields
     document_type: Mapped[DocumentType] = mapped_column(SQLEnum(DocumentType), nullable=False)
-    compliance_framework: Mapped[ComplianceFramework] = mapped_column(SQLEnum(ComplianceFramework), nullable=False)
+    compliance_framework: Mapped[ComplianceFramework] = mapped_column(
+        SQLEnum(ComplianceFramework), nullable=False
+    )
     control_id: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
     risk_level: Mapped[RiskLevel] = mapped_column(SQLEnum(RiskLevel), default=RiskLevel.MEDIUM)
-    status: Mapped[DocumentStatus] = mapped_column(SQLEnum(DocumentStatus), default=DocumentStatus.DRAFT)
-    
+    status: Mapped[DocumentStatus] = mapped_column(
+        SQLEnum(DocumentStatus), default=DocumentStatus.DRAFT
+    )
+
     # Metadata
     title: Mapped[str] = mapped_column(String(500), nullable=False)
     description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
@@ -80,11 +99,24 @@ class GRCDocument(Base):
     created_by: Mapped[str] = mapped_column(String(100), nullable=False)
     approved_by: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
     # Relationships
-    document: Mapped["Document"] = relationship("Document", back_populates="grc_metadata")
-    audit_logs: Mapped[list["DocumentAuditLog"]] = relationship(back_populates="grc_document", cascade="all, delete-orphan")
+    document: Mapped[Document] = relationship("Document")
+    audit_logs: Mapped[list[DocumentAuditLog]] = relationship(
+        back_populates="grc_document", cascade="all, delete-orphan"
+    )
+
+    # Keyset pagination newest first, unfiltered and per filter column (see grc.listing)
+    __table_args__ = (
+        Index("ix_grc_documents_created_at_id", "created_at", "id"),
+        Index("ix_grc_documents_framework_created_at", "compliance_framework", "created_at", "id"),
+        Index("ix_grc_documents_type_created_at", "document_type", "created_at", "id"),
+        Index("ix_grc_documents_status_created_at", "status", "created_at", "id"),
+        Index("ix_grc_documents_risk_level_created_at", "risk_level", "created_at", "id"),
+    )
 
 
 class DocumentAuditLog(Base):
@@ -92,30 +124,52 @@ class DocumentAuditLog(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     grc_document_id: Mapped[int] = mapped_column(ForeignKey("grc_documents.id"), nullable=False)
-    
-    action: Mapped[str] = mapped_column(String(100), nullable=False)  # CREATE, UPDATE, DELETE, APPROVE, etc.
+
+    action: Mapped[str] = mapped_column(
+        String(100), nullable=False
+    )  # CREATE, UPDATE, DELETE, APPROVE, etc.
     user_id: Mapped[str] = mapped_column(String(100), nullable=False)
     timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     details: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     ip_address: Mapped[Optional[str]] = mapped_column(String(45), nullable=True)
     
     # Relationships
-    grc_document: Mapped["GRCDocument"] = relationship(back_populates="audit_logs")
+    grc_document: Mapped[GRCDocument] = relationship(back_populates="audit_logs")
+    
+    # Latest entries per document for the status audit trail (see grc.status)
+    __table_args__ = (
+        Index("ix_document_audit_logs_grc_document_id_timestamp", "grc_document_id", "timestamp"),
+    )
 
 
 class ComplianceControl(Base):
     __tablename__ = "compliance_controls"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    framework: Mapped[ComplianceFramework] = mapped_column(SQLEnum(ComplianceFramework), nullable=False)
+    framework: Mapped[ComplianceFramework] = mapped_column(
+        SQLEnum(ComplianceFramework), nullable=False
+    )
     control_id: Mapped[str] = mapped_column(String(100), nullable=False)
     title: Mapped[str] = mapped_column(String(500), nullable=False)
     description: Mapped[str] = mapped_column(Text, nullable=False)
     category: Mapped[str] = mapped_column(String(200), nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     
+    # Embedding of the control text; embedding_sha256 is the hash of the text it was computed from
+    embedding: Mapped[Optional[list[float]]] = mapped_column(Vector(EMBEDDING_DIM), nullable=True)
+    embedding_sha256: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    # Catalog imports upsert on this key (see grc.catalog)
+    __table_args__ = (
+        Index(
+            "uq_compliance_controls_framework_control_id", "framework", "control_id", unique=True
+        ),
+    )
 
 
 class RiskAssessment(Base):
@@ -137,4 +191,267 @@ class RiskAssessment(Base):
     assessed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     
     # Relationships
-    grc_document: Mapped["GRCDocument"] = relationship()
+    grc_document: Mapped[GRCDocument] = relationship()
+    
+    __table_args__ = (
+        Index("ix_risk_assessments_grc_document_id", "grc_document_id"),
+    )
+
+
+class AnalysisCacheEntry(Base):
+    """Raw LLM analysis output keyed by input content, prompt template version and model."""
+
+    __tablename__ = "grc_analysis_cache"
+
+    kind: Mapped[str] = mapped_column(String(32), primary_key=True)
+    content_sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    prompt_version: Mapped[str] = mapped_column(String(16), primary_key=True)
+    model: Mapped[str] = mapped_column(String(100), primary_key=True)
+    result: Mapped[dict[str, Any]] = mapped_column(JSONB, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ControlMatch(Base):
+    """One of the top-k chunks most similar to a control (see grc.coverage)."""
+
+    __tablename__ = "grc_control_matches"
+
+    compliance_control_id: Mapped[int] = mapped_column(
+        ForeignKey("compliance_controls.id", ondelete="CASCADE"), primary_key=True
+    )
+    chunk_id: Mapped[int] = mapped_column(
+        ForeignKey("chunks.id", ondelete="CASCADE"), primary_key=True
+    )
+    document_id: Mapped[int] = mapped_column(
+        ForeignKey("documents.id", ondelete="CASCADE"), nullable=False
+    )
+    score: Mapped[float] = mapped_column(Float, nullable=False)
+    matched_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_grc_control_matches_control_score", "compliance_control_id", "score"),
+        Index("ix_grc_control_matches_document_id", "document_id"),
+    )
+
+
+class DashboardStat(Base):
+    """Running totals behind the dashboard endpoints, maintained by triggers (see grc.dashboard).
+
+    Each ``(dimension, value)`` is spread over up to ``DASHBOARD_STATS_SLOTS``
+    rows that readers sum: dimension ``all`` (value ``""``), ``framework``,
+    ``document_type``, ``status`` and ``risk_level`` count GRC documents and sum
+    their scores; ``risk_assessment`` counts risk assessments. A trigger adds to
+    the slot of its database backend, so concurrent writers rarely wait on the
+    same row.
+    """
+
+    __tablename__ = "grc_dashboard_stats"
+
+    dimension: Mapped[str] = mapped_column(String(32), primary_key=True)
+    value: Mapped[str] = mapped_column(String(64), primary_key=True)
+    slot: Mapped[int] = mapped_column(SmallInteger, primary_key=True, default=0, server_default="0")
+    count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    compliance_score_sum: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    compliance_score_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    risk_score_sum: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    risk_score_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+# Rows per dashboard total. Every write used to update the single ('all', '') row,
+# so concurrent writers queued on its row lock; with slots they only do so when
+# their backend pids fall into the same slot.
+DASHBOARD_STATS_SLOTS = 16
+
+DASHBOARD_STATS_FUNCTIONS = f"""
+CREATE OR REPLACE FUNCTION grc_dashboard_bump(
+    dim text, val text, delta integer, cscore double precision, rscore double precision
+) RETURNS void AS $$
+BEGIN
+    INSERT INTO grc_dashboard_stats AS t
+        (dimension, value, slot, count,
+         compliance_score_sum, compliance_score_count, risk_score_sum, risk_score_count)
+    VALUES (
+        dim, coalesce(val, ''), pg_backend_pid() % {DASHBOARD_STATS_SLOTS}, delta,
+        coalesce(cscore, 0) * delta, CASE WHEN cscore IS NULL THEN 0 ELSE delta END,
+        coalesce(rscore, 0) * delta, CASE WHEN rscore IS NULL THEN 0 ELSE delta END
+    )
+    ON CONFLICT (dimension, value, slot) DO UPDATE SET
+        count = t.count + EXCLUDED.count,
+        compliance_score_sum = t.compliance_score_sum + EXCLUDED.compliance_score_sum,
+        compliance_score_count = t.compliance_score_count + EXCLUDED.compliance_score_count,
+        risk_score_sum = t.risk_score_sum + EXCLUDED.risk_score_sum,
+        risk_score_count = t.risk_score_count + EXCLUDED.risk_score_count;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION grc_dashboard_documents() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND
+        (OLD.compliance_framework, OLD.document_type, OLD.status, OLD.risk_level,
+         OLD.compliance_score, OLD.risk_score)
+        IS NOT DISTINCT FROM
+        (NEW.compliance_framework, NEW.document_type, NEW.status, NEW.risk_level,
+         NEW.compliance_score, NEW.risk_score)
+    THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM grc_dashboard_bump('all', '', -1, OLD.compliance_score, OLD.risk_score);
+        PERFORM grc_dashboard_bump(
+            'framework', OLD.compliance_framework::text, -1, OLD.compliance_score, OLD.risk_score
+        );
+        PERFORM grc_dashboard_bump(
+            'document_type', OLD.document_type::text, -1, OLD.compliance_score, OLD.risk_score
+        );
+        PERFORM grc_dashboard_bump(
+            'status', OLD.status::text, -1, OLD.compliance_score, OLD.risk_score
+        );
+        PERFORM grc_dashboard_bump(
+            'risk_level', OLD.risk_level::text, -1, OLD.compliance_score, OLD.risk_score
+        );
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM grc_dashboard_bump('all', '', 1, NEW.compliance_score, NEW.risk_score);
+        PERFORM grc_dashboard_bump(
+            'framework', NEW.compliance_framework::text, 1, NEW.compliance_score, NEW.risk_score
+        );
+        PERFORM grc_dashboard_bump(
+            'document_type', NEW.document_type::text, 1, NEW.compliance_score, NEW.risk_score
+        );
+        PERFORM grc_dashboard_bump(
+            'status', NEW.status::text, 1, NEW.compliance_score, NEW.risk_score
+        );
+        PERFORM grc_dashboard_bump(
+            'risk_level', NEW.risk_level::text, 1, NEW.compliance_score, NEW.risk_score
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION grc_dashboard_risks() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM grc_dashboard_bump('risk_assessment', '', -1, NULL, OLD.risk_score);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM grc_dashboard_bump('risk_assessment', '', 1, NULL, NEW.risk_score);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Recompute every total from the source tables into slot 0; also the backfill when the
+# triggers are first created.
+DASHBOARD_STATS_REBUILD = """
+DELETE FROM grc_dashboard_stats;
+INSERT INTO grc_dashboard_stats
+    (dimension, value, count,
+     compliance_score_sum, compliance_score_count, risk_score_sum, risk_score_count)
+SELECT d.dimension, coalesce(d.value, ''), count(*),
+       coalesce(sum(g.compliance_score), 0), count(g.compliance_score),
+       coalesce(sum(g.risk_score), 0), count(g.risk_score)
+FROM grc_documents g
+CROSS JOIN LATERAL (VALUES
+    ('all', ''),
+    ('framework', g.compliance_framework::text),
+    ('document_type', g.document_type::text),
+    ('status', g.status::text),
+    ('risk_level', g.risk_level::text)
+) AS d(dimension, value)
+GROUP BY d.dimension, coalesce(d.value, '');
+INSERT INTO grc_dashboard_stats
+    (dimension, value, count,
+     compliance_score_sum, compliance_score_count, risk_score_sum, risk_score_count)
+SELECT 'risk_assessment', '', count(*), 0, 0, coalesce(sum(risk_score), 0), count(risk_score)
+FROM risk_assessments
+HAVING count(*) > 0;
+"""
+
+DASHBOARD_STATS_TRIGGERS = f"""
+{DASHBOARD_STATS_FUNCTIONS}
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'grc_documents_dashboard_stats') THEN
+        LOCK TABLE grc_documents, risk_assessments IN SHARE ROW EXCLUSIVE MODE;
+        CREATE TRIGGER grc_documents_dashboard_stats
+            AFTER INSERT OR UPDATE OR DELETE ON grc_documents
+            FOR EACH ROW EXECUTE FUNCTION grc_dashboard_documents();
+        CREATE TRIGGER risk_assessments_dashboard_stats
+            AFTER INSERT OR UPDATE OR DELETE ON risk_assessments
+            FOR EACH ROW EXECUTE FUNCTION grc_dashboard_risks();
+        {DASHBOARD_STATS_REBUILD}
+    END IF;
+END $$;
+"""
+
+# After all tables exist: the triggers reference grc_documents and risk_assessments.
+event.listen(
+    Base.metadata, "after_create", DDL(DASHBOARD_STATS_TRIGGERS)  # type: ignore[no-untyped-call]
+)
+
+# Keeps the filter columns of ``chunks`` (see rag.filters) equal to their GRC document's
+# metadata on every write, including direct SQL, so status filters never go stale.
+CHUNK_FILTERS_FUNCTION = """
+CREATE OR REPLACE FUNCTION grc_chunk_filters() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE'
+        OR (TG_OP = 'UPDATE' AND OLD.document_id IS DISTINCT FROM NEW.document_id)
+    THEN
+        UPDATE chunks
+        SET compliance_framework = NULL, document_type = NULL,
+            doc_status = NULL, effective_date = NULL
+        WHERE document_id = OLD.document_id;
+    END IF;
+    IF TG_OP = 'DELETE' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'UPDATE' AND
+        (OLD.document_id, OLD.compliance_framework, OLD.document_type, OLD.status,
+         OLD.effective_date)
+        IS NOT DISTINCT FROM
+        (NEW.document_id, NEW.compliance_framework, NEW.document_type, NEW.status,
+         NEW.effective_date)
+    THEN
+        RETURN NULL;
+    END IF;
+    UPDATE chunks
+    SET compliance_framework = NEW.compliance_framework::text,
+        document_type = NEW.document_type::text,
+        doc_status = coalesce(NEW.status::text, 'DRAFT'),
+        effective_date = NEW.effective_date
+    WHERE document_id = NEW.document_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Copy every GRC document's metadata onto its chunks; the backfill when the trigger is created.
+CHUNK_FILTERS_BACKFILL = """
+UPDATE chunks c
+SET compliance_framework = g.compliance_framework::text,
+    document_type = g.document_type::text,
+    doc_status = coalesce(g.status::text, 'DRAFT'),
+    effective_date = g.effective_date
+FROM grc_documents g
+WHERE g.document_id = c.document_id;
+"""
+
+CHUNK_FILTERS_TRIGGER = f"""
+{CHUNK_FILTERS_FUNCTION}
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'grc_documents_chunk_filters') THEN
+        LOCK TABLE grc_documents IN SHARE ROW EXCLUSIVE MODE;
+        CREATE TRIGGER grc_documents_chunk_filters
+            AFTER INSERT OR UPDATE OR DELETE ON grc_documents
+            FOR EACH ROW EXECUTE FUNCTION grc_chunk_filters();
+        {CHUNK_FILTERS_BACKFILL}
+    END IF;
+END $$;
+"""
+
+event.listen(
+    Base.metadata, "after_create", DDL(CHUNK_FILTERS_TRIGGER)  # type: ignore[no-untyped-call]
+)
@@ -0,0 +1,364 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, TextIO
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from mcp_server.logging_config import get_logger
+from rag.ingest import load_document_texts
+from rag.models import Document
+
+from .classifier import (
+    CLASSIFY_PROMPT,
+    GRCDocumentClassifier,
+    _classification_from,
+    chat_request,
+    classification_fields,
+)
+from .ingest import _enum_value
+from .models import DocumentAuditLog, GRCDocument
+from .status import invalidate_status
+
+logger = get_logger(__name__)
+
+# Chunk text read per document: enough for the classification prompt.
+TEXT_CHARS = 2000
+BATCH_CUSTOM_ID_PREFIX = "grc-"
+
+
+@dataclass
+class Candidate:
+    """A GRC document selected for reclassification, with its current labels."""
+
+    id: int
+    document_id: int
+    filename: str
+    document_type: str
+    compliance_framework: str
+    risk_level: str
+
+
+class RateLimiter:
+    """Spaces out calls to at most ``per_minute`` across threads (0 disables)."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class ReclassifyCheckpoint:
+    """Progress of a reclassification run in a JSON file, advanced after each committed batch.
+
+    Documents are processed in id order, so ``last_id`` is a high-water mark: a
+    resumed run only selects documents with a larger id.
+    """
+
+    def __init__(self, path: Path | None):
+        self.path = path
+        self.state = {"last_id": 0, "processed": 0, "changed": 0, "failed": 0}
+        if path is not None and path.exists():
+            self.state.update(json.loads(path.read_text()))
+
+    @property
+    def last_id(self) -> int:
+        return int(self.state["last_id"])
+
+    def advance(self, last_id: int, processed: int, changed: int, failed: int) -> None:
+        self.state["last_id"] = last_id
+        self.state["processed"] += processed
+        self.state["changed"] += changed
+        self.state["failed"] += failed
+        if self.path is None:
+            return
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(self.state))
+        os.replace(tmp, self.path)
+
+
+def select_candidates(
+    s: Session,
+    *,
+    frameworks: Sequence[str] = (),
+    document_types: Sequence[str] = (),
+    statuses: Sequence[str] = (),
+    ids: Sequence[int] = (),
+    after_id: int = 0,
+    limit: int | None = None,
+) -> list[Candidate]:
+    """GRC documents matching the filters with ``id > after_id``, in id order."""
+    stmt = (
+        select(
+            GRCDocument.id,
+            GRCDocument.document_id,
+            Document.filename,
+            GRCDocument.document_type,
+            GRCDocument.compliance_framework,
+            GRCDocument.risk_level,
+        )
+        .join(Document, Document.id == GRCDocument.document_id)
+        .where(GRCDocument.id > after_id)
+        .order_by(GRCDocument.id)
+    )
+    if frameworks:
+        stmt = stmt.where(GRCDocument.compliance_framework.in_(frameworks))
+    if document_types:
+        stmt = stmt.where(GRCDocument.document_type.in_(document_types))
+    if statuses:
+        stmt = stmt.where(GRCDocument.status.in_(statuses))
+    if ids:
+        stmt = stmt.where(GRCDocument.id.in_(ids))
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return [
+        Candidate(r[0], r[1], r[2], _enum_value(r[3]), _enum_value(r[4]), _enum_value(r[5]))
+        for r in s.execute(stmt)
+    ]
+
+
+def apply_classifications(
+    s: Session,
+    candidates: Sequence[Candidate],
+    classifications: dict[int, dict[str, Any]],
+    user_id: str,
+) -> int:
+    """Write changed labels and audit entries as two bulk statements.
+
+    ``classifications`` maps GRC document id to a validated classification. The
+    grc_documents_chunk_filters trigger copies the new labels onto the chunks.
+    Returns the number of documents whose labels changed.
+    """
+    now = datetime.utcnow()
+    updates, audits = [], []
+    for c in candidates:
+        new = classifications.get(c.id)
+        if new is None:
+            continue
+        labels = {
+            "document_type": _enum_value(new["document_type"]),
+            "compliance_framework": _enum_value(new["compliance_framework"]),
+            "risk_level": _enum_value(new["risk_level"]),
+        }
+        old = {
+            "document_type": c.document_type,
+            "compliance_framework": c.compliance_framework,
+            "risk_level": c.risk_level,
+        }
+        if labels == old:
+            continue
+        updates.append({"id": c.id, **labels, "updated_at": now})
+        changes = ", ".join(f"{k}: {old[k]} -> {labels[k]}" for k in labels if labels[k] != old[k])
+        audits.append({
+            "grc_document_id": c.id,
+            "action": "RECLASSIFY",
+            "user_id": user_id,
+            "timestamp": now,
+            "details": f"Bulk reclassification: {changes}",
+            "ip_address": None,
+        })
+    if not updates:
+        return 0
+    s.execute(update(GRCDocument), updates)
+    s.execute(insert(DocumentAuditLog), audits)
+    return len(updates)
+
+
+def reclassify(
+    *,
+    user_id: str = "system",
+    frameworks: Sequence[str] = (),
+    document_types: Sequence[str] = (),
+    statuses: Sequence[str] = (),
+    ids: Sequence[int] = (),
+    limit: int | None = None,
+    concurrency: int = 8,
+    requests_per_minute: float = 300,
+    batch_size: int = 100,
+    checkpoint: ReclassifyCheckpoint | None = None,
+    classifier: GRCDocumentClassifier | None = None,
+) -> dict[str, Any]:
+    """Re-run classification over selected GRC documents, resuming from ``checkpoint``.
+
+    Each batch of ``batch_size`` documents is classified by ``concurrency``
+    threads sharing one rate limit, then its changes are committed in one
+    transaction before the checkpoint advances. Documents whose classification
+    fails keep their labels and are counted as failed.
+    """
+    from rag.db import db_session
+
+    checkpoint = checkpoint or ReclassifyCheckpoint(None)
+    classifier = classifier or GRCDocumentClassifier(rate_limiter=RateLimiter(requests_per_minute))
+    remaining = limit
+    start = time.perf_counter()
+    processed = 0
+
+    def classify(item: tuple[Candidate, str]) -> tuple[int, dict[str, Any] | None]:
+        candidate, text = item
+        try:
+            return candidate.id, classifier.classify_strict(text, candidate.filename)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("grc_reclassify_failed", grc_document_id=candidate.id, error=str(exc))
+            return candidate.id, None
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, concurrency), thread_name_prefix="grc-reclassify"
+    ) as pool:
+        while remaining is None or remaining > 0:
+            take = batch_size if remaining is None else min(batch_size, remaining)
+            with db_session() as s:
+                batch = select_candidates(
+                    s, frameworks=frameworks, document_types=document_types, statuses=statuses,
+                    ids=ids, after_id=checkpoint.last_id, limit=take,
+                )
+                texts = load_document_texts(s, [c.document_id for c in batch], TEXT_CHARS)
+            if not batch:
+                break
+            results = dict(pool.map(classify, [(c, texts.get(c.document_id, "")) for c in batch]))
+            classified = {k: v for k, v in results.items() if v is not None}
+            with db_session() as s:
+                changed = apply_classifications(s, batch, classified, user_id)
+            invalidate_status([c.id for c in batch])
+            checkpoint.advance(batch[-1].id, len(batch), changed, len(batch) - len(classified))
+            processed += len(batch)
+            if remaining is not None:
+                remaining -= len(batch)
+            logger.info(
+                "grc_reclassify_batch", last_id=batch[-1].id, changed=changed, **checkpoint.state
+            )
+
+    elapsed = time.perf_counter() - start
+    return {
+        **checkpoint.state,
+        "seconds": round(elapsed, 3),
+        "docs_per_second": round(processed / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def write_batch_requests(
+    out: TextIO, candidates: Iterable[Candidate], texts: dict[int, str]
+) -> int:
+    """Write one Batch API request line per candidate; returns the count."""
+    count = 0
+    for c in candidates:
+        body = chat_request(
+            CLASSIFY_PROMPT, **classification_fields(texts.get(c.document_id, ""), c.filename)
+        )
+        line = {
+            "custom_id": f"{BATCH_CUSTOM_ID_PREFIX}{c.id}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": body,
+        }
+        out.write(json.dumps(line) + "\n")
+        count += 1
+    return count
+
+
+def read_batch_results(path: Path) -> dict[int, dict[str, Any]]:
+    """Validated classifications by GRC document id from a Batch API output file.
+
+    Errored or unparseable lines are skipped with a warning.
+    """
+    out: dict[int, dict[str, Any]] = {}
+    with path.open() as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            custom_id = str(item.get("custom_id", ""))
+            try:
+                response = item.get("response") or {}
+                if response.get("status_code") != 200:
+                    raise ValueError(item.get("error") or f"status {response.get('status_code')}")
+                content = response["body"]["choices"][0]["message"]["content"]
+                out[int(custom_id[len(BATCH_CUSTOM_ID_PREFIX) :])] = _classification_from(
+                    json.loads(content), ""
+                )
+            except Exception as exc:  # noqa: BLE001
+                logger.warning(
+                    "grc_reclassify_batch_result_skipped", custom_id=custom_id, error=str(exc)
+                )
+    return out
+
+
+def run_batch_locally(requests_path: Path, results_path: Path, client: Any = None) -> int:
+    """Stand-in for the Batch API: run a request file through chat completions."""
+    from rag.openai_utils import _client
+
+    client = client or _client()
+    count = 0
+    with requests_path.open() as src, results_path.open("w") as dst:
+        for line in src:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            try:
+                response = client.chat.completions.create(**request["body"])
+                result = {
+                    "custom_id": request["custom_id"],
+                    "response": {"status_code": 200, "body": response.model_dump()},
+                    "error": None,
+                }
+            except Exception as exc:  # noqa: BLE001
+                result = {"custom_id": request["custom_id"], "response": None, "error": str(exc)}
+            dst.write(json.dumps(result) + "\n")
+            count += 1
+    return count
+
+
+def apply_batch_results(
+    path: Path, user_id: str = "system", batch_size: int = 1000
+) -> dict[str, Any]:
+    """Apply a Batch API output file to the selected documents in bulk transactions."""
+    from rag.db import db_session
+
+    results = read_batch_results(path)
+    ids = sorted(results)
+    changed = 0
+    for i in range(0, len(ids), batch_size):
+        chunk = ids[i : i + batch_size]
+        with db_session() as s:
+            candidates = select_candidates(s, ids=chunk)
+            changed += apply_classifications(s, candidates, results, user_id)
+        invalidate_status(chunk)
+    return {"results": len(results), "changed": changed}
+
+
+def export_batch_requests(
+    path: Path, limit: int | None = None, batch_size: int = 1000, **filters: Any
+) -> int:
+    """Write Batch API requests for the documents matching ``filters`` (``select_candidates``)."""
+    from rag.db import read_session
+
+    count, after_id = 0, 0
+    with path.open("w") as out:
+        while limit is None or count < limit:
+            take = batch_size if limit is None else min(batch_size, limit - count)
+            with read_session() as s:
+                batch = select_candidates(s, after_id=after_id, limit=take, **filters)
+                texts = load_document_texts(s, [c.document_id for c in batch], TEXT_CHARS)
+            if not batch:
+                break
+            count += write_batch_requests(out, batch, texts)
+            after_id = batch[-1].id
+    return count
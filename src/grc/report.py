@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import contextvars
+import json
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any
+
+from opentelemetry import trace
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from mcp_server.logging_config import get_logger
+from rag.ingest import load_document_texts
+from rag.settings import get_rag_settings
+
+from .classifier import complete_json
+from .ingest import _enum_value
+from .models import ComplianceFramework, DocumentStatus, GRCDocument
+
+tracer = trace.get_tracer(__name__)
+logger = get_logger(__name__)
+
+# Map and reduce prompts are cached like other analyses (kind "report_map" / "report_reduce"),
+# so regenerating a report only re-runs the map step of documents whose text or labels changed.
+MAP_PROMPT = """
+        You are a GRC auditor assessing one document against the {framework} framework.
+
+        Document: {title} ({document_type})
+        Content:
+        {text}
+
+        Return a JSON object with this structure:
+        {{
+            "summary": "two or three sentences on what the document establishes",
+            "controls_addressed": ["{framework} controls or requirements the document implements"],
+            "gaps": ["{framework} requirements the document misses or covers inadequately"],
+            "risks": ["risks created by those gaps"],
+            "recommendations": ["specific actions to close the gaps"],
+            "compliance_score": 0.0
+        }}
+
+        compliance_score is between 0 and 1: how fully this document meets the
+        {framework} requirements within its scope. Only use the content above.
+        """
+
+REDUCE_PROMPT = """
+        You are writing the executive summary of a {framework} compliance report.
+
+        Overall compliance score: {score}
+        Per-document findings (JSON):
+        {findings}
+
+        Return a JSON object with this structure:
+        {{
+            "executive_summary": "one paragraph on the overall compliance posture",
+            "key_findings": ["up to five most important findings"],
+            "recommendations": ["up to five prioritized recommendations"]
+        }}
+        """
+
+_EXCLUDED_STATUSES = (DocumentStatus.ARCHIVED, DocumentStatus.SUPERSEDED)
+
+
+@dataclass
+class ReportDocument:
+    grc_document_id: int
+    document_id: int
+    title: str
+    document_type: str
+
+
+def select_report_documents(
+    s: Session, framework: ComplianceFramework, grc_document_ids: Sequence[int], limit: int
+) -> list[ReportDocument]:
+    """The requested GRC documents, or the framework's current documents when none are given."""
+    stmt = select(
+        GRCDocument.id, GRCDocument.document_id, GRCDocument.title, GRCDocument.document_type
+    )
+    if grc_document_ids:
+        stmt = stmt.where(GRCDocument.id.in_(grc_document_ids))
+    else:
+        stmt = stmt.where(
+            GRCDocument.compliance_framework == framework,
+            GRCDocument.status.not_in(_EXCLUDED_STATUSES),
+        )
+    stmt = stmt.order_by(GRCDocument.id).limit(limit)
+    return [ReportDocument(r[0], r[1], r[2], _enum_value(r[3])) for r in s.execute(stmt)]
+
+
+def maturity_level(score: float | None) -> str:
+    if score is None:
+        return "UNKNOWN"
+    if score >= 0.8:
+        return "ADVANCED"
+    if score >= 0.5:
+        return "DEVELOPING"
+    return "BASIC"
+
+
+def _map_document(
+    client: Any, framework: ComplianceFramework, doc: ReportDocument, text: str
+) -> dict[str, Any]:
+    with tracer.start_as_current_span("grc.report_map") as span:
+        span.set_attribute("grc.document_id", doc.grc_document_id)
+        data = complete_json(
+            client,
+            "report_map",
+            MAP_PROMPT,
+            framework=framework.value,
+            title=doc.title,
+            document_type=doc.document_type,
+            text=text,
+        )
+        if data is None:
+            raise ValueError("Empty analysis response")
+        score = data.get("compliance_score")
+        data["compliance_score"] = min(1.0, max(0.0, float(score))) if score is not None else None
+        return data
+
+
+def _merge_items(analyses: dict[int, dict[str, Any]], field: str) -> list[dict[str, Any]]:
+    """Union of one list field across documents, deduplicated ignoring case, most common first."""
+    merged: dict[str, dict[str, Any]] = {}
+    for grc_id, analysis in analyses.items():
+        for item in analysis.get(field) or []:
+            entry = merged.setdefault(
+                str(item).strip().casefold(), {"item": str(item).strip(), "grc_document_ids": []}
+            )
+            if grc_id not in entry["grc_document_ids"]:
+                entry["grc_document_ids"].append(grc_id)
+    return sorted(merged.values(), key=lambda e: -len(e["grc_document_ids"]))
+
+
+def stream_compliance_report(
+    framework: ComplianceFramework, grc_document_ids: Sequence[int], client: Any = None
+) -> Iterator[dict[str, Any]]:
+    """Generate a compliance report as a sequence of sections.
+
+    Yields a ``scope`` section, one ``document`` section per map result as soon
+    as it finishes (analyses run on ``GRC_REPORT_CONCURRENCY`` threads), a
+    ``coverage`` section merged from those results, and a ``summary`` section
+    written by a single reduce call.
+    """
+    from rag.db import read_session
+    from rag.openai_utils import _client
+
+    settings = get_rag_settings()
+    client = client or _client()
+    with tracer.start_as_current_span("grc.compliance_report") as span:
+        span.set_attribute("grc.framework", framework.value)
+        with read_session() as s:
+            docs = select_report_documents(
+                s, framework, grc_document_ids, settings.grc_report_max_documents
+            )
+            texts = load_document_texts(
+                s, [d.document_id for d in docs], settings.grc_report_document_chars
+            )
+        span.set_attribute("grc.report_documents", len(docs))
+        yield {
+            "section": "scope",
+            "framework": framework.value,
+            "documents": [{"grc_document_id": d.grc_document_id, "title": d.title} for d in docs],
+        }
+
+        analyses: dict[int, dict[str, Any]] = {}
+        if docs:
+            with ThreadPoolExecutor(
+                max_workers=max(1, min(settings.grc_report_concurrency, len(docs))),
+                thread_name_prefix="grc-report",
+            ) as pool:
+                futures = {
+                    pool.submit(
+                        contextvars.copy_context().run,
+                        _map_document, client, framework, d, texts.get(d.document_id, ""),
+                    ): d
+                    for d in docs
+                }
+                for future in as_completed(futures):
+                    doc = futures[future]
+                    section = {
+                        "section": "document",
+                        "grc_document_id": doc.grc_document_id,
+                        "title": doc.title,
+                    }
+                    try:
+                        analyses[doc.grc_document_id] = future.result()
+                        section["analysis"] = analyses[doc.grc_document_id]
+                    except Exception as exc:  # noqa: BLE001
+                        logger.warning(
+                            "grc_report_map_failed",
+                            grc_document_id=doc.grc_document_id,
+                            error=str(exc),
+                        )
+                        section["error"] = str(exc)
+                    yield section
+
+        scores = [
+            a["compliance_score"]
+            for a in analyses.values()
+            if a.get("compliance_score") is not None
+        ]
+        score = round(sum(scores) / len(scores), 3) if scores else None
+        yield {
+            "section": "coverage",
+            "compliance_score": score,
+            "maturity_level": maturity_level(score),
+            "controls_addressed": _merge_items(analyses, "controls_addressed"),
+            "gaps": _merge_items(analyses, "gaps"),
+            "risks": _merge_items(analyses, "risks"),
+        }
+
+        summary = {"executive_summary": "", "key_findings": [], "recommendations": []}
+        if analyses:
+            findings = {
+                str(grc_id): {
+                    k: a.get(k)
+                    for k in ("summary", "gaps", "risks", "recommendations", "compliance_score")
+                }
+                for grc_id, a in sorted(analyses.items())
+            }
+            with tracer.start_as_current_span("grc.report_reduce"):
+                try:
+                    summary.update(
+                        complete_json(
+                            client,
+                            "report_reduce",
+                            REDUCE_PROMPT,
+                            framework=framework.value,
+                            score=str(score),
+                            findings=json.dumps(findings, sort_keys=True),
+                        )
+                        or {}
+                    )
+                except Exception as exc:  # noqa: BLE001
+                    logger.warning("grc_report_reduce_failed", error=str(exc))
+        yield {"section": "summary", **summary}
+
+
+def build_compliance_report(
+    framework: ComplianceFramework, sections: Iterable[dict[str, Any]]
+) -> dict[str, Any]:
+    """Collect streamed sections into the ``GRCAgent.generate_compliance_report`` result."""
+    by_name: dict[str, dict[str, Any]] = {}
+    documents = []
+    for section in sections:
+        if section["section"] == "document":
+            documents.append(section)
+        else:
+            by_name[section["section"]] = section
+    coverage = by_name.get("coverage", {})
+    summary = by_name.get("summary", {})
+
+    lines = [f"# {framework.value} Compliance Report", "", summary.get("executive_summary") or ""]
+    for title, items in (
+        ("Controls addressed", coverage.get("controls_addressed", [])),
+        ("Gaps", coverage.get("gaps", [])),
+        ("Risks", coverage.get("risks", [])),
+    ):
+        if items:
+            lines += ["", f"## {title}"] + [
+                f"- {e['item']} (documents {e['grc_document_ids']})" for e in items
+            ]
+    if summary.get("recommendations"):
+        lines += ["", "## Recommendations"] + [f"- {r}" for r in summary["recommendations"]]
+
+    return {
+        "framework": framework.value,
+        "report": "\n".join(lines).strip(),
+        "compliance_score": coverage.get("compliance_score"),
+        "maturity_level": coverage.get("maturity_level", "UNKNOWN"),
+        "key_findings": summary.get("key_findings", []),
+        "recommendations": summary.get("recommendations", []),
+        "coverage": {k: v for k, v in coverage.items() if k != "section"},
+        "documents": [{k: v for k, v in d.items() if k != "section"} for d in documents],
+    }
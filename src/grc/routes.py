@@ -1,20 +1,43 @@
 from __future__ import annotations
 
-from typing import List, Optional
+import json
+from typing import Callable, Optional, TypeVar
+
 from fastmcp import FastMCP
-from starlette.responses import JSONResponse
-from starlette.requests import Request
 from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+
+from mcp_server.logging_config import get_logger
+from rag.filters import RetrievalFilters
+from rag.listing import listing_response
+from rag.settings import get_rag_settings
 
-from .ingest import ingest_grc_document, update_document_classification, get_document_compliance_status
 from .agent import GRCAgent
+from .coverage import get_framework_coverage
+from .dashboard import (
+    ResponseCache,
+    compliance_status,
+    dashboard_stats,
+    etag_matches,
+    load_stats,
+    recent_documents,
+)
+from .ingest import (
+    get_document_compliance_status,
+    ingest_grc_document,
+    update_document_classification,
+)
+from .listing import GRCListFilters, iter_grc_documents, list_grc_documents
 from .models import ComplianceFramework, DocumentType, RiskLevel
-from mcp_server.logging_config import get_logger
+from .status import MAX_BATCH_IDS, get_compliance_status_batch
 
 
 class GRCQueryRequest(BaseModel):
     question: str = Field(min_length=1, max_length=4000)
-    context_documents: Optional[List[int]] = Field(default=None)
+    context_documents: Optional[list[int]] = Field(default=None)
+    filters: Optional[RetrievalFilters] = Field(default=None)
 
 
 class DocumentClassificationRequest(BaseModel):
@@ -24,18 +47,47 @@ class DocumentClassificationRequest(BaseModel):
     control_id: Optional[str] = Field(default=None)
 
 
+class ComplianceStatusBatchRequest(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=MAX_BATCH_IDS)
+
+
 class ComplianceReportRequest(BaseModel):
     framework: str = Field(min_length=1)
-    document_ids: List[int] = Field(default_factory=list)
+    document_ids: list[int] = Field(default_factory=list)
+    stream: bool = Field(default=False)
+
+
+def _cached_json(
+    request: Request, cache: ResponseCache, key: str, build: Callable[[], object]
+) -> Response:
+    """Serve ``build()`` from the short-TTL cache, answering 304 when the client's ETag matches"""
+    body, etag = cache.get(key, build)
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={int(cache.ttl_seconds)}"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+T = TypeVar("T")
+
+
+def _read_stats(build: Callable[[Session], T]) -> Callable[[], T]:
+    from rag.db import read_session
+
+    def run() -> T:
+        with read_session() as s:
+            return build(s)
+    return run
 
 
 def register_grc_routes(app: FastMCP) -> None:
     """Register GRC-specific routes"""
     logger = get_logger(__name__)
     grc_agent = GRCAgent()
+    dashboard_cache = ResponseCache(get_rag_settings().grc_dashboard_cache_ttl)
     
     @app.custom_route("/grc/upload", methods=["POST"])
-    async def upload_grc_document(request: Request):
+    async def upload_grc_document(request: Request) -> Response:
         """Upload and classify GRC documents"""
         try:
             form = await request.form()
@@ -66,7 +118,7 @@ def register_grc_routes(app: FastMCP) -> None:
             return JSONResponse({"error": str(e)}, status_code=500)
     
     @app.custom_route("/grc/query", methods=["POST"])
-    async def query_grc(request: Request):
+    async def query_grc(request: Request) -> Response:
         """Query GRC documents with specialized AI agent"""
         try:
             data = await request.json()
@@ -74,7 +126,8 @@ def register_grc_routes(app: FastMCP) -> None:
             
             result = grc_agent.answer_grc_question(
                 question=payload.question,
-                context_documents=payload.context_documents
+                context_documents=payload.context_documents,
+                filters=payload.filters
             )
             
             logger.info("grc_query", question_length=len(payload.question))
@@ -84,8 +137,32 @@ def register_grc_routes(app: FastMCP) -> None:
             logger.error("grc_query_error", error=str(e))
             return JSONResponse({"error": str(e)}, status_code=500)
     
+    @app.custom_route("/grc/documents", methods=["GET"])
+    async def list_documents(request: Request) -> Response:
+        """Keyset-paginated GRC documents, newest first; ?format=jsonl streams all matches"""
+        params = request.query_params
+        try:
+            filters = GRCListFilters.model_validate(
+                {
+                    "frameworks": params.getlist("framework") or None,
+                    "document_types": params.getlist("type") or None,
+                    "statuses": params.getlist("status") or None,
+                    "risk_levels": params.getlist("risk_level") or None,
+                    "created_after": params.get("created_after") or None,
+                    "created_before": params.get("created_before") or None,
+                }
+            )
+        except Exception as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        
+        try:
+            return listing_response(request, filters, list_grc_documents, iter_grc_documents)
+        except Exception as e:
+            logger.error("list_documents_error", error=str(e))
+            return JSONResponse({"error": str(e)}, status_code=500)
+    
     @app.custom_route("/grc/documents/{grc_doc_id}/classify", methods=["PUT"])
-    async def update_classification(request: Request):
+    async def update_classification(request: Request) -> Response:
         """Update document classification"""
         try:
             grc_doc_id = int(request.path_params.get("grc_doc_id"))
@@ -112,7 +189,7 @@ def register_grc_routes(app: FastMCP) -> None:
             return JSONResponse({"error": str(e)}, status_code=500)
     
     @app.custom_route("/grc/documents/{grc_doc_id}/status", methods=["GET"])
-    async def get_compliance_status(request: Request):
+    async def get_compliance_status(request: Request) -> Response:
         """Get comprehensive compliance status for a document"""
         try:
             grc_doc_id = int(request.path_params.get("grc_doc_id"))
@@ -127,8 +204,23 @@ def register_grc_routes(app: FastMCP) -> None:
             logger.error("compliance_status_error", error=str(e))
             return JSONResponse({"error": str(e)}, status_code=500)
     
+    @app.custom_route("/grc/documents/status", methods=["POST"])
+    async def get_compliance_statuses_batch(request: Request) -> Response:
+        """Compliance status of up to MAX_BATCH_IDS documents in one request"""
+        try:
+            data = await request.json()
+            payload = ComplianceStatusBatchRequest(**data)
+        except Exception as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        
+        try:
+            return JSONResponse(get_compliance_status_batch(payload.ids))
+        except Exception as e:
+            logger.error("compliance_status_error", error=str(e))
+            return JSONResponse({"error": str(e)}, status_code=500)
+    
     @app.custom_route("/grc/reports/compliance", methods=["POST"])
-    async def generate_compliance_report(request: Request):
+    async def generate_compliance_report(request: Request) -> Response:
         """Generate compliance report for a specific framework"""
         try:
             data = await request.json()
@@ -143,6 +235,14 @@ def register_grc_routes(app: FastMCP) -> None:
                     status_code=400
                 )
             
+            if payload.stream:
+                # One JSON object per line, each report section as soon as it is ready
+                sections = grc_agent.stream_compliance_report(framework, payload.document_ids)
+                return StreamingResponse(
+                    (json.dumps(section, default=str) + "\n" for section in sections),
+                    media_type="application/x-ndjson",
+                )
+            
             report = grc_agent.generate_compliance_report(
                 framework=framework,
                 document_ids=payload.document_ids
@@ -155,8 +255,24 @@ def register_grc_routes(app: FastMCP) -> None:
             logger.error("compliance_report_error", error=str(e))
             return JSONResponse({"error": str(e)}, status_code=500)
     
+    @app.custom_route("/grc/coverage/{framework}", methods=["GET"])
+    async def get_control_coverage(request: Request) -> Response:
+        """Control coverage of a framework from precomputed document-to-control matches"""
+        framework_name = request.path_params.get("framework", "").upper()
+        try:
+            framework = ComplianceFramework(framework_name)
+        except ValueError:
+            return JSONResponse({"error": f"Invalid framework: {framework_name}"}, status_code=400)
+        
+        try:
+            gaps_only = request.query_params.get("gaps", "0") in ("1", "true")
+            return JSONResponse(get_framework_coverage(framework, gaps_only=gaps_only))
+        except Exception as e:
+            logger.error("control_coverage_error", error=str(e))
+            return JSONResponse({"error": str(e)}, status_code=500)
+    
     @app.custom_route("/grc/risk/assess", methods=["POST"])
-    async def assess_risk(request: Request):
+    async def assess_risk(request: Request) -> Response:
         """Perform risk assessment"""
         try:
             data = await request.json()
@@ -176,7 +292,7 @@ def register_grc_routes(app: FastMCP) -> None:
             return JSONResponse({"error": str(e)}, status_code=500)
     
     @app.custom_route("/grc/frameworks", methods=["GET"])
-    async def list_frameworks(request: Request):
+    async def list_frameworks(request: Request) -> Response:
         """List available compliance frameworks"""
         frameworks = [
             {
@@ -190,7 +306,7 @@ def register_grc_routes(app: FastMCP) -> None:
         return JSONResponse({"frameworks": frameworks})
     
     @app.custom_route("/grc/document-types", methods=["GET"])
-    async def list_document_types(request: Request):
+    async def list_document_types(request: Request) -> Response:
         """List available document types"""
         document_types = [
             {
@@ -204,7 +320,7 @@ def register_grc_routes(app: FastMCP) -> None:
         return JSONResponse({"document_types": document_types})
     
     @app.custom_route("/grc/risk-levels", methods=["GET"])
-    async def list_risk_levels(request: Request):
+    async def list_risk_levels(request: Request) -> Response:
         """List available risk levels"""
         risk_levels = [
             {
@@ -219,27 +335,32 @@ def register_grc_routes(app: FastMCP) -> None:
     
     # Additional API endpoints for frontend
     @app.custom_route("/api/dashboard/stats", methods=["GET"])
-    async def get_dashboard_stats(request: Request):
-        """Get dashboard statistics"""
-        return JSONResponse({
-            "totalDocuments": 0,
-            "complianceScore": 0.85,
-            "riskAssessments": 0,
-            "activeFrameworks": 3
-        })
+    async def get_dashboard_stats(request: Request) -> Response:
+        """Get dashboard statistics from the trigger-maintained totals"""
+        return _cached_json(
+            request, dashboard_cache, "stats", _read_stats(lambda s: dashboard_stats(load_stats(s)))
+        )
     
     @app.custom_route("/api/documents/recent", methods=["GET"])
-    async def get_recent_documents(request: Request):
+    async def get_recent_documents(request: Request) -> Response:
         """Get recent documents"""
-        return JSONResponse([])
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", "10")), 100))
+        except ValueError:
+            return JSONResponse({"error": "limit must be an integer"}, status_code=400)
+        return _cached_json(
+            request,
+            dashboard_cache,
+            f"recent:{limit}",
+            _read_stats(lambda s: recent_documents(s, limit)),
+        )
     
     @app.custom_route("/api/compliance/status", methods=["GET"])
-    async def get_compliance_status_api(request: Request):
-        """Get compliance status"""
-        return JSONResponse({
-            "frameworks": [
-                {"name": "SOX", "score": 0.9},
-                {"name": "GDPR", "score": 0.8},
-                {"name": "ISO27001", "score": 0.75}
-            ]
-        })
+    async def get_compliance_status_api(request: Request) -> Response:
+        """Get compliance status per framework from the trigger-maintained totals"""
+        return _cached_json(
+            request,
+            dashboard_cache,
+            "compliance",
+            _read_stats(lambda s: compliance_status(load_stats(s))),
+        )
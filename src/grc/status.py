@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable, Sequence
+from functools import lru_cache
+from typing import Any, Callable, Optional, Union
+
+from sqlalchemy import text as sql_text
+from sqlalchemy.orm import Session
+
+from mcp_server.logging_config import get_logger
+from rag.settings import RAGSettings, get_rag_settings
+
+logger = get_logger(__name__)
+
+AUDIT_TRAIL_LENGTH = 10
+
+# Document, risks and the latest audit entries as one JSON object per document, in one round trip.
+STATUS_SQL = f"""
+    SELECT d.id, json_build_object(
+        'document', json_build_object(
+            'id', d.id, 'title', d.title, 'type', d.document_type,
+            'framework', d.compliance_framework, 'risk_level', d.risk_level, 'status', d.status,
+            'compliance_score', d.compliance_score,
+            'created_at', d.created_at, 'updated_at', d.updated_at
+        ),
+        'risks', COALESCE((
+            SELECT json_agg(json_build_object(
+                'id', r.id, 'category', r.risk_category, 'description', r.risk_description,
+                'score', r.risk_score, 'mitigation', r.mitigation_strategy
+            ) ORDER BY r.id)
+            FROM risk_assessments r WHERE r.grc_document_id = d.id
+        ), '[]'::json),
+        'audit_trail', COALESCE((
+            SELECT json_agg(json_build_object(
+                'action', a.action, 'user', a.user_id,
+                'timestamp', a.timestamp, 'details', a.details
+            ) ORDER BY a.timestamp DESC, a.id DESC)
+            FROM (
+                SELECT * FROM document_audit_logs
+                WHERE grc_document_id = d.id
+                ORDER BY timestamp DESC, id DESC
+                LIMIT {AUDIT_TRAIL_LENGTH}
+            ) a
+        ), '[]'::json)
+    ) AS status
+    FROM grc_documents d
+    WHERE d.id = ANY(:ids)
+"""
+
+MAX_BATCH_IDS = 500
+
+# A Redis counter as MGET returns it; None while the document was never invalidated.
+RemoteVersion = Optional[Union[bytes, str]]
+
+
+def load_statuses(s: Session, ids: Sequence[int]) -> dict[int, dict[str, Any]]:
+    """Compliance status of each existing document in ``ids``; unknown ids are absent."""
+    if not ids:
+        return {}
+    return {int(row[0]): row[1] for row in s.execute(sql_text(STATUS_SQL), {"ids": list(ids)})}
+
+
+class StatusCache:
+    """Per-document status payloads, dropped by ``invalidate`` after a write commits.
+
+    Every invalidation advances a version counter. A lookup notes the version
+    before it queries and stores what it read only if none of its documents
+    was invalidated in the meantime, so a read racing a write cannot put the
+    old status back.
+
+    With ``use_redis`` each invalidation also increments the document's
+    counter ``grc:status:v:<id>`` in Redis. Entries remember the counter they
+    were read at, and ``get_many`` fetches the current counters with one MGET
+    and reloads entries that are behind, so writes by other processes are seen
+    at once. Without Redis, or while it is unreachable, those writes and reads
+    from a lagging replica are corrected after ``ttl_seconds``.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, use_redis: bool = False):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.use_redis = use_redis
+        # grc_document_id -> (expires, Redis counter when read, payload)
+        self._entries: OrderedDict[int, tuple[float, RemoteVersion, dict[str, Any]]] = OrderedDict()
+        # Version at which each recently invalidated id changed; older ones are folded into _floor.
+        self._invalidated: OrderedDict[int, int] = OrderedDict()
+        self._floor = 0
+        self._versions = itertools.count(1)
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _redis_key(grc_document_id: int) -> str:
+        return f"grc:status:v:{grc_document_id}"
+
+    def _remote_versions(self, ids: list[int]) -> dict[int, RemoteVersion] | None:
+        """Redis counters of ``ids``; None when Redis is off or unreachable."""
+        if not self.use_redis or not ids:
+            return None
+        from rag.worker import get_redis
+
+        try:
+            values = get_redis().mget([self._redis_key(i) for i in ids])
+        except Exception:  # noqa: BLE001
+            logger.warning("grc_status_cache_redis_unavailable", exc_info=True)
+            return None
+        return dict(zip(ids, values))
+
+    def invalidate(self, ids: Iterable[int]) -> None:
+        ids = list(ids)
+        with self._lock:
+            self._version = next(self._versions)
+            for grc_document_id in ids:
+                self._entries.pop(grc_document_id, None)
+                self._invalidated[grc_document_id] = self._version
+                self._invalidated.move_to_end(grc_document_id)
+            while len(self._invalidated) > max(self.max_entries, 1):
+                _, version = self._invalidated.popitem(last=False)
+                self._floor = max(self._floor, version)
+        if self.use_redis and ids:
+            from rag.worker import get_redis
+
+            try:
+                pipe = get_redis().pipeline(transaction=False)
+                for grc_document_id in ids:
+                    pipe.incr(self._redis_key(grc_document_id))
+                pipe.execute()
+            except Exception:  # noqa: BLE001
+                logger.warning("grc_status_cache_redis_unavailable", exc_info=True)
+
+    def get_many(
+        self, ids: Sequence[int], load: Callable[[list[int]], dict[int, dict[str, Any]]]
+    ) -> dict[int, dict[str, Any]]:
+        """Cached statuses for ``ids``, loading the rest with one ``load(missing_ids)`` call.
+
+        Returned payloads are shared with the cache and must not be modified.
+        """
+        unique = list(dict.fromkeys(ids))
+        # Read before load(): a write committed meanwhile leaves the new entry behind its counter.
+        remote = self._remote_versions(unique)
+        now = time.monotonic()
+        found: dict[int, dict[str, Any]] = {}
+        with self._lock:
+            for grc_document_id in unique:
+                entry = self._entries.get(grc_document_id)
+                if entry is None or entry[0] <= now:
+                    continue
+                if remote is not None and entry[1] != remote[grc_document_id]:
+                    continue
+                self._entries.move_to_end(grc_document_id)
+                found[grc_document_id] = entry[2]
+            started = self._version
+        missing = [i for i in unique if i not in found]
+        if not missing:
+            return found
+        loaded = load(missing)
+        found.update(loaded)
+        if self.max_entries <= 0:
+            return found
+        with self._lock:
+            if started < self._floor:
+                return found
+            expires = time.monotonic() + self.ttl_seconds
+            for grc_document_id, status in loaded.items():
+                if self._invalidated.get(grc_document_id, 0) > started:
+                    continue
+                version = remote.get(grc_document_id) if remote is not None else None
+                self._entries[grc_document_id] = (expires, version, status)
+                self._entries.move_to_end(grc_document_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return found
+
+
+@lru_cache(maxsize=1)
+def _cache_for(max_entries: int, ttl_seconds: float, use_redis: bool) -> StatusCache:
+    return StatusCache(max_entries, ttl_seconds, use_redis)
+
+
+def get_status_cache(settings: RAGSettings | None = None) -> StatusCache:
+    settings = settings or get_rag_settings()
+    return _cache_for(
+        settings.grc_status_cache_size,
+        settings.grc_status_cache_ttl,
+        settings.grc_status_cache_redis,
+    )
+
+
+def invalidate_status(ids: Iterable[int]) -> None:
+    """Drop cached statuses of ``ids``; call after the transaction that changed them commits."""
+    get_status_cache().invalidate(ids)
+
+
+def get_compliance_statuses(ids: Sequence[int]) -> dict[int, dict[str, Any]]:
+    """Compliance status of many documents, from the cache or one query for the rest."""
+    from rag.db import read_session
+
+    def load(missing: list[int]) -> dict[int, dict[str, Any]]:
+        with read_session() as s:
+            return load_statuses(s, missing)
+
+    return get_status_cache().get_many(ids, load)
+
+
+def get_compliance_status_batch(ids: Sequence[int]) -> dict[str, Any]:
+    """``{"statuses": {id: status}, "missing": [ids]}`` for a batch lookup request."""
+    statuses = get_compliance_statuses(ids)
+    return {
+        "statuses": {str(i): statuses[i] for i in ids if i in statuses},
+        "missing": [i for i in dict.fromkeys(ids) if i not in statuses],
+    }
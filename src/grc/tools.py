@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+from typing import Any
+
 from fastmcp import FastMCP
+
 from .agent import GRCAgent
-from .ingest import ingest_grc_document, get_document_compliance_status
+from .ingest import get_document_compliance_status, ingest_grc_document
 from .models import ComplianceFramework
+from .status import MAX_BATCH_IDS, get_compliance_status_batch
 
 
 def register_grc_tools(app: FastMCP) -> None:
@@ -66,6 +70,19 @@ def register_grc_tools(app: FastMCP) -> None:
         """
         return get_document_compliance_status(grc_document_id)
     
+    @app.tool()
+    def grc_get_compliance_statuses(grc_document_ids: list[int]) -> dict[str, Any]:
+        """
+        Get the compliance status of several documents at once.
+        
+        Args:
+            grc_document_ids: IDs of the GRC documents (at most 500)
+            
+        Returns:
+            Dictionary mapping each found document ID to its status, plus the missing IDs
+        """
+        return get_compliance_status_batch([int(i) for i in grc_document_ids][:MAX_BATCH_IDS])
+    
     @app.tool()
     def grc_generate_compliance_report(framework: str, document_ids: list = None) -> dict:
         """
@@ -84,8 +101,36 @@ def register_grc_tools(app: FastMCP) -> None:
             return report
         except ValueError:
             return {
-                "error": f"Invalid framework: {framework}. Valid frameworks: {[f.value for f in ComplianceFramework]}"
+                "error": (
+                    f"Invalid framework: {framework}. "
+                    f"Valid frameworks: {[f.value for f in ComplianceFramework]}"
+                )
+            }
+    
+    @app.tool()
+    def grc_control_coverage(framework: str, gaps_only: bool = False) -> dict[str, Any]:
+        """
+        Show which controls of a framework are evidenced by uploaded documents.
+        
+        Args:
+            framework: Compliance framework (SOX, GDPR, ISO27001, etc.)
+            gaps_only: Only list controls without sufficient evidence
+            
+        Returns:
+            Dictionary with coverage ratio and per-control best match and evidence documents
+        """
+        from .coverage import get_framework_coverage
+        
+        try:
+            framework_enum = ComplianceFramework(framework.upper())
+        except ValueError:
+            return {
+                "error": (
+                    f"Invalid framework: {framework}. "
+                    f"Valid frameworks: {[f.value for f in ComplianceFramework]}"
+                )
             }
+        return get_framework_coverage(framework_enum, gaps_only=gaps_only)
     
     @app.tool()
     def grc_assess_risk(question: str, context: str = "") -> dict:
@@ -1,29 +1,31 @@
 from __future__ import annotations
 
 import os
-from typing import Optional
 
 from fastmcp import FastMCP
+from opentelemetry import trace
+from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+from opentelemetry.instrumentation.requests import RequestsInstrumentor
+from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from starlette.responses import JSONResponse, Response
 
+from grc.routes import register_grc_routes
+from grc.tools import register_grc_tools
+from rag.db import all_engines
+from rag.local_index import start_local_index_sync
+from rag.metrics import register_queue_collector
+from rag.routes import register_rag_routes
+from rag.settings import get_rag_settings
+
 from .config import get_settings
+from .health import healthz, readyz
 from .logging_config import configure_logging, get_logger
-from .metrics import MCP_REQUESTS, MCP_REQUEST_LATENCY
-from .tools import register_tools
-from grc.tools import register_grc_tools
 from .resources import register_resources
-from .health import healthz, readyz
-from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
-from rag.routes import register_rag_routes
-from grc.routes import register_grc_routes
-from opentelemetry import trace
-from opentelemetry.sdk.resources import Resource
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
-from opentelemetry.instrumentation.requests import RequestsInstrumentor
-from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
-from rag.db import ENGINE
+from .tools import register_tools
 
 
 def _setup_tracing() -> None:
@@ -49,7 +51,7 @@ def _setup_tracing() -> None:
         
         # Instrument requests and SQLAlchemy
         RequestsInstrumentor().instrument()
-        SQLAlchemyInstrumentor().instrument(engine=ENGINE)
+        SQLAlchemyInstrumentor().instrument(engines=all_engines())
         
         return tracer
     return None
@@ -81,6 +83,12 @@ def create_app() -> FastMCP:
     async def _ready(_request):
         return JSONResponse(readyz())
 
+    if settings.enable_metrics and get_rag_settings().async_ingest:
+        register_queue_collector()
+
+    # Map the local vector replica before serving and keep it in sync in the background.
+    start_local_index_sync()
+
     @app.custom_route("/metrics", methods=["GET"], include_in_schema=False)
     async def _metrics(_request):
         data = generate_latest()  # type: ignore[arg-type]
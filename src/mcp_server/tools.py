@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import List
+from typing import Any, Optional
 
 from fastmcp import FastMCP
 
@@ -20,4 +20,27 @@ def register_tools(app: FastMCP) -> None:
         result = answer_question(question)
         return result.get("answer", "")
 
-
+    @app.tool()
+    def rag_retrieve_many(
+        queries: list[str],
+        top_k: int = 5,
+        document_ids: Optional[list[int]] = None,
+        frameworks: Optional[list[str]] = None,
+        approved_only: bool = False,
+        mode: Optional[str] = None,
+    ) -> list[list[dict[str, Any]]]:
+        """Top-k chunks for each query, embedded and searched as one batch, optionally filtered.
+
+        ``mode`` "hierarchical" searches chunks of the best-matching documents only;
+        "summary" returns document summaries (with document_id) instead of chunks.
+        """
+        from rag.filters import RetrievalFilters
+        from rag.retriever import retrieve_many
+
+        filters = RetrievalFilters(
+            document_ids=document_ids, frameworks=frameworks, approved_only=approved_only
+        )
+        return [
+            [{**meta, "score": score, "text": text} for text, score, meta in hits]
+            for hits in retrieve_many(queries, top_k=top_k, filters=filters, mode=mode)
+        ]
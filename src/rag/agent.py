@@ -1,16 +1,26 @@
 from __future__ import annotations
 
-from typing import List
+from typing import Any
 
 from opentelemetry import trace
 
-from .retriever import retrieve_similar
+from .context import pack_context
 from .openai_utils import generate_answer
+from .rerank import context_top_k
+from .retriever import retrieve_similar
+from .singleflight import coalesce, request_key
 
 tracer = trace.get_tracer(__name__)
 
 
-def answer_question(question: str, fallback: bool = True) -> dict:
+def answer_question(question: str, fallback: bool = True) -> dict[str, Any]:
+    """Answer ``question``; identical concurrent questions share one pipeline run."""
+    return coalesce(
+        "rag.answer", request_key(question, fallback), lambda: _answer_question(question, fallback)
+    )
+
+
+def _answer_question(question: str, fallback: bool) -> dict[str, Any]:
     with tracer.start_as_current_span("rag.answer_question") as span:
         span.set_attributes({
             "rag.question_length": len(question),
@@ -18,19 +28,24 @@ def answer_question(question: str, fallback: bool = True) -> dict:
         })
         
         with tracer.start_as_current_span("rag.retrieve_context"):
-            contexts = retrieve_similar(question, top_k=6)
-            context_text = "\n\n".join(t for t, _, _ in contexts)
+            contexts = retrieve_similar(question, top_k=context_top_k(6))
+            packed = pack_context(contexts)
+            context_text = packed.text
             span.set_attributes({
                 "rag.context_count": len(contexts),
                 "rag.context_length": len(context_text),
+                "rag.context_tokens": packed.tokens,
+                "rag.context_tokens_saved": packed.tokens_saved,
             })
 
         with tracer.start_as_current_span("rag.generate_answer"):
             prompt = (
                 "System: You are Omprakash's production RAG assistant (Cursor MCP RAG Agent).\n"
                 "- Use the provided context snippets when relevant.\n"
-                "- Always include a short 'Suggestions' section with 2-4 actionable follow-ups the user may find helpful.\n"
-                "- If context is weak or missing, still provide a safe, general best-practice answer.\n"
+                "- Always include a short 'Suggestions' section with 2-4 actionable follow-ups "
+                "the user may find helpful.\n"
+                "- If context is weak or missing, still provide a safe, general best-practice "
+                "answer.\n"
                 "- Be concise, factual, and avoid speculation beyond reasonable best practices.\n\n"
                 f"Context Snippets (may be partial):\n{context_text}\n\n"
                 f"User Question: {question}\n\n"
@@ -43,9 +58,11 @@ def answer_question(question: str, fallback: bool = True) -> dict:
             answer = generate_answer(prompt)
             span.set_attribute("rag.answer_length", len(answer))
 
+        used = {cid for p in packed.passages for cid in p.chunk_ids}
         citations = []
         for _, score, meta in contexts:
-            citations.append({"chunk_id": meta.get("chunk_id"), "score": score})
+            if meta.get("chunk_id") in used:
+                citations.append({"chunk_id": meta.get("chunk_id"), "score": score})
         
         span.set_attribute("rag.citations_count", len(citations))
         return {"answer": answer, "citations": citations}
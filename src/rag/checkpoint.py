@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from typing import cast
+
+import numpy as np
+from rq.job import Job
+
+CHECKPOINT_TTL_SECONDS = 24 * 3600
+
+
+class IngestCheckpoint:
+    """Stage checkpoints for one ingest job so an RQ retry resumes where it stopped.
+
+    Progress markers (current stage, chunk counts, cache hits and per-stage
+    durations) live in the job's ``meta``; the bulky intermediate state
+    (parsed text and float32 embeddings of completed batches) lives in Redis keys
+    next to the job and expires after ``CHECKPOINT_TTL_SECONDS``.
+    """
+
+    def __init__(self, job: Job, ttl: int = CHECKPOINT_TTL_SECONDS):
+        self.job = job
+        self.ttl = ttl
+        self._text_key = f"rag:ingest:{job.id}:text"
+        self._emb_key = f"rag:ingest:{job.id}:embeddings"
+
+    @property
+    def key(self) -> str:
+        """Idempotency key stored on the saved document row."""
+        return self.job.id
+
+    @property
+    def document_id(self) -> int | None:
+        return self.job.meta.get("document_id")
+
+    def _update(self, **values: object) -> None:
+        """Merge ``values`` into the job's meta and persist it; all meta writes go through here."""
+        self.job.meta.update(values)
+        self.job.save_meta()  # type: ignore[no-untyped-call]  # rq leaves it unannotated
+
+    def start_stage(self, stage: str) -> None:
+        self._update(stage=stage)
+
+    def finish_stage(self, stage: str, seconds: float) -> None:
+        """Add ``seconds`` to the stage's total; retries accumulate."""
+        timings = dict(self.job.meta.get("timings") or {})
+        timings[stage] = round(float(timings.get(stage, 0.0)) + seconds, 6)
+        self._update(timings=timings)
+
+    def set_chunk_count(self, count: int) -> None:
+        self._update(chunk_count=count)
+
+    def load_text(self) -> tuple[str, str] | None:
+        if self.job.meta.get("text_key") != self._text_key:
+            return None
+        raw = self.job.connection.get(self._text_key)
+        if raw is None:
+            return None
+        # The job's connection does not decode responses, so values come back as bytes.
+        return str(self.job.meta["content_type"]), cast(bytes, raw).decode()
+
+    def save_text(self, content_type: str, text: str) -> None:
+        self.job.connection.set(self._text_key, text.encode(), ex=self.ttl)
+        self._update(text_key=self._text_key, content_type=content_type)
+
+    def load_embeddings(self) -> np.ndarray:
+        """Float32 embeddings of the chunks completed by earlier attempts."""
+        offset = int(self.job.meta.get("embedded_offset", 0))
+        dim = int(self.job.meta.get("embedding_dim", 0))
+        empty = np.empty((0, 0), dtype=np.float32)
+        if not offset or not dim:
+            return empty
+        raw = self.job.connection.get(self._emb_key)
+        if raw is None or len(raw) < offset * dim * 4:
+            return empty
+        # Bytes past ``offset`` belong to a batch whose meta update never landed.
+        return np.frombuffer(cast(bytes, raw), dtype="<f4", count=offset * dim).reshape(offset, dim)
+
+    def save_embeddings(self, offset: int, embeddings: np.ndarray, cache_hits: int = 0) -> None:
+        """Record that chunks up to ``offset + len(embeddings)`` are embedded."""
+        if not len(embeddings):
+            return
+        dim = embeddings.shape[1]
+        pipe = self.job.connection.pipeline()
+        pipe.setrange(
+            self._emb_key, offset * dim * 4, np.ascontiguousarray(embeddings, dtype="<f4").tobytes()
+        )
+        pipe.expire(self._emb_key, self.ttl)
+        pipe.execute()
+        self.job.meta["embedding_dim"] = dim
+        self.record_embedded(offset + len(embeddings), cache_hits)
+
+    def record_embedded(self, chunks_processed: int, cache_hits: int = 0) -> None:
+        self._update(
+            embedded_offset=chunks_processed,
+            cache_hits=int(self.job.meta.get("cache_hits", 0)) + cache_hits,
+        )
+
+    def save_document(self, document_id: int) -> None:
+        self._update(stage="saved", document_id=document_id)
+        self.job.connection.delete(self._text_key, self._emb_key)
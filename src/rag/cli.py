@@ -1,13 +1,16 @@
 from __future__ import annotations
 
 import json
+from collections.abc import Iterable
+from datetime import datetime
 from pathlib import Path
+from typing import Any, Callable, TypeVar
 
 import click
 
-from .ingest import ingest_file
 from .agent import answer_question
 from .db import db_session
+from .ingest import ingest_file
 from .models import Document
 
 
@@ -37,18 +40,199 @@ def ask_cmd(question: str) -> None:
     click.echo(ans)
 
 
+def _check_cursor(ctx: click.Context, param: click.Parameter, value: str | None) -> str | None:
+    from .listing import decode_cursor
+
+    if value:
+        try:
+            decode_cursor(value)
+        except ValueError as exc:
+            raise click.BadParameter(str(exc)) from None
+    return value
+
+
+_LIST_OPTIONS = [
+    click.option(
+        "--created-after",
+        type=click.DateTime(),
+        default=None,
+        help="Only documents created at or after",
+    ),
+    click.option(
+        "--created-before",
+        type=click.DateTime(),
+        default=None,
+        help="Only documents created before",
+    ),
+    click.option(
+        "--cursor",
+        default=None,
+        callback=_check_cursor,
+        help="Continue after this cursor (printed to stderr by a limited run)",
+    ),
+    click.option("--limit", type=int, default=None, help="Stop after this many documents"),
+]
+
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def list_options(fn: F) -> F:
+    for option in reversed(_LIST_OPTIONS):
+        fn = option(fn)
+    return fn
+
+
+def echo_jsonl(items: Iterable[dict[str, Any]], limit: int | None) -> None:
+    """Print ``items`` as JSON Lines; if ``limit`` was reached, the resume cursor goes to stderr."""
+    from .listing import encode_cursor
+
+    last = None
+    count = 0
+    for last in items:
+        count += 1
+        click.echo(json.dumps(last))
+    if limit is not None and count == limit and last is not None:
+        cursor = encode_cursor(datetime.fromisoformat(last["created_at"]), last["id"])
+        click.echo(json.dumps({"next_cursor": cursor}), err=True)
+
+
 @rag.command("list-docs")
-def list_docs_cmd() -> None:
+@click.option(
+    "--content-type", "content_types", multiple=True, help="Only documents of this content type"
+)
+@list_options
+def list_docs_cmd(
+    content_types: tuple[str, ...],
+    created_after: datetime | None,
+    created_before: datetime | None,
+    cursor: str | None,
+    limit: int | None,
+) -> None:
+    """Stream documents, newest first, as JSON Lines."""
+    from .db import read_session
+    from .listing import DocumentListFilters, iter_documents
+
+    filters = DocumentListFilters(
+        content_types=list(content_types) or None,
+        created_after=created_after,
+        created_before=created_before,
+    )
+    with read_session() as s:
+        echo_jsonl(iter_documents(s, filters, cursor=cursor, limit=limit), limit)
+
+
+@rag.command("jobs")
+@click.argument("job_ids", nargs=-1, required=True)
+def jobs_cmd(job_ids: tuple[str, ...]) -> None:
+    """Show stage, progress and per-stage timings of async ingest jobs."""
+    from .worker import get_jobs_status
+
+    statuses = get_jobs_status(list(job_ids))
+    click.echo(json.dumps(dict(zip(job_ids, statuses)), indent=2))
+
+
+@rag.command("build-index")
+@click.option(
+    "--approved/--no-approved",
+    default=True,
+    help="Also build the partial index for approved-only searches",
+)
+@click.option(
+    "--drop-stale/--keep-stale",
+    default=True,
+    help="Drop chunk embedding indexes of other storage modes once the new one is built",
+)
+def build_index_cmd(approved: bool, drop_stale: bool) -> None:
+    """Create the HNSW index for the configured RAG_VECTOR_STORAGE (concurrently).
+
+    Prints the statements run and the measured size in bytes of ``chunks`` and
+    of every chunk embedding index before and after.
+    """
+    from sqlalchemy import text as sql_text
+
+    from .db import ENGINE
+    from .settings import get_rag_settings
+    from .vector_index import index_ddl, stale_index_names, storage_sizes
+
+    settings = get_rag_settings()
+    ddls = [index_ddl(settings)] + ([index_ddl(settings, approved_only=True)] if approved else [])
+    with ENGINE.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        before = storage_sizes(conn)
+        for ddl in ddls:
+            conn.execute(sql_text(ddl))
+        dropped = stale_index_names(conn, settings) if drop_stale else []
+        for name in dropped:
+            conn.execute(sql_text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        after = storage_sizes(conn)
+    click.echo(
+        json.dumps({"created": ddls, "dropped": dropped, "bytes_before": before, "bytes": after})
+    )
+
+
+@rag.command("recall-check")
+@click.option("--samples", type=int, default=50, help="Stored chunks used as queries")
+@click.option("--top-k", type=int, default=10)
+@click.option("--min-recall", type=float, default=0.95, help="Fail below this mean recall@k")
+def recall_check_cmd(samples: int, top_k: int, min_recall: float) -> None:
+    """Compare the configured two-stage search against an exact scan."""
+    from .settings import get_rag_settings
+    from .vector_index import measure_recall
+
+    settings = get_rag_settings()
     with db_session() as s:
-        rows = s.query(Document).all()
-        items = [{"id": d.id, "filename": d.filename, "content_type": d.content_type} for d in rows]
-        click.echo(json.dumps(items))
+        recall = measure_recall(s, settings, samples, top_k)
+    click.echo(
+        json.dumps({"storage": settings.vector_storage, "top_k": top_k, "recall": round(recall, 4)})
+    )
+    if recall < min_recall:
+        raise click.ClickException(f"recall {recall:.4f} below {min_recall}")
+
+
+@rag.command("sync-index")
+@click.option("--rebuild", is_flag=True, help="Rebuild the replica from scratch instead of syncing")
+def sync_index_cmd(rebuild: bool) -> None:
+    """Sync the memory-mapped local vector index in RAG_LOCAL_INDEX_DIR from Postgres."""
+    from .local_index import sync_local_index
+    from .settings import get_rag_settings
+
+    if not get_rag_settings().local_index_dir:
+        raise click.ClickException("RAG_LOCAL_INDEX_DIR is not set")
+    meta = sync_local_index(rebuild=rebuild)
+    click.echo(json.dumps(meta))
+
+
+@rag.command("quantize-reranker")
+@click.argument("src", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.argument("dst", type=click.Path(dir_okay=False, path_type=Path))
+def quantize_reranker_cmd(src: Path, dst: Path) -> None:
+    """Write an int8 (dynamic quantization) copy of an ONNX cross-encoder for RAG_RERANKER_MODEL."""
+    try:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+    except ImportError as exc:
+        raise click.ClickException("requires the 'rerank' extra (onnxruntime)") from exc
+
+    quantize_dynamic(str(src), str(dst), weight_type=QuantType.QInt8)
+    click.echo(json.dumps({"model": str(dst), "bytes": dst.stat().st_size}))
+
+
+@rag.command("summarize")
+@click.option("--id", "ids", multiple=True, type=int, help="Only this document id")
+@click.option("--limit", type=int, default=None, help="Stop after this many summaries")
+def summarize_cmd(ids: tuple[int, ...], limit: int | None) -> None:
+    """Summarize and embed documents without a summary (backfill for hierarchical retrieval)."""
+    from .summaries import summarize_documents
+
+    click.echo(
+        json.dumps({"summarized": summarize_documents(document_ids=list(ids) or None, limit=limit)})
+    )
 
 
 @rag.command("delete-doc")
 @click.argument("doc_id", type=int)
 def delete_doc_cmd(doc_id: int) -> None:
     from sqlalchemy import delete
+
     from .models import Chunk
     with db_session() as s:
         s.execute(delete(Chunk).where(Chunk.document_id == doc_id))
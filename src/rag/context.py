@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
+
+from opentelemetry import trace
+from sqlalchemy import text as sql_text
+
+from mcp_server.logging_config import get_logger
+
+from .settings import get_rag_settings
+
+if TYPE_CHECKING:
+    import tiktoken
+
+tracer = trace.get_tracer(__name__)
+logger = get_logger(__name__)
+
+# Passages whose word 5-gram sets overlap at least this much are treated as duplicates.
+NEAR_DUPLICATE_JACCARD = 0.8
+# A passage is only truncated to fill the remaining budget if at least this many tokens fit.
+MIN_TRUNCATED_TOKENS = 64
+
+
+@lru_cache(maxsize=4)
+def _encoding(model: str) -> tiktoken.Encoding | None:
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:  # noqa: BLE001
+        # BPE files are fetched on first use; without them fall back to an estimate.
+        logger.warning("rag_tokenizer_unavailable", model=model, exc_info=True)
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    enc = _encoding(model)
+    if enc is None:
+        return (len(text) + 3) // 4
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str = "gpt-4o-mini") -> str:
+    enc = _encoding(model)
+    if enc is None:
+        return text[: max_tokens * 4]
+    return enc.decode(enc.encode(text, disallowed_special=())[:max_tokens])
+
+
+@dataclass
+class Passage:
+    """A span of one document assembled from one or more retrieved chunks."""
+
+    text: str
+    score: float
+    chunk_ids: list[int]
+    document_id: int | None = None
+    start_char: int | None = None
+    end_char: int | None = None
+    tokens: int = 0
+    meta: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class PackedContext:
+    passages: list[Passage]
+    text: str
+    tokens: int
+    naive_tokens: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.naive_tokens - self.tokens)
+
+
+def _chunk_positions(
+    chunk_ids: Sequence[int],
+) -> dict[int, tuple[int, int | None, int | None]]:
+    from .db import read_session
+
+    if not chunk_ids:
+        return {}
+    with read_session() as s:
+        rows = s.execute(
+            sql_text(
+                "SELECT id, document_id, start_char, end_char FROM chunks WHERE id = ANY(:ids)"
+            ),
+            {"ids": list(chunk_ids)},
+        ).fetchall()
+    return {int(r[0]): (int(r[1]), r[2], r[3]) for r in rows}
+
+
+def merge_neighbors(passages: list[Passage]) -> list[Passage]:
+    """Merge passages of the same document whose character ranges touch or overlap."""
+    positioned = sorted(
+        (
+            p
+            for p in passages
+            if p.document_id is not None and p.start_char is not None and p.end_char is not None
+        ),
+        key=lambda p: (p.document_id, p.start_char),
+    )
+    merged: list[Passage] = []
+    for p in positioned:
+        start, end = p.start_char, p.end_char
+        assert start is not None and end is not None
+        last = merged[-1] if merged else None
+        if (
+            last is not None
+            and last.end_char is not None
+            and last.document_id == p.document_id
+            and start <= last.end_char
+        ):
+            if end > last.end_char:
+                last.text += p.text[last.end_char - start :]
+                last.end_char = end
+            last.score = max(last.score, p.score)
+            last.chunk_ids.extend(p.chunk_ids)
+            continue
+        merged.append(Passage(**{**p.__dict__, "chunk_ids": list(p.chunk_ids)}))
+    merged.extend(
+        p for p in passages if p.document_id is None or p.start_char is None or p.end_char is None
+    )
+    return merged
+
+
+def _shingles(text: str, n: int = 5) -> set[str]:
+    words = text.lower().split()
+    return {" ".join(words[i : i + n]) for i in range(max(1, len(words) - n + 1))}
+
+
+def drop_near_duplicates(passages: list[Passage]) -> list[Passage]:
+    """Keep the higher-scored of any two passages with near-identical word 5-grams."""
+    kept: list[tuple[Passage, set[str]]] = []
+    for p in sorted(passages, key=lambda p: p.score, reverse=True):
+        sh = _shingles(p.text)
+        if any(
+            len(sh & other) / max(1, len(sh | other)) >= NEAR_DUPLICATE_JACCARD for _, other in kept
+        ):
+            continue
+        kept.append((p, sh))
+    return [p for p, _ in kept]
+
+
+def pack_context(
+    contexts: Sequence[tuple[str, float, dict[str, Any]]],
+    max_tokens: int | None = None,
+    model: str = "gpt-4o-mini",
+    separator: str = "\n\n",
+) -> PackedContext:
+    """Assemble retrieval results into prompt context under a token budget.
+
+    Overlapping or adjacent chunks of one document are merged, near-duplicate
+    passages are dropped, and the rest are added in score order until
+    ``max_tokens`` (``RAG_CONTEXT_MAX_TOKENS``) is reached. The passage that
+    crosses the budget is truncated if enough of it fits.
+    """
+    with tracer.start_as_current_span("rag.pack_context") as span:
+        budget = max_tokens if max_tokens is not None else get_rag_settings().context_max_tokens
+        naive_tokens = count_tokens(separator.join(t for t, _, _ in contexts), model)
+        positions = _chunk_positions(
+            [meta["chunk_id"] for _, _, meta in contexts if "chunk_id" in meta]
+        )
+        passages = []
+        for text, score, meta in contexts:
+            chunk_id: int | None = meta.get("chunk_id")
+            position = positions.get(chunk_id) if chunk_id is not None else None
+            doc_id, start, end = position or (meta.get("document_id"), None, None)
+            chunk_ids = [] if chunk_id is None else [chunk_id]
+            passages.append(Passage(text, score, chunk_ids, doc_id, start, end, meta=dict(meta)))
+        passages = drop_near_duplicates(merge_neighbors(passages))
+
+        packed: list[Passage] = []
+        used = 0
+        sep_tokens = count_tokens(separator, model)
+        for p in passages:
+            cost = sep_tokens if packed else 0
+            p.tokens = count_tokens(p.text, model)
+            if used + cost + p.tokens <= budget:
+                packed.append(p)
+                used += cost + p.tokens
+                continue
+            room = budget - used - cost
+            if room >= MIN_TRUNCATED_TOKENS:
+                p.text = truncate_tokens(p.text, room, model)
+                p.tokens = count_tokens(p.text, model)
+                packed.append(p)
+                used += cost + p.tokens
+            break
+
+        result = PackedContext(packed, separator.join(p.text for p in packed), used, naive_tokens)
+        span.set_attributes({
+            "rag.context_input_chunks": len(contexts),
+            "rag.context_passages": len(packed),
+            "rag.context_token_budget": budget,
+            "rag.context_tokens": result.tokens,
+            "rag.context_tokens_naive": naive_tokens,
+            "rag.context_tokens_saved": result.tokens_saved,
+        })
+        return result
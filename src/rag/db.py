@@ -1,11 +1,24 @@
 from __future__ import annotations
 
+import itertools
 import os
+import threading
+import time
+from collections.abc import Iterator
 from contextlib import contextmanager
-from typing import Iterator
+from typing import TYPE_CHECKING, Any
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import ConnectionPoolEntry, QueuePool
+
+from .metrics import RAG_DB_POOL_CHECKOUT_WAIT
+from .settings import get_rag_settings
+
+if TYPE_CHECKING:
+    import psycopg
 
 
 def _build_db_url() -> str:
@@ -20,14 +33,111 @@ def _build_db_url() -> str:
     return url
 
 
-ENGINE = create_engine(_build_db_url(), pool_pre_ping=True)
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):  # type: ignore[no-untyped-def]
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            # The logging name survives Engine.dispose(), which recreates the pool.
+            RAG_DB_POOL_CHECKOUT_WAIT.labels(pool=self._orig_logging_name or "primary").observe(
+                time.perf_counter() - start
+            )
+
+
+def _register_vector(
+    dbapi_connection: psycopg.Connection[Any], _record: ConnectionPoolEntry
+) -> None:
+    """Adapt NumPy arrays to ``vector`` with pgvector's binary dumper."""
+    from pgvector.psycopg import register_vector
+
+    try:
+        register_vector(dbapi_connection)
+    except Exception:  # noqa: BLE001
+        # The extension does not exist yet; ensure_schema() registers it once created.
+        pass
+
+
+def _make_engine(url: str, name: str, statement_timeout_ms: int) -> Engine:
+    settings = get_rag_settings()
+    connect_args = {}
+    if statement_timeout_ms:
+        connect_args["options"] = f"-c statement_timeout={statement_timeout_ms}"
+    engine = create_engine(
+        url,
+        poolclass=TimedQueuePool,
+        pool_logging_name=name,
+        pool_pre_ping=True,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        connect_args=connect_args,
+    )
+    event.listen(engine, "connect", _register_vector)
+    return engine
+
+
+class ReplicaSet:
+    """Round-robin over read replicas, skipping ones that recently failed to connect.
+
+    A replica that fails a connection attempt (including the pool's pre-ping) is
+    skipped for ``RAG_DB_REPLICA_RETRY_SECONDS``. With no healthy replica, reads
+    go to the primary.
+    """
+
+    def __init__(self, engines: list[Engine], primary: Engine, retry_seconds: float):
+        self.engines = engines
+        self.primary = primary
+        self.retry_seconds = retry_seconds
+        self._down_until = {id(e): 0.0 for e in engines}
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def _candidates(self) -> list[Engine]:
+        if not self.engines:
+            return []
+        with self._lock:
+            start = next(self._next) % len(self.engines)
+        ordered = self.engines[start:] + self.engines[:start]
+        now = time.monotonic()
+        return [e for e in ordered if self._down_until[id(e)] <= now]
+
+    def mark_down(self, engine: Engine) -> None:
+        self._down_until[id(engine)] = time.monotonic() + self.retry_seconds
+
+    def connect(self) -> Connection:
+        for engine in self._candidates():
+            try:
+                return engine.connect()
+            except OperationalError:
+                self.mark_down(engine)
+        return self.primary.connect()
+
+
+_settings = get_rag_settings()
+
+# Primary: all writes, plus reads when no replica is configured or healthy.
+ENGINE = _make_engine(_build_db_url(), "primary", _settings.db_statement_timeout_ms)
+READ_ENGINES: list[Engine] = [
+    _make_engine(url, f"replica{i}", _settings.db_read_statement_timeout_ms)
+    for i, url in enumerate(
+        u.strip() for u in _settings.db_read_replica_urls.split(",") if u.strip()
+    )
+]
+REPLICAS = ReplicaSet(READ_ENGINES, ENGINE, _settings.db_replica_retry_seconds)
+
 SessionLocal = sessionmaker(bind=ENGINE, autoflush=False, autocommit=False)
 
 
-@contextmanager
-def db_session() -> Iterator["Session"]:
-    from sqlalchemy.orm import Session  # local import for typing
+def all_engines() -> list[Engine]:
+    return [ENGINE, *READ_ENGINES]
+
 
+@contextmanager
+def db_session() -> Iterator[Session]:
     session = SessionLocal()
     try:
         yield session
@@ -39,3 +149,16 @@ def db_session() -> Iterator["Session"]:
         session.close()
 
 
+@contextmanager
+def read_session() -> Iterator[Session]:
+    """Session for latency-sensitive reads, bound to a healthy read replica (or the primary).
+
+    Replicas may lag the primary slightly; read-your-writes paths should use ``db_session``.
+    """
+    conn = REPLICAS.connect()
+    session = Session(bind=conn, autoflush=False)
+    try:
+        yield session
+    finally:
+        session.close()
+        conn.close()
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Optional
+
+from pydantic import BaseModel, Field
+
+# Literal predicate so the planner can match the partial HNSW index built by `rag build-index`.
+APPROVED_PREDICATE = "doc_status = 'APPROVED'"
+
+
+class RetrievalFilters(BaseModel):
+    """Predicates pushed into the vector search over the denormalized ``chunks`` columns."""
+
+    document_ids: Optional[list[int]] = Field(default=None, max_length=1000)
+    frameworks: Optional[list[str]] = Field(default=None)
+    document_types: Optional[list[str]] = Field(default=None)
+    statuses: Optional[list[str]] = Field(default=None)
+    approved_only: bool = False
+    effective_after: Optional[datetime] = None
+    effective_before: Optional[datetime] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+    def is_empty(self) -> bool:
+        return not self.to_sql()[0]
+
+    def to_sql(self) -> tuple[str, dict[str, Any]]:
+        """Return ``(predicate, params)``; the predicate is empty when nothing is filtered."""
+        clauses: list[str] = []
+        params: dict[str, Any] = {}
+        if self.document_ids is not None:
+            clauses.append("document_id = ANY(:f_document_ids)")
+            params["f_document_ids"] = list(self.document_ids)
+        if self.frameworks is not None:
+            clauses.append("compliance_framework = ANY(:f_frameworks)")
+            params["f_frameworks"] = [f.upper() for f in self.frameworks]
+        if self.document_types is not None:
+            clauses.append("document_type = ANY(:f_document_types)")
+            params["f_document_types"] = [t.upper() for t in self.document_types]
+        if self.approved_only:
+            clauses.append(APPROVED_PREDICATE)
+        elif self.statuses is not None:
+            clauses.append("doc_status = ANY(:f_statuses)")
+            params["f_statuses"] = [s.upper() for s in self.statuses]
+        for column, op, value in (
+            ("effective_date", ">=", self.effective_after),
+            ("effective_date", "<", self.effective_before),
+            ("created_at", ">=", self.created_after),
+            ("created_at", "<", self.created_before),
+        ):
+            if value is not None:
+                name = f"f_{column}_{'from' if op == '>=' else 'to'}"
+                clauses.append(f"{column} {op} :{name}")
+                params[name] = value
+        return " AND ".join(clauses), params
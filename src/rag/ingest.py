@@ -1,26 +1,36 @@
 from __future__ import annotations
 
+import hashlib
 import io
 import os
-from typing import Iterable, List, Tuple
-import hashlib
+import time
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from datetime import datetime
+from typing import TYPE_CHECKING
 
-import pandas as pd
 import fitz  # PyMuPDF
+import numpy as np
+import pandas as pd
 from docx import Document as DocxDocument
 from opentelemetry import trace
 
-from .db import db_session
-from .models import Base, Document, Chunk, EmbeddingCache
+from .db import ENGINE, db_session
+from .models import Base, Document
 from .openai_utils import embed_texts
 from .settings import get_rag_settings
 
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+
+    from .checkpoint import IngestCheckpoint
+
 tracer = trace.get_tracer(__name__)
 
 
-def _chunk_text(text: str, max_chars: int = 1200, overlap: int = 100) -> List[str]:
+def _chunk_text(text: str, max_chars: int = 1200, overlap: int = 100) -> list[str]:
     text = text.replace("\r\n", "\n").replace("\r", "\n")
-    chunks: List[str] = []
+    chunks: list[str] = []
     start = 0
     while start < len(text):
         end = min(len(text), start + max_chars)
@@ -73,91 +83,383 @@ def _detect_type(filename: str) -> str:
     return "application/octet-stream"
 
 
-def ingest_file(filename: str, data: bytes, *, source_path: str | None = None) -> int:
+def _parse_content(filename: str, data: bytes) -> tuple[str, str]:
+    content_type = _detect_type(filename)
+    if content_type == "application/pdf":
+        text = _read_pdf(data)
+    elif content_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
+        text = _read_docx(data)
+    elif content_type in {"text/plain"}:
+        text = _read_text(data)
+    elif content_type in {
+        "text/csv",
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    }:
+        text = _read_csv_or_xlsx(data, "text/csv" if content_type == "text/csv" else "xlsx")
+    else:
+        text = _read_text(data)
+    return content_type, text
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _embed_chunks(chunks: list[str]) -> tuple[np.ndarray, list[bool]]:
+    """Embed ``chunks`` in provider-sized batches, consulting the embedding cache.
+
+    Identical chunk texts are embedded once. Returns a ``(len(chunks), dim)``
+    float32 matrix aligned with ``chunks`` and, per chunk, whether it was
+    served from the cache.
+    """
+    settings = get_rag_settings()
+    shas = [_sha256(ch) for ch in chunks]
+    text_by_sha = dict(zip(shas, chunks))
+    found: dict[str, np.ndarray] = {}
+
+    if settings.embed_cache_enable and text_by_sha:
+        with db_session() as s:
+            from sqlalchemy import text as sql_text
+
+            keys = list(text_by_sha)
+            sql = sql_text(
+                "SELECT sha256, embedding FROM embedding_cache WHERE sha256 = ANY(:keys)"
+            )
+            for i in range(0, len(keys), 1000):
+                rows = s.execute(sql, {"keys": keys[i : i + 1000]}).all()
+                found.update((sha, np.asarray(emb, dtype=np.float32)) for sha, emb in rows)
+    cached = [sha in found for sha in shas]
+
+    missing = [sha for sha in text_by_sha if sha not in found]
+    batch_size = max(1, settings.embed_batch_size)
+    for i in range(0, len(missing), batch_size):
+        batch = missing[i : i + batch_size]
+        found.update(zip(batch, embed_texts([text_by_sha[sha] for sha in batch])))
+
+    if settings.embed_cache_enable and missing:
+        with db_session() as s:
+            from sqlalchemy import text as sql_text
+
+            now = datetime.utcnow()
+            s.execute(
+                sql_text(
+                    "INSERT INTO embedding_cache (sha256, embedding, created_at) "
+                    "VALUES (:sha256, :embedding, :created_at) ON CONFLICT (sha256) DO NOTHING"
+                ),
+                [{"sha256": sha, "embedding": found[sha], "created_at": now} for sha in missing],
+            )
+
+    if not shas:
+        return np.empty((0, 0), dtype=np.float32), cached
+    matrix = np.empty((len(shas), len(found[shas[0]])), dtype=np.float32)
+    for i, sha in enumerate(shas):
+        matrix[i] = found[sha]
+    return matrix, cached
+
+
+_schema_ready = False
+
+
+def ensure_schema() -> None:
+    """Create the vector extension and RAG tables once per process."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with db_session() as s:
+        from sqlalchemy import text as sql_text
+
+        s.execute(sql_text("CREATE EXTENSION IF NOT EXISTS vector"))
+        Base.metadata.create_all(bind=s.get_bind())
+    # Reconnect so every pooled connection registers the binary vector adapter.
+    ENGINE.dispose()
+    _schema_ready = True
+
+
+def _save_document(
+    filename: str,
+    content_type: str,
+    data: bytes,
+    source_path: str | None,
+    chunks: list[str],
+    embeddings: np.ndarray,
+    *,
+    ingest_key: str | None = None,
+) -> int:
+    """Write the document and its chunks in a single transaction.
+
+    Chunk rows are inserted in one executemany with the float32 embedding rows
+    bound directly, so they travel in pgvector's binary format. When
+    ``ingest_key`` is given and a document was already saved under it (an
+    earlier attempt of the same job committed), that document's id is returned.
+    """
+    ensure_schema()
+    with db_session() as s:
+        return write_document(
+            s, filename, content_type, data, source_path, chunks, embeddings, ingest_key=ingest_key
+        )
+
+
+def write_document(
+    s: Session,
+    filename: str,
+    content_type: str,
+    data: bytes,
+    source_path: str | None,
+    chunks: list[str],
+    embeddings: np.ndarray,
+    *,
+    ingest_key: str | None = None,
+) -> int:
+    """Insert the document and its chunks in the caller's transaction (see ``_save_document``)."""
+    from sqlalchemy import select
+    from sqlalchemy import text as sql_text
+
+    if ingest_key is not None:
+        existing = s.execute(
+            select(Document.id).where(Document.ingest_key == ingest_key)
+        ).scalar_one_or_none()
+        if existing is not None:
+            return int(existing)
+
+    content_sha = hashlib.sha256(data).hexdigest()
+    doc = Document(
+        filename=filename,
+        content_type=content_type,
+        source_path=source_path,
+        content_sha256=content_sha,
+        ingest_key=ingest_key,
+    )
+    s.add(doc)
+    s.flush()
+    now = datetime.utcnow()
+    rows = []
+    start = 0
+    for idx, ch in enumerate(chunks):
+        end = start + len(ch)
+        rows.append({
+            "document_id": doc.id,
+            "ordinal": idx,
+            "text": ch,
+            "embedding": embeddings[idx],
+            "start_char": start,
+            "end_char": end,
+            "created_at": now,
+        })
+        start = end - 100 if end - 100 > 0 else end
+    if rows:
+        s.execute(
+            sql_text(
+                "INSERT INTO chunks "
+                "(document_id, ordinal, text, embedding, start_char, end_char, created_at) "
+                "VALUES "
+                "(:document_id, :ordinal, :text, :embedding, :start_char, :end_char, :created_at)"
+            ),
+            rows,
+        )
+    return doc.id
+
+
+def load_document_texts(
+    s: Session, document_ids: Sequence[int], max_chars: int
+) -> dict[int, str]:
+    """Leading text of each document, stitched from its first chunks without the overlaps."""
+    from sqlalchemy import text as sql_text
+
+    rows = s.execute(
+        sql_text("""
+            SELECT document_id, text, start_char FROM chunks
+            WHERE document_id = ANY(:ids) AND (start_char IS NULL OR start_char < :max_chars)
+            ORDER BY document_id, ordinal
+        """),
+        {"ids": list(document_ids), "max_chars": max_chars},
+    )
+    texts: dict[int, str] = {}
+    for doc_id, text, start in rows:
+        current = texts.get(doc_id, "")
+        if len(current) >= max_chars:
+            continue
+        if start is None:
+            current = f"{current} {text}" if current else text
+        else:
+            current += text[max(0, len(current) - start):]
+        texts[doc_id] = current[:max_chars]
+    return texts
+
+
+@contextmanager
+def _stage(checkpoint: IngestCheckpoint | None, name: str) -> Iterator[None]:
+    """Report the current stage and its duration on the job, if any."""
+    if checkpoint is None:
+        yield
+        return
+    checkpoint.start_stage(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        checkpoint.finish_stage(name, time.perf_counter() - start)
+
+
+def _embed_with_checkpoint(
+    chunks: list[str], checkpoint: IngestCheckpoint
+) -> tuple[np.ndarray, int]:
+    done = checkpoint.load_embeddings()
+    parts = [done] if len(done) else []
+    cache_hits = 0
+    batch_size = max(1, get_rag_settings().embed_batch_size)
+    for offset in range(len(done), len(chunks), batch_size):
+        batch, cached = _embed_chunks(chunks[offset : offset + batch_size])
+        checkpoint.save_embeddings(offset, batch, cache_hits=sum(cached))
+        parts.append(batch)
+        cache_hits += sum(cached)
+    if not parts:
+        return np.empty((0, 0), dtype=np.float32), cache_hits
+    return np.vstack(parts), cache_hits
+
+
+def ingest_file(
+    filename: str,
+    data: bytes,
+    *,
+    source_path: str | None = None,
+    checkpoint: IngestCheckpoint | None = None,
+) -> int:
     with tracer.start_as_current_span("rag.ingest_file") as span:
         span.set_attributes({
             "rag.filename": filename,
             "rag.file_size_bytes": len(data),
             "rag.source_path": source_path or "",
         })
-        
-        content_type = _detect_type(filename)
-        span.set_attribute("rag.content_type", content_type)
-        
-        with tracer.start_as_current_span("rag.parse_content"):
-            if content_type == "application/pdf":
-                text = _read_pdf(data)
-            elif content_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-                text = _read_docx(data)
-            elif content_type in {"text/plain"}:
-                text = _read_text(data)
-            elif content_type in {"text/csv", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"}:
-                text = _read_csv_or_xlsx(data, "text/csv" if content_type == "text/csv" else "xlsx")
+        if checkpoint is not None and checkpoint.document_id is not None:
+            span.set_attribute("rag.resumed_stage", "saved")
+            return checkpoint.document_id
+
+        with tracer.start_as_current_span("rag.parse_content"), _stage(checkpoint, "parse"):
+            parsed = checkpoint.load_text() if checkpoint is not None else None
+            if parsed is None:
+                parsed = _parse_content(filename, data)
+                if checkpoint is not None:
+                    checkpoint.save_text(*parsed)
             else:
-                text = _read_text(data)
-            
+                span.set_attribute("rag.resumed_stage", "parsed")
+            content_type, text = parsed
+            span.set_attribute("rag.content_type", content_type)
             span.set_attribute("rag.text_length", len(text))
 
-        with tracer.start_as_current_span("rag.chunk_text"):
+        with tracer.start_as_current_span("rag.chunk_text"), _stage(checkpoint, "chunk"):
             chunks = _chunk_text(text)
             span.set_attribute("rag.chunk_count", len(chunks))
+            if checkpoint is not None:
+                checkpoint.set_chunk_count(len(chunks))
 
-        settings = get_rag_settings()
-        embeddings: List[List[float]] = []
-        
-        with tracer.start_as_current_span("rag.embed_chunks"):
-            if settings.embed_cache_enable:
-                with db_session() as s:
-                    from sqlalchemy import select
-
-                    for ch in chunks:
-                        sha = hashlib.sha256(ch.encode()).hexdigest()
-                        row = s.execute(select(EmbeddingCache).where(EmbeddingCache.sha256 == sha)).scalar_one_or_none()
-                        if row:
-                            embeddings.append(row.embedding)
-                        else:
-                            embeddings.append([])  # placeholder, fill after embedding
-                    # compute for missing
-                    to_embed = [chunks[i] for i, e in enumerate(embeddings) if not e]
-                    if to_embed:
-                        new_embs = embed_texts(to_embed)
-                        it = iter(new_embs)
-                        for i, e in enumerate(embeddings):
-                            if not e:
-                                emb = next(it)
-                                embeddings[i] = emb
-                                sha = hashlib.sha256(chunks[i].encode()).hexdigest()
-                                s.add(EmbeddingCache(sha256=sha, embedding=emb))
-                    s.flush()
-                    span.set_attribute("rag.cache_hits", len(embeddings) - len(to_embed))
-                    span.set_attribute("rag.cache_misses", len(to_embed))
+        with tracer.start_as_current_span("rag.embed_chunks"), _stage(checkpoint, "embed"):
+            if checkpoint is not None:
+                embeddings, cache_hits = _embed_with_checkpoint(chunks, checkpoint)
             else:
-                embeddings = embed_texts(chunks)
-                span.set_attribute("rag.cache_enabled", False)
+                embeddings, cached = _embed_chunks(chunks)
+                cache_hits = sum(cached)
+            span.set_attribute("rag.cache_enabled", get_rag_settings().embed_cache_enable)
+            span.set_attribute("rag.cache_hits", cache_hits)
+            span.set_attribute("rag.cache_misses", len(chunks) - cache_hits)
+
+        with tracer.start_as_current_span("rag.save_document"), _stage(checkpoint, "save"):
+            doc_id = _save_document(
+                filename,
+                content_type,
+                data,
+                source_path,
+                chunks,
+                embeddings,
+                ingest_key=checkpoint.key if checkpoint is not None else None,
+            )
+            if checkpoint is not None:
+                checkpoint.save_document(doc_id)
+            span.set_attributes({
+                "rag.document_id": doc_id,
+                "rag.content_sha256": hashlib.sha256(data).hexdigest(),
+            })
+            return doc_id
 
-        with tracer.start_as_current_span("rag.save_document"):
-            with db_session() as s:
-                from sqlalchemy import text as sql_text
-
-                # Ensure extensions/tables exist
-                s.execute(sql_text("CREATE EXTENSION IF NOT EXISTS vector"))
-                Base.metadata.create_all(bind=s.get_bind())
-
-                content_sha = hashlib.sha256(data).hexdigest()
-                doc = Document(filename=filename, content_type=content_type, source_path=source_path, content_sha256=content_sha)
-                s.add(doc)
-                s.flush()
-                start = 0
-                for idx, (ch, emb) in enumerate(zip(chunks, embeddings)):
-                    end = start + len(ch)
-                    s.add(Chunk(document_id=doc.id, ordinal=idx, text=ch, embedding=emb, start_char=start, end_char=end))
-                    start = end - 100 if end - 100 > 0 else end
-                s.flush()
-                
-                span.set_attributes({
-                    "rag.document_id": doc.id,
-                    "rag.content_sha256": content_sha,
-                })
-                return doc.id
 
+def ingest_many(
+    items: Sequence[tuple[str, bytes, str | None]],
+    checkpoints: Sequence[IngestCheckpoint | None] | None = None,
+) -> list[int | Exception]:
+    """Ingest several files, coalescing their chunks into shared embedding batches.
 
+    ``items`` are ``(filename, data, source_path)`` tuples. Each document is
+    committed in its own transaction; the result list holds the new document id
+    or the exception raised for the item at the same position. ``checkpoints``,
+    when given, line up with ``items`` and make each save idempotent.
+    """
+    ckpts = list(checkpoints) if checkpoints is not None else [None] * len(items)
+    with tracer.start_as_current_span("rag.ingest_many") as span:
+        span.set_attribute("rag.document_count", len(items))
+        results: list[int | Exception] = [0] * len(items)
+        parsed: list[tuple[int, str, list[str]]] = []
+
+        with tracer.start_as_current_span("rag.parse_content"):
+            for i, (filename, data, _) in enumerate(items):
+                ckpt = ckpts[i]
+                if ckpt is not None and ckpt.document_id is not None:
+                    results[i] = ckpt.document_id
+                    continue
+                try:
+                    with _stage(ckpt, "parse"):
+                        loaded = ckpt.load_text() if ckpt is not None else None
+                        content_type, text = loaded or _parse_content(filename, data)
+                        if ckpt is not None and loaded is None:
+                            ckpt.save_text(content_type, text)
+                    with _stage(ckpt, "chunk"):
+                        chunks = _chunk_text(text)
+                    if ckpt is not None:
+                        ckpt.set_chunk_count(len(chunks))
+                    parsed.append((i, content_type, chunks))
+                except Exception as exc:  # noqa: BLE001
+                    results[i] = exc
+
+        all_chunks = [ch for _, _, chunks in parsed for ch in chunks]
+        span.set_attribute("rag.chunk_count", len(all_chunks))
+        with tracer.start_as_current_span("rag.embed_chunks"):
+            for i, _, _ in parsed:
+                ckpt = ckpts[i]
+                if ckpt is not None:
+                    ckpt.start_stage("embed")
+            start = time.perf_counter()
+            try:
+                all_embeddings, cached = _embed_chunks(all_chunks)
+            except Exception as exc:  # noqa: BLE001
+                for i, _, _ in parsed:
+                    results[i] = exc
+                return results
+            embed_seconds = time.perf_counter() - start
+            span.set_attribute("rag.cache_hits", sum(cached))
+
+        with tracer.start_as_current_span("rag.save_document"):
+            offset = 0
+            for i, content_type, chunks in parsed:
+                filename, data, source_path = items[i]
+                ckpt = ckpts[i]
+                embeddings = all_embeddings[offset : offset + len(chunks)]
+                if ckpt is not None:
+                    # The embedding call is shared, so every job is charged its full duration.
+                    ckpt.record_embedded(len(chunks), sum(cached[offset : offset + len(chunks)]))
+                    ckpt.finish_stage("embed", embed_seconds)
+                offset += len(chunks)
+                try:
+                    with _stage(ckpt, "save"):
+                        doc_id = _save_document(
+                            filename,
+                            content_type,
+                            data,
+                            source_path,
+                            chunks,
+                            embeddings,
+                            ingest_key=ckpt.key if ckpt is not None else None,
+                        )
+                    if ckpt is not None:
+                        ckpt.save_document(doc_id)
+                    results[i] = doc_id
+                except Exception as exc:  # noqa: BLE001
+                    results[i] = exc
+        return results
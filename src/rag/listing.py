@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import base64
+import json
+from collections.abc import Iterator, Sequence
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from pydantic import BaseModel, Field
+from sqlalchemy import Select, select, tuple_
+from sqlalchemy.orm import InstrumentedAttribute, Session
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+
+from .models import Document
+
+# Rows fetched per round trip when an export streams through a server-side cursor.
+EXPORT_BATCH_SIZE = 1000
+MAX_PAGE_SIZE = 1000
+
+Cursor = tuple[datetime, int]
+# Turns one result row into the dict a listing returns.
+RowDict = Callable[[Any], dict[str, Any]]
+
+if TYPE_CHECKING:
+    from typing_extensions import TypeAlias, Unpack
+
+    # A SELECT of any columns.
+    AnySelect: TypeAlias = Select[Unpack[tuple[Any, ...]]]
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque cursor for the position after ``(created_at, id)``."""
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Inverse of ``encode_cursor``; raises ValueError for anything it did not produce."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception as exc:  # noqa: BLE001
+        raise ValueError(f"invalid cursor {cursor!r}") from exc
+
+
+def keyset(
+    stmt: AnySelect,
+    created_col: InstrumentedAttribute[datetime],
+    id_col: InstrumentedAttribute[int],
+    cursor: Optional[str],
+) -> AnySelect:
+    """Order newest first and continue after ``cursor``.
+
+    The row comparison matches a ``(..., created_at, id)`` index, so every page
+    is an index range scan no matter how deep it is, unlike OFFSET.
+    """
+    if cursor:
+        stmt = stmt.where(tuple_(created_col, id_col) < tuple_(*decode_cursor(cursor)))
+    return stmt.order_by(created_col.desc(), id_col.desc())
+
+
+def page(rows: Sequence[dict[str, Any]], limit: int) -> dict[str, Any]:
+    """``rows`` were fetched with ``limit + 1``; the extra row only says if another page exists."""
+    items = list(rows[:limit])
+    next_cursor = None
+    if len(rows) > limit and items:
+        last = items[-1]
+        next_cursor = encode_cursor(datetime.fromisoformat(last["created_at"]), last["id"])
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def stream(
+    s: Session, stmt: AnySelect, to_dict: RowDict, limit: Optional[int] = None
+) -> Iterator[dict[str, Any]]:
+    """Yield rows through a server-side cursor, ``EXPORT_BATCH_SIZE`` at a time."""
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    for row in s.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE)):
+        yield to_dict(row)
+
+
+class DocumentListFilters(BaseModel):
+    content_types: Optional[list[str]] = Field(default=None)
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+
+def _documents_stmt(filters: Optional[DocumentListFilters], cursor: Optional[str]) -> AnySelect:
+    stmt = select(
+        Document.id,
+        Document.filename,
+        Document.content_type,
+        Document.source_path,
+        Document.created_at,
+    )
+    if filters is not None:
+        if filters.content_types:
+            stmt = stmt.where(Document.content_type.in_(filters.content_types))
+        if filters.created_after is not None:
+            stmt = stmt.where(Document.created_at >= filters.created_after)
+        if filters.created_before is not None:
+            stmt = stmt.where(Document.created_at < filters.created_before)
+    return keyset(stmt, Document.created_at, Document.id, cursor)
+
+
+def _document_dict(row: Any) -> dict[str, Any]:
+    return {
+        "id": row.id,
+        "filename": row.filename,
+        "content_type": row.content_type,
+        "source_path": row.source_path,
+        "created_at": row.created_at.isoformat(),
+    }
+
+
+def list_documents(
+    s: Session,
+    filters: Optional[DocumentListFilters] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> dict[str, Any]:
+    """One page of documents, newest first: ``{"items": [...], "next_cursor": ...}``."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    rows = s.execute(_documents_stmt(filters, cursor).limit(limit + 1)).all()
+    return page([_document_dict(r) for r in rows], limit)
+
+
+def iter_documents(
+    s: Session,
+    filters: Optional[DocumentListFilters] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Iterator[dict[str, Any]]:
+    """Every matching document after ``cursor``, newest first, without loading them all at once."""
+    return stream(s, _documents_stmt(filters, cursor), _document_dict, limit)
+
+
+def listing_response(
+    request: Request,
+    filters: Optional[BaseModel],
+    list_page: Callable[..., dict[str, Any]],
+    iter_rows: Callable[..., Iterator[dict[str, Any]]],
+) -> Response:
+    """HTTP listing over ``list_page``/``iter_rows`` (e.g. ``list_documents``/``iter_documents``).
+
+    ``?limit=&cursor=`` returns one page with ``next_cursor``; ``?format=jsonl``
+    streams every remaining row (or ``limit`` rows) as JSON Lines instead.
+    """
+    from .db import read_session
+
+    params = request.query_params
+    cursor = params.get("cursor") or None
+    try:
+        if cursor:
+            decode_cursor(cursor)
+        limit = int(params["limit"]) if params.get("limit") else None
+    except ValueError as exc:
+        return JSONResponse({"error": str(exc)}, status_code=400)
+    if params.get("format") == "jsonl":
+
+        def lines() -> Iterator[str]:
+            with read_session() as s:
+                for item in iter_rows(s, filters, cursor, limit):
+                    yield json.dumps(item) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+    with read_session() as s:
+        return JSONResponse(list_page(s, filters, limit or 100, cursor))
@@ -0,0 +1,418 @@
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from sqlalchemy import text as sql_text
+from sqlalchemy.orm import Session
+
+from mcp_server.logging_config import get_logger
+
+from .settings import RAGSettings, get_rag_settings
+
+try:  # optional: graph search for large corpora
+    import hnswlib
+except ImportError:  # pragma: no cover - exercised only without the extra
+    hnswlib = None
+
+# Rows committed out of id order (long ingest transactions) are picked up by
+# re-reading this window before the created_at high-water mark.
+SYNC_OVERLAP = timedelta(minutes=5)
+# Rebuild the generation from Postgres once this share of rows is tombstoned.
+COMPACT_DEAD_FRACTION = 0.2
+SYNC_BATCH_ROWS = 5000
+
+logger = get_logger(__name__)
+
+
+def _gen_dir(root: Path, generation: int) -> Path:
+    return root / f"gen-{generation}"
+
+
+def _read_meta(root: Path) -> dict[str, Any] | None:
+    try:
+        meta: dict[str, Any] = json.loads((root / "meta.json").read_text())
+        return meta
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(root: Path, meta: dict[str, Any]) -> None:
+    tmp = root / "meta.json.tmp"
+    tmp.write_text(json.dumps(meta))
+    os.replace(tmp, root / "meta.json")
+
+
+def _append_rows(gen: Path, ids: Sequence[int], vectors: np.ndarray, texts: Sequence[str]) -> None:
+    """Append rows to a generation; readers only see them once ``meta.json`` counts them."""
+    vectors = np.ascontiguousarray(vectors, dtype="<f4")
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1, norms)
+    encoded = [t.encode() for t in texts]
+    text_path = gen / "texts.bin"
+    start = text_path.stat().st_size if text_path.exists() else 0
+    ends = start + np.cumsum([len(b) for b in encoded], dtype=np.int64)
+    with open(gen / "vectors.f32", "ab") as fh:
+        fh.write(vectors.tobytes())
+    with open(gen / "ids.i64", "ab") as fh:
+        fh.write(np.asarray(ids, dtype="<i8").tobytes())
+    with open(text_path, "ab") as fh:
+        fh.write(b"".join(encoded))
+    with open(gen / "text_ends.i64", "ab") as fh:
+        fh.write(ends.astype("<i8").tobytes())
+
+
+def _truncate_uncommitted(gen: Path, meta: dict[str, Any]) -> None:
+    """Cut every file back to what ``meta`` counts.
+
+    A sync that failed after appending but before writing ``meta.json`` leaves
+    orphan bytes; appending after them would misalign ids and text offsets.
+    Readers never map past ``meta``, so truncating under them is safe.
+    """
+    count, dim = int(meta["count"]), int(meta["dim"])
+    sizes = {
+        "vectors.f32": count * dim * 4,
+        "ids.i64": count * 8,
+        "text_ends.i64": count * 8,
+        "texts.bin": int(meta.get("text_bytes", 0)),
+        "deleted.i64": int(meta.get("deleted", 0)) * 8,
+    }
+    for name, size in sizes.items():
+        path = gen / name
+        if path.exists() and path.stat().st_size > size:
+            logger.warning(
+                "rag_local_index_truncated", file=name, size=path.stat().st_size, committed=size
+            )
+            os.truncate(path, size)
+
+
+def _append_tombstones(gen: Path, chunk_ids: Sequence[int]) -> None:
+    with open(gen / "deleted.i64", "ab") as fh:
+        fh.write(np.asarray(chunk_ids, dtype="<i8").tobytes())
+
+
+def _map(path: Path, dtype: str, count: int) -> np.ndarray:
+    if count == 0 or not path.exists():
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+class LocalVectorIndex:
+    """Read-only, memory-mapped replica of ``chunks`` answering top-k locally.
+
+    Vectors, ids and texts are mapped read-only from files written by
+    :func:`sync_local_index`, so every server worker on a host shares the same
+    page-cache pages. The maps are reopened when ``meta.json`` changes.
+    """
+
+    def __init__(self, root: Path, refresh_seconds: float = 5.0):
+        self.root = root
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._meta: dict[str, Any] | None = None
+        self._checked_at = 0.0
+        self._load(_read_meta(root))
+
+    def _load(self, meta: dict[str, Any] | None) -> None:
+        if meta is None:
+            self._meta = None
+            return
+        gen = _gen_dir(self.root, meta["generation"])
+        count, dim = int(meta["count"]), int(meta["dim"])
+        vectors: np.ndarray
+        if count:
+            vectors = np.memmap(gen / "vectors.f32", dtype="<f4", mode="r", shape=(count, dim))
+        else:
+            vectors = np.empty((0, dim), dtype=np.float32)
+        ids = _map(gen / "ids.i64", "<i8", count)
+        deleted = _map(gen / "deleted.i64", "<i8", int(meta.get("deleted", 0)))
+        graph = None
+        hnsw_count = int(meta.get("hnsw_count", 0))
+        dead = np.isin(ids, deleted) if len(deleted) else np.zeros(count, dtype=bool)
+        hnsw_alive = 0
+        if hnswlib is not None and hnsw_count and (gen / "hnsw.bin").exists():
+            graph = hnswlib.Index(space="ip", dim=dim)
+            graph.load_index(str(gen / "hnsw.bin"), max_elements=hnsw_count)
+            # Deleted labels stay in the graph for routing but are never returned,
+            # so queries keep a fixed k and ef however many tombstones accumulate.
+            for label in np.flatnonzero(dead[:hnsw_count]):
+                graph.mark_deleted(int(label))
+            hnsw_alive = hnsw_count - int(dead[:hnsw_count].sum())
+        else:
+            hnsw_count = 0
+        self._vectors = vectors
+        self._ids = ids
+        self._texts = _map(gen / "texts.bin", "u1", int(meta.get("text_bytes", 0)))
+        self._text_ends = _map(gen / "text_ends.i64", "<i8", count)
+        self._dead = dead
+        self._graph = graph
+        self._hnsw_count = hnsw_count
+        self._hnsw_alive = hnsw_alive
+        self._meta = meta
+
+    def refresh(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self.refresh_seconds:
+            return
+        with self._lock:
+            self._checked_at = now
+            meta = _read_meta(self.root)
+            if meta != self._meta:
+                self._load(meta)
+
+    @property
+    def count(self) -> int:
+        return int(self._meta["count"]) if self._meta else 0
+
+    def _text(self, row: int) -> str:
+        start = int(self._text_ends[row - 1]) if row else 0
+        return bytes(self._texts[start : int(self._text_ends[row])]).decode()
+
+    def search(self, query_embedding: np.ndarray, k: int) -> list[tuple[int, str, float]]:
+        """Cosine top-k as ``(chunk_id, text, score)``, matching the Postgres search."""
+        return self.search_many(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1), k)[0]
+
+    def search_many(
+        self, query_embeddings: np.ndarray, k: int
+    ) -> list[list[tuple[int, str, float]]]:
+        """Top-k for each row of ``query_embeddings`` with one matrix product (or graph query)."""
+        self.refresh()
+        n = len(query_embeddings)
+        if not self.count or not n:
+            return [[] for _ in range(n)]
+        q: np.ndarray = np.asarray(query_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        q = q / np.where(norms == 0, 1, norms)
+        hits: list[list[tuple[int, float]]] = [[] for _ in range(n)]
+        start = 0
+        if self._graph is not None:
+            want = min(k, self._hnsw_alive)
+            if want:
+                self._graph.set_ef(max(64, k))
+                labels, distances = self._graph.knn_query(q, k=want)
+                for i in range(n):
+                    hits[i] = [(int(r), 1.0 - float(d)) for r, d in zip(labels[i], distances[i])]
+            start = self._hnsw_count
+        # Rows not covered by the graph (or all rows, without one) are scanned exactly.
+        if start < self.count:
+            scores = np.asarray(q @ self._vectors[start:].T)
+            scores[:, self._dead[start:]] = -np.inf
+            kk = min(k, scores.shape[1])
+            top = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+            for i in range(n):
+                hits[i].extend(
+                    (start + int(j), float(scores[i, j]))
+                    for j in top[i]
+                    if np.isfinite(scores[i, j])
+                )
+        out: list[list[tuple[int, str, float]]] = []
+        for row_hits in hits:
+            row_hits.sort(key=lambda h: h[1], reverse=True)
+            out.append([(int(self._ids[r]), self._text(r), score) for r, score in row_hits[:k]])
+        return out
+
+
+@lru_cache(maxsize=1)
+def _open_local_index(root: str) -> LocalVectorIndex:
+    return LocalVectorIndex(Path(root))
+
+
+def get_local_index(settings: RAGSettings | None = None) -> LocalVectorIndex | None:
+    """The process-wide replica, or None when disabled or not yet built."""
+    settings = settings or get_rag_settings()
+    if not settings.local_index_dir:
+        return None
+    index = _open_local_index(settings.local_index_dir)
+    index.refresh()
+    return index if index.count else None
+
+
+@contextmanager
+def _sync_lock(root: Path, blocking: bool) -> Iterator[bool]:
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / ".lock", "w") as fh:
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _stream_chunks(
+    s: Session, where: str, params: dict[str, Any]
+) -> Iterator[tuple[list[int], np.ndarray, list[str], datetime]]:
+    result = s.execute(
+        sql_text(f"SELECT id, text, embedding, created_at FROM chunks WHERE {where} ORDER BY id"),
+        params,
+    ).yield_per(SYNC_BATCH_ROWS)
+    for rows in result.partitions():
+        yield (
+            [int(r[0]) for r in rows],
+            np.stack([np.asarray(r[2], dtype=np.float32) for r in rows]),
+            [r[1] for r in rows],
+            max(r[3] for r in rows),
+        )
+
+
+def _max_tombstone_id(s: Session) -> int:
+    return int(
+        s.execute(sql_text("SELECT COALESCE(MAX(id), 0) FROM chunk_tombstones")).scalar_one()
+    )
+
+
+def _build_hnsw(gen: Path, meta: dict[str, Any], min_rows: int) -> None:
+    count = int(meta["count"])
+    if (
+        hnswlib is None
+        or count < min_rows
+        or count - int(meta.get("hnsw_count", 0)) < max(10000, count // 10)
+    ):
+        return
+    vectors = np.memmap(gen / "vectors.f32", dtype="<f4", mode="r", shape=(count, int(meta["dim"])))
+    graph = hnswlib.Index(space="ip", dim=int(meta["dim"]))
+    graph.init_index(max_elements=count, ef_construction=200, M=16)
+    graph.add_items(vectors, np.arange(count))
+    graph.save_index(str(gen / "hnsw.tmp"))
+    os.replace(gen / "hnsw.tmp", gen / "hnsw.bin")
+    meta["hnsw_count"] = count
+
+
+def _rebuild(root: Path, previous: dict[str, Any] | None) -> dict[str, Any]:
+    from .db import db_session
+
+    generation = (previous["generation"] + 1) if previous else 1
+    gen = _gen_dir(root, generation)
+    shutil.rmtree(gen, ignore_errors=True)
+    gen.mkdir(parents=True)
+    meta = {"generation": generation, "count": 0, "dim": 0, "hwm_id": 0, "deleted": 0}
+    hwm_created_at: datetime | None = None
+    with db_session() as s:
+        meta["tombstone_hwm"] = _max_tombstone_id(s)
+        for ids, vectors, texts, created in _stream_chunks(s, "TRUE", {}):
+            _append_rows(gen, ids, vectors, texts)
+            meta["count"] += len(ids)
+            meta["dim"] = vectors.shape[1]
+            meta["hwm_id"] = max(meta["hwm_id"], ids[-1])
+            hwm_created_at = max(hwm_created_at or created, created)
+    meta["hwm_created_at"] = hwm_created_at.isoformat() if hwm_created_at else None
+    meta["text_bytes"] = (gen / "texts.bin").stat().st_size if (gen / "texts.bin").exists() else 0
+    return meta
+
+
+def _sync_incremental(root: Path, meta: dict[str, Any]) -> dict[str, Any]:
+    from .db import db_session
+
+    meta = dict(meta)
+    gen = _gen_dir(root, meta["generation"])
+    _truncate_uncommitted(gen, meta)
+    known = np.array(_map(gen / "ids.i64", "<i8", meta["count"]))
+    since = (
+        datetime.fromisoformat(meta["hwm_created_at"]) - SYNC_OVERLAP
+        if meta.get("hwm_created_at")
+        else None
+    )
+    with db_session() as s:
+        # Both arms are index range scans (primary key and ix_chunks_created_at).
+        where = "id > :hwm" + (" OR created_at > :since" if since else "")
+        for ids, vectors, texts, created in _stream_chunks(
+            s, where, {"hwm": meta["hwm_id"], "since": since}
+        ):
+            new = ~np.isin(ids, known)
+            if not new.any():
+                continue
+            fresh = [i for i, keep in zip(ids, new) if keep]
+            _append_rows(gen, fresh, vectors[new], [t for t, keep in zip(texts, new) if keep])
+            known = np.concatenate([known, fresh])
+            meta["count"] += len(fresh)
+            meta["dim"] = meta["dim"] or vectors.shape[1]
+            meta["hwm_id"] = max(meta["hwm_id"], max(fresh))
+            previous = (
+                datetime.fromisoformat(meta["hwm_created_at"])
+                if meta.get("hwm_created_at")
+                else created
+            )
+            meta["hwm_created_at"] = max(previous, created).isoformat()
+        rows = s.execute(
+            sql_text("SELECT id, chunk_id FROM chunk_tombstones WHERE id > :hwm ORDER BY id"),
+            {"hwm": meta.get("tombstone_hwm", 0)},
+        ).fetchall()
+    if rows:
+        _append_tombstones(gen, [int(r[1]) for r in rows])
+        meta["deleted"] = int(meta.get("deleted", 0)) + len(rows)
+        meta["tombstone_hwm"] = int(rows[-1][0])
+    meta["text_bytes"] = (gen / "texts.bin").stat().st_size if (gen / "texts.bin").exists() else 0
+    return meta
+
+
+def sync_local_index(
+    settings: RAGSettings | None = None, *, rebuild: bool = False, blocking: bool = True
+) -> dict[str, Any] | None:
+    """Bring the on-disk replica up to date with ``chunks``; returns the new meta.
+
+    Only one process per directory syncs at a time; with ``blocking=False`` a
+    sync already in progress elsewhere makes this a no-op returning None.
+    """
+    settings = settings or get_rag_settings()
+    root = Path(settings.local_index_dir)
+    with _sync_lock(root, blocking) as acquired:
+        if not acquired:
+            return None
+        previous = _read_meta(root)
+        if (
+            rebuild
+            or previous is None
+            or (
+                previous["count"]
+                and previous.get("deleted", 0) / previous["count"] > COMPACT_DEAD_FRACTION
+            )
+        ):
+            meta = _rebuild(root, previous)
+        else:
+            meta = _sync_incremental(root, previous)
+        _build_hnsw(_gen_dir(root, meta["generation"]), meta, settings.local_index_hnsw_min_rows)
+        if meta != previous:
+            meta["synced_at"] = datetime.utcnow().isoformat()
+            _write_meta(root, meta)
+        # Readers keep their maps of older generations until they reopen; unlinking is safe.
+        for old in root.glob("gen-*"):
+            if old.name != f"gen-{meta['generation']}":
+                shutil.rmtree(old, ignore_errors=True)
+        return meta
+
+
+_sync_thread: threading.Thread | None = None
+
+
+def start_local_index_sync(settings: RAGSettings | None = None) -> None:
+    """Map the replica now and keep it in sync from a daemon thread (idempotent)."""
+    global _sync_thread
+    settings = settings or get_rag_settings()
+    if not settings.local_index_dir or _sync_thread is not None:
+        return
+    get_local_index(settings)
+
+    def loop() -> None:
+        while True:
+            try:
+                sync_local_index(settings, blocking=False)
+            except Exception:  # noqa: BLE001
+                logger.exception("rag_local_index_sync_failed")
+            time.sleep(settings.local_index_sync_seconds)
+
+    _sync_thread = threading.Thread(target=loop, name="rag-local-index-sync", daemon=True)
+    _sync_thread.start()
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+
+from prometheus_client import REGISTRY, Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+RAG_INGEST_JOB_DURATION = Histogram(
+    "rag_ingest_job_duration_seconds",
+    "Wall time of async ingest jobs in seconds",
+    ["status"],
+    buckets=(0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+
+RAG_INGEST_JOB_THROUGHPUT = Histogram(
+    "rag_ingest_job_throughput_bytes_per_second",
+    "Input bytes ingested per second of job wall time",
+    buckets=(1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7),
+)
+
+RAG_QUERY_EMBEDDING_CACHE = Counter(
+    "rag_query_embedding_cache_total",
+    "Query embedding lookups by outcome (local_hit, redis_hit, miss)",
+    ["result"],
+)
+
+RAG_RERANK_LATENCY = Histogram(
+    "rag_rerank_batch_seconds",
+    "Cross-encoder inference time per batched rerank call",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.15, 0.25, 0.5, 1, 2.5),
+)
+
+RAG_RERANK_PAIRS = Counter(
+    "rag_rerank_pairs_total",
+    "Query/chunk pairs seen by the rerank stage by outcome (cached, scored, timeout, busy, error)",
+    ["outcome"],
+)
+
+RAG_COALESCED_REQUESTS = Counter(
+    "rag_coalesced_requests_total",
+    "Requests served by another identical in-flight request instead of running the pipeline",
+    ["namespace", "scope"],
+)
+
+RAG_DB_POOL_CHECKOUT_WAIT = Histogram(
+    "rag_db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled database connection",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 30),
+)
+
+GRC_ANALYSIS_CACHE = Counter(
+    "grc_analysis_cache_total",
+    "GRC document analysis lookups by analysis kind and cache tier",
+    ["kind", "result"],
+)
+
+
+def observe_ingest_job(seconds: float, size_bytes: int, ok: bool) -> None:
+    RAG_INGEST_JOB_DURATION.labels(status="success" if ok else "failed").observe(seconds)
+    if ok and seconds > 0:
+        RAG_INGEST_JOB_THROUGHPUT.observe(size_bytes / seconds)
+
+
+class QueueCollector(Collector):
+    """Reads the ``rag`` RQ queue state from Redis at scrape time."""
+
+    @staticmethod
+    def _families() -> tuple[GaugeMetricFamily, GaugeMetricFamily, GaugeMetricFamily]:
+        return (
+            GaugeMetricFamily("rag_queue_up", "Whether the rag queue could be read from Redis"),
+            GaugeMetricFamily(
+                "rag_queue_jobs", "Jobs in the rag ingest queue by state", labels=["state"]
+            ),
+            GaugeMetricFamily(
+                "rag_queue_oldest_job_age_seconds",
+                "Age of the oldest job still waiting in the rag queue",
+            ),
+        )
+
+    def describe(self) -> Iterator[GaugeMetricFamily]:
+        return iter(self._families())
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        from rq.job import Job
+        from rq.utils import now
+
+        from .worker import get_queue
+
+        up, jobs, oldest = self._families()
+        try:
+            queue = get_queue()
+            jobs.add_metric(["queued"], queue.count)
+            jobs.add_metric(["started"], queue.started_job_registry.count)
+            jobs.add_metric(["failed"], queue.failed_job_registry.count)
+            jobs.add_metric(["deferred"], queue.deferred_job_registry.count)
+            age = 0.0
+            head = queue.get_job_ids(0, 0)
+            if head:
+                job = Job.fetch(head[0], connection=queue.connection)
+                if job.enqueued_at is not None:
+                    age = max(0.0, (now() - job.enqueued_at).total_seconds())
+            oldest.add_metric([], age)
+        except Exception:  # noqa: BLE001
+            up.add_metric([], 0)
+            yield up
+            return
+        up.add_metric([], 1)
+        yield up
+        yield jobs
+        yield oldest
+
+
+_queue_collector: QueueCollector | None = None
+
+
+def register_queue_collector() -> None:
+    """Export the rag queue gauges on the default registry (idempotent)."""
+    global _queue_collector
+    if _queue_collector is None:
+        _queue_collector = QueueCollector()
+        REGISTRY.register(_queue_collector)
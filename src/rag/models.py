@@ -2,9 +2,21 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, String, Text
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from pgvector.sqlalchemy import Vector
+from sqlalchemy import (
+    DDL,
+    BigInteger,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    event,
+)
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+
+EMBEDDING_DIM = 1536
 
 
 class Base(DeclarativeBase):
@@ -19,34 +31,99 @@ class Document(Base):
     content_type: Mapped[str] = mapped_column(String(64), nullable=False)
     source_path: Mapped[str | None] = mapped_column(String(1024), nullable=True)
     content_sha256: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
+    ingest_key: Mapped[str | None] = mapped_column(String(64), nullable=True, unique=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
-    chunks: Mapped[list[Chunk]] = relationship(back_populates="document", cascade="all, delete-orphan")
+    # Short LLM summary and its embedding; the coarse stage of hierarchical retrieval
+    # (see rag.summaries).
+    summary: Mapped[str | None] = mapped_column(Text, nullable=True)
+    summary_embedding: Mapped[list[float] | None] = mapped_column(
+        Vector(EMBEDDING_DIM), nullable=True
+    )
+    summarized_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    chunks: Mapped[list[Chunk]] = relationship(
+        back_populates="document", cascade="all, delete-orphan"
+    )
+
+    __table_args__ = (
+        Index(
+            "ix_documents_summary_embedding",
+            "summary_embedding",
+            postgresql_using="hnsw",
+            postgresql_ops={"summary_embedding": "vector_cosine_ops"},
+        ),
+        # Keyset pagination of the document listing (see rag.listing)
+        Index("ix_documents_created_at_id", "created_at", "id"),
+    )
 
 
 class Chunk(Base):
     __tablename__ = "chunks"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    document_id: Mapped[int] = mapped_column(ForeignKey("documents.id", ondelete="CASCADE"), nullable=False)
+    document_id: Mapped[int] = mapped_column(
+        ForeignKey("documents.id", ondelete="CASCADE"), nullable=False
+    )
     ordinal: Mapped[int] = mapped_column(Integer, nullable=False)
     text: Mapped[str] = mapped_column(Text, nullable=False)
-    embedding: Mapped[list[float]] = mapped_column(Vector(1536))
+    embedding: Mapped[list[float]] = mapped_column(Vector(EMBEDDING_DIM))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
     page_number: Mapped[int | None] = mapped_column(Integer, nullable=True)
     section: Mapped[str | None] = mapped_column(String(256), nullable=True)
     start_char: Mapped[int | None] = mapped_column(Integer, nullable=True)
     end_char: Mapped[int | None] = mapped_column(Integer, nullable=True)
 
+    # Denormalized document metadata that vector searches filter on (see rag.filters).
+    compliance_framework: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    document_type: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    doc_status: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    effective_date: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
     document: Mapped[Document] = relationship(back_populates="chunks")
 
+    __table_args__ = (
+        Index("ix_chunks_document_id_ordinal", "document_id", "ordinal"),
+        Index("ix_chunks_filters", "compliance_framework", "doc_status", "document_type"),
+        Index("ix_chunks_effective_date", "effective_date"),
+        # Local index replicas re-read recently created chunks on every sync (see rag.local_index)
+        Index("ix_chunks_created_at", "created_at"),
+    )
+
 
 class EmbeddingCache(Base):
     __tablename__ = "embedding_cache"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     sha256: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
-    embedding: Mapped[list[float]] = mapped_column(Vector(1536))
+    embedding: Mapped[list[float]] = mapped_column(Vector(EMBEDDING_DIM))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
 
+class ChunkTombstone(Base):
+    """Ids of deleted chunks, filled by a trigger so local index replicas can drop them."""
+
+    __tablename__ = "chunk_tombstones"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    chunk_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    deleted_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+CHUNK_TOMBSTONE_TRIGGER = """
+CREATE OR REPLACE FUNCTION record_chunk_tombstone() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO chunk_tombstones (chunk_id, deleted_at) VALUES (OLD.id, now() AT TIME ZONE 'utc');
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+DROP TRIGGER IF EXISTS chunks_tombstone ON chunks;
+CREATE TRIGGER chunks_tombstone AFTER DELETE ON chunks
+    FOR EACH ROW EXECUTE FUNCTION record_chunk_tombstone();
+"""
+
+event.listen(
+    ChunkTombstone.__table__,
+    "after_create",
+    DDL(CHUNK_TOMBSTONE_TRIGGER),  # type: ignore[no-untyped-call]
+)
@@ -1,27 +1,49 @@
 from __future__ import annotations
 
+import base64
 import os
-from typing import Iterable, List
+from collections.abc import Iterable
+from functools import lru_cache
 
+import numpy as np
 from openai import OpenAI
 from opentelemetry import trace
 
 tracer = trace.get_tracer(__name__)
 
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+@lru_cache(maxsize=4)
+def _client_for(api_key: str) -> OpenAI:
+    # One client (and HTTP connection pool) per key, reused across calls.
+    return OpenAI(api_key=api_key)
+
 
 def _client() -> OpenAI:
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY not set")
-    return OpenAI(api_key=api_key)
+    return _client_for(api_key)
+
+
+def _decode_embedding(value: object) -> np.ndarray:
+    if isinstance(value, str):
+        return np.frombuffer(base64.b64decode(value), dtype="<f4")
+    return np.asarray(value, dtype=np.float32)
+
 
+def embed_texts(texts: Iterable[str], model: str = EMBEDDING_MODEL) -> np.ndarray:
+    """Embed ``texts`` into a contiguous ``(len(texts), dim)`` float32 matrix.
 
-def embed_texts(texts: Iterable[str], model: str = "text-embedding-3-small") -> List[List[float]]:
+    Vectors are requested base64-encoded and decoded straight into the matrix,
+    so no per-dimension Python floats are created.
+    """
     with tracer.start_as_current_span("openai.embed_texts") as span:
         client = _client()
         items = list(texts)
         if not items:
-            return []
+            return np.empty((0, 0), dtype=np.float32)
         
         span.set_attributes({
             "openai.model": model,
@@ -29,14 +51,18 @@ def embed_texts(texts: Iterable[str], model: str = "text-embedding-3-small") ->
             "openai.input_tokens": sum(len(t.split()) for t in items),  # rough estimate
         })
         
-        resp = client.embeddings.create(model=model, input=items)
+        resp = client.embeddings.create(model=model, input=items, encoding_format="base64")
+        first = _decode_embedding(resp.data[0].embedding)
+        out = np.empty((len(resp.data), first.shape[0]), dtype=np.float32)
+        for d in resp.data:
+            out[d.index] = _decode_embedding(d.embedding)
         
         span.set_attributes({
             "openai.usage_tokens": resp.usage.total_tokens if resp.usage else 0,
-            "openai.embedding_dimension": len(resp.data[0].embedding) if resp.data else 0,
+            "openai.embedding_dimension": out.shape[1],
         })
         
-        return [d.embedding for d in resp.data]
+        return out
 
 
 def generate_answer(prompt: str, model: str = "gpt-4o-mini") -> str:
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import os
+import resource
+import signal
+
+import click
+from rq import Queue
+from rq.job import Job
+
+from mcp_server.logging_config import configure_logging, get_logger
+
+from .settings import get_rag_settings
+from .worker import BatchIngestWorker, get_queue, get_redis
+
+
+def _current_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Peak rather than current RSS, reported in KiB on Linux.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class PreforkIngestWorker(BatchIngestWorker):
+    """Long-lived ingest worker that stops itself once it outgrows ``max_rss_bytes``."""
+
+    max_rss_bytes = 0
+
+    def execute_job(self, job: Job, queue: Queue) -> None:
+        super().execute_job(job, queue)
+        rss = _current_rss_bytes()
+        if self.max_rss_bytes and rss > self.max_rss_bytes:
+            self.log.info("Worker %s: RSS %d bytes over limit, recycling", self.key, rss)
+            self._stop_requested = True
+
+
+def preload() -> None:
+    """Import and initialise everything jobs need once, before forking.
+
+    Children inherit the parsers, ORM models and OpenAI client copy-on-write;
+    the schema check runs here so no job pays for it.
+    """
+    from . import ingest, models, openai_utils  # noqa: F401  (pandas, fitz, docx, SQLAlchemy)
+    from .db import ENGINE
+
+    try:
+        openai_utils._client()
+    except RuntimeError:
+        pass
+    ingest.ensure_schema()
+    # Connections must not be shared with children; each child opens its own.
+    ENGINE.dispose()
+
+
+def _child_main(slot: int, max_jobs: int, max_memory_mb: int) -> None:
+    from .db import ENGINE
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    ENGINE.dispose(close=False)
+    with ENGINE.connect():
+        pass  # warm one pooled connection for the child's lifetime
+
+    PreforkIngestWorker.max_rss_bytes = max_memory_mb * 1024 * 1024
+    worker = PreforkIngestWorker([get_queue()], connection=get_redis(), metrics_port_offset=slot)
+    worker.work(max_jobs=max_jobs or None, with_scheduler=False)
+
+
+def run_prefork(processes: int, max_jobs: int, max_memory_mb: int) -> None:
+    """Preload once, then keep ``processes`` worker children alive, replacing any that exit."""
+    logger = get_logger(__name__)
+    preload()
+    children: dict[int, int] = {}
+    stopping = False
+
+    def spawn(slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _child_main(slot, max_jobs, max_memory_mb)
+            except BaseException:  # noqa: BLE001
+                logger.exception("rag_worker_child_crashed", slot=slot)
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = slot
+        logger.info("rag_worker_child_started", pid=pid, slot=slot)
+
+    def stop(signum: int, _frame: object | None) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                # RQ treats SIGTERM as a warm shutdown: the current job finishes first.
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for slot in range(max(1, processes)):
+        spawn(slot)
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        if pid not in children:
+            continue
+        slot = children.pop(pid)
+        logger.info("rag_worker_child_exited", pid=pid, slot=slot, status=status)
+        if not stopping:
+            spawn(slot)
+
+
+@click.command()
+@click.option("--processes", type=int, default=None, help="Worker children (RAG_WORKER_PROCESSES)")
+@click.option(
+    "--max-jobs", type=int, default=None, help="Recycle a child after N jobs (RAG_WORKER_MAX_JOBS)"
+)
+@click.option(
+    "--max-memory-mb",
+    type=int,
+    default=None,
+    help="Recycle a child above this RSS (RAG_WORKER_MAX_MEMORY_MB)",
+)
+def main(processes: int | None, max_jobs: int | None, max_memory_mb: int | None) -> None:
+    """Run preforked ingest workers on the rag queue."""
+    configure_logging()
+    settings = get_rag_settings()
+    run_prefork(
+        processes if processes is not None else settings.worker_processes,
+        max_jobs if max_jobs is not None else settings.worker_max_jobs,
+        max_memory_mb if max_memory_mb is not None else settings.worker_max_memory_mb,
+    )
+
+
+if __name__ == "__main__":
+    main()
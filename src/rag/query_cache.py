@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Sequence
+from functools import lru_cache
+from typing import cast
+
+import numpy as np
+
+from mcp_server.logging_config import get_logger
+
+from .metrics import RAG_QUERY_EMBEDDING_CACHE
+from .openai_utils import EMBEDDING_MODEL, embed_texts
+from .settings import RAGSettings, get_rag_settings
+
+logger = get_logger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form used both as the cache key and as the text that is embedded."""
+    return " ".join(unicodedata.normalize("NFKC", query).split())
+
+
+def cache_key(query: str, model: str = EMBEDDING_MODEL) -> str:
+    return hashlib.sha256(f"{model}\0{normalize_query(query)}".encode()).hexdigest()
+
+
+class QueryEmbeddingCache:
+    """Two-tier cache of query embeddings: an in-process LRU in front of optional Redis.
+
+    Redis holds each vector as a little-endian float32 blob under
+    ``rag:qemb:<sha256(model, query)>`` with the same TTL as the local tier.
+    Redis errors only cost a cache miss.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int, use_redis: bool = False):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.use_redis = use_redis
+        self._entries: OrderedDict[str, tuple[float, np.ndarray]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_local(self, key: str) -> np.ndarray | None:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires, vector = item
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return vector
+
+    def _put_local(self, key: str, vector: np.ndarray) -> None:
+        if self.max_entries <= 0:
+            return
+        vector = np.array(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _redis_key(key: str) -> str:
+        return f"rag:qemb:{key}"
+
+    def _get_redis(self, keys: list[str]) -> dict[str, np.ndarray]:
+        if not self.use_redis or not keys:
+            return {}
+        from .worker import get_redis
+
+        try:
+            blobs = get_redis().mget([self._redis_key(k) for k in keys])
+        except Exception:  # noqa: BLE001
+            logger.warning("rag_query_cache_redis_unavailable", exc_info=True)
+            return {}
+        return {k: np.frombuffer(cast(bytes, b), dtype="<f4") for k, b in zip(keys, blobs) if b}
+
+    def _put_redis(self, items: dict[str, np.ndarray]) -> None:
+        if not self.use_redis or not items:
+            return
+        from .worker import get_redis
+
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for key, vector in items.items():
+                pipe.set(
+                    self._redis_key(key),
+                    np.asarray(vector, dtype="<f4").tobytes(),
+                    ex=self.ttl_seconds,
+                )
+            pipe.execute()
+        except Exception:  # noqa: BLE001
+            logger.warning("rag_query_cache_redis_unavailable", exc_info=True)
+
+    def embed(
+        self, queries: Sequence[str], model: str = EMBEDDING_MODEL, batch_size: int = 256
+    ) -> np.ndarray:
+        """Embed ``queries`` as a float32 matrix, calling the API only for uncached texts."""
+        texts = [normalize_query(q) for q in queries]
+        keys = [cache_key(t, model) for t in texts]
+        found: dict[str, np.ndarray] = {}
+        for key in dict.fromkeys(keys):
+            vector = self._get_local(key)
+            if vector is not None:
+                found[key] = vector
+        local_hits = len(found)
+
+        missing = [k for k in dict.fromkeys(keys) if k not in found]
+        remote = self._get_redis(missing)
+        for key, vector in remote.items():
+            self._put_local(key, vector)
+        found.update(remote)
+
+        pending = {k: t for k, t in zip(keys, texts) if k not in found}
+        fresh: dict[str, np.ndarray] = {}
+        pending_keys = list(pending)
+        for i in range(0, len(pending_keys), batch_size):
+            batch = pending_keys[i : i + batch_size]
+            vectors = embed_texts([pending[k] for k in batch], model=model)
+            fresh.update(zip(batch, vectors))
+        for key, vector in fresh.items():
+            self._put_local(key, vector)
+        self._put_redis(fresh)
+        found.update(fresh)
+
+        RAG_QUERY_EMBEDDING_CACHE.labels(result="local_hit").inc(local_hits)
+        RAG_QUERY_EMBEDDING_CACHE.labels(result="redis_hit").inc(len(remote))
+        RAG_QUERY_EMBEDDING_CACHE.labels(result="miss").inc(len(fresh))
+        if not keys:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([found[k] for k in keys])
+
+
+@lru_cache(maxsize=1)
+def _cache_for(max_entries: int, ttl_seconds: int, use_redis: bool) -> QueryEmbeddingCache:
+    return QueryEmbeddingCache(max_entries, ttl_seconds, use_redis)
+
+
+def get_query_cache(settings: RAGSettings | None = None) -> QueryEmbeddingCache:
+    settings = settings or get_rag_settings()
+    return _cache_for(
+        settings.query_cache_size, settings.query_cache_ttl_seconds, settings.query_cache_redis
+    )
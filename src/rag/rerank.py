@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import importlib
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from opentelemetry import trace
+
+from mcp_server.logging_config import get_logger
+
+from .metrics import RAG_RERANK_LATENCY, RAG_RERANK_PAIRS
+from .query_cache import cache_key
+from .settings import RAGSettings, get_rag_settings
+
+tracer = trace.get_tracer(__name__)
+logger = get_logger(__name__)
+
+
+class Reranker(ABC):
+    """Scores (query, passage) pairs; higher is more relevant.
+
+    Implementations get every pair of a retrieval call in one ``score_pairs``
+    call so they can batch inference. Custom rerankers are configured as
+    ``RAG_RERANKER=package.module:ClassName`` and built with the settings.
+    """
+
+    def __init__(self, settings: RAGSettings):
+        self.settings = settings
+
+    @abstractmethod
+    def score_pairs(self, pairs: Sequence[tuple[str, str]]) -> np.ndarray: ...
+
+
+class OnnxCrossEncoder(Reranker):
+    """Cross-encoder (e.g. ms-marco-MiniLM) exported to ONNX and run on CPU.
+
+    Point ``RAG_RERANKER_MODEL`` at an int8 model (see ``rag quantize-reranker``)
+    with its ``tokenizer.json`` beside it or at ``RAG_RERANKER_TOKENIZER``.
+    Requires the ``rerank`` extra (onnxruntime, tokenizers).
+    """
+
+    def __init__(self, settings: RAGSettings):
+        super().__init__(settings)
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as exc:
+            raise RuntimeError(
+                "RAG_RERANKER=onnx requires the 'rerank' extra (onnxruntime, tokenizers)"
+            ) from exc
+        model_path = Path(settings.reranker_model_path)
+        tokenizer_path = Path(
+            settings.reranker_tokenizer_path or model_path.with_name("tokenizer.json")
+        )
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if settings.rerank_threads:
+            options.intra_op_num_threads = settings.rerank_threads
+        self.session = ort.InferenceSession(
+            str(model_path), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(str(tokenizer_path))
+        self.tokenizer.enable_truncation(max_length=settings.rerank_max_length)
+        self.tokenizer.enable_padding()
+
+    def score_pairs(self, pairs: Sequence[tuple[str, str]]) -> np.ndarray:
+        out = np.empty(len(pairs), dtype=np.float32)
+        step = self.settings.rerank_batch_size
+        for i in range(0, len(pairs), step):
+            encodings = self.tokenizer.encode_batch(list(pairs[i : i + step]))
+            feeds = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            logits = self.session.run(
+                None, {k: v for k, v in feeds.items() if k in self.input_names}
+            )[0]
+            # Single-logit models score directly; two-class models use the "relevant" logit.
+            out[i : i + len(encodings)] = logits[:, -1]
+        return out
+
+
+def _load_reranker(settings: RAGSettings) -> Reranker:
+    name = settings.reranker
+    if name == "onnx":
+        return OnnxCrossEncoder(settings)
+    module, _, attr = name.partition(":")
+    reranker: Reranker = getattr(importlib.import_module(module), attr)(settings)
+    return reranker
+
+
+class RerankStage:
+    """Reorders fused candidates with a reranker under a latency budget.
+
+    Scores are cached per (query, chunk id). Pairs that are not cached are
+    scored in one batch on a dedicated thread. If that takes longer than
+    ``RAG_RERANK_BUDGET_MS``, the fused order is returned. The batch keeps
+    running and fills the cache for the next identical request. Only one batch
+    runs at a time: while it does, requests with uncached pairs fall back to
+    the fused order at once instead of queueing behind it.
+    """
+
+    def __init__(self, reranker: Reranker, settings: RAGSettings):
+        self.reranker = reranker
+        self.settings = settings
+        self._scores: OrderedDict[tuple[str, int], float] = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-rerank")
+        # Held from submit until the batch finishes, so the executor queue never grows.
+        self._busy = threading.Semaphore(1)
+
+    def _cached(self, keys: Sequence[tuple[str, int]]) -> dict[tuple[str, int], float]:
+        with self._lock:
+            found = {}
+            for key in keys:
+                if key in self._scores:
+                    self._scores.move_to_end(key)
+                    found[key] = self._scores[key]
+            return found
+
+    def _store(self, scores: dict[tuple[str, int], float]) -> None:
+        with self._lock:
+            self._scores.update(scores)
+            while len(self._scores) > self.settings.rerank_cache_size:
+                self._scores.popitem(last=False)
+
+    def _score(
+        self, keys: list[tuple[str, int]], pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, int], float]:
+        start = time.perf_counter()
+        values = self.reranker.score_pairs(pairs)
+        RAG_RERANK_LATENCY.observe(time.perf_counter() - start)
+        scores = {k: float(v) for k, v in zip(keys, values)}
+        self._store(scores)
+        return scores
+
+    def _score_and_release(
+        self, keys: list[tuple[str, int]], pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, int], float]:
+        try:
+            return self._score(keys, pairs)
+        finally:
+            self._busy.release()
+
+    def rerank(
+        self,
+        queries: Sequence[str],
+        candidates: Sequence[Sequence[tuple[str, float, dict[str, Any]]]],
+        top_k: int,
+    ) -> list[list[tuple[str, float, dict[str, Any]]]]:
+        with tracer.start_as_current_span("rag.cross_encoder_rerank") as span:
+            qkeys = [cache_key(q) for q in queries]
+            keys = [
+                (qk, meta["chunk_id"]) for qk, rows in zip(qkeys, candidates) for _, _, meta in rows
+            ]
+            scores = self._cached(keys)
+            todo: dict[tuple[str, int], tuple[str, str]] = {}
+            for query, qk, rows in zip(queries, qkeys, candidates):
+                for text, _, meta in rows:
+                    key = (qk, meta["chunk_id"])
+                    if key not in scores:
+                        todo[key] = (query, text)
+            span.set_attributes(
+                {"rag.rerank_pairs": len(keys), "rag.rerank_cached": len(keys) - len(todo)}
+            )
+            RAG_RERANK_PAIRS.labels(outcome="cached").inc(len(keys) - len(todo))
+            if todo:
+                if not self._busy.acquire(blocking=False):
+                    RAG_RERANK_PAIRS.labels(outcome="busy").inc(len(todo))
+                    span.set_attribute("rag.rerank_fallback", "busy")
+                    return [list(rows[:top_k]) for rows in candidates]
+                future: Future[dict[tuple[str, int], float]] = self._executor.submit(
+                    self._score_and_release, list(todo), list(todo.values())
+                )
+                try:
+                    scores.update(future.result(timeout=self.settings.rerank_budget_ms / 1000))
+                    RAG_RERANK_PAIRS.labels(outcome="scored").inc(len(todo))
+                except FutureTimeout:
+                    if future.cancel():
+                        # Never started, so it will not release the slot itself.
+                        self._busy.release()
+                    RAG_RERANK_PAIRS.labels(outcome="timeout").inc(len(todo))
+                    span.set_attribute("rag.rerank_fallback", "timeout")
+                    return [list(rows[:top_k]) for rows in candidates]
+                except Exception:  # noqa: BLE001
+                    logger.warning("rag_rerank_failed", exc_info=True)
+                    RAG_RERANK_PAIRS.labels(outcome="error").inc(len(todo))
+                    span.set_attribute("rag.rerank_fallback", "error")
+                    return [list(rows[:top_k]) for rows in candidates]
+            results = []
+            for qk, rows in zip(qkeys, candidates):
+                scored = [(text, score, {**meta, "rerank_score": scores[(qk, meta["chunk_id"])]})
+                          for text, score, meta in rows]
+                scored.sort(key=lambda r: r[2]["rerank_score"], reverse=True)
+                results.append(scored[:top_k])
+            return results
+
+
+_stage: RerankStage | None = None
+_stage_lock = threading.Lock()
+
+
+def get_rerank_stage(settings: RAGSettings | None = None) -> RerankStage | None:
+    """The process-wide rerank stage, or None when ``RAG_RERANKER`` is ``none``."""
+    global _stage
+    settings = settings or get_rag_settings()
+    if settings.reranker in ("", "none"):
+        return None
+    with _stage_lock:
+        if _stage is None:
+            _stage = RerankStage(_load_reranker(settings), settings)
+    return _stage
+
+
+def context_top_k(default: int, settings: RAGSettings | None = None) -> int:
+    """How many chunks to send to generation: fewer once a reranker orders them."""
+    settings = settings or get_rag_settings()
+    return settings.reranked_top_k if settings.reranker not in ("", "none") else default
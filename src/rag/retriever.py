@@ -1,65 +1,198 @@
 from __future__ import annotations
 
-from typing import List, Tuple
+from collections.abc import Sequence
+from typing import Any
 
-from sqlalchemy import text as sql_text
+import numpy as np
 from opentelemetry import trace
-
-from .db import db_session
-from .openai_utils import embed_texts
-from .settings import get_rag_settings
 from rank_bm25 import BM25Okapi
 
+from .db import read_session
+from .filters import RetrievalFilters
+from .local_index import get_local_index
+from .query_cache import get_query_cache
+from .rerank import get_rerank_stage
+from .settings import RAGSettings, get_rag_settings
+from .vector_index import summary_search_many, vector_search_many
+
 tracer = trace.get_tracer(__name__)
 
+RETRIEVAL_MODES = ("flat", "hierarchical", "summary")
 
-def retrieve_similar(query: str, top_k: int = 5) -> List[tuple[str, float, dict]]:
-    with tracer.start_as_current_span("rag.retrieve_similar") as span:
+
+def _rerank_many(
+    queries: Sequence[str],
+    vector_results: Sequence[Sequence[tuple[int, str, float]]],
+    settings: RAGSettings,
+    top_k: int,
+) -> list[list[tuple[str, float, dict[str, Any]]]]:
+    """Fuse vector and BM25 scores for all queries at once and keep the best ``top_k`` of each.
+
+    Candidate lists are padded into an ``(n_queries, n_candidates)`` matrix so the
+    fusion and ordering are single NumPy operations; padded cells score ``-inf``.
+    """
+    width = max((len(r) for r in vector_results), default=0)
+    vec = np.full((len(queries), width), -np.inf)
+    for i, rows in enumerate(vector_results):
+        vec[i, : len(rows)] = [score for _, _, score in rows]
+    limit = top_k
+    fused = vec
+    if settings.bm25_enable and width:
+        lexical = np.zeros_like(vec)
+        for i, (query, rows) in enumerate(zip(queries, vector_results)):
+            if rows:
+                # BM25 statistics are per candidate set, so each query needs its own model.
+                bm25 = BM25Okapi([t.split() for _, t, _ in rows])
+                lexical[i, : len(rows)] = bm25.get_scores(query.split())
+        # Scale BM25 to [0, 1] per query so the blend weights mean the same for every query.
+        peak = lexical.max(axis=1, keepdims=True)
+        lexical = np.divide(lexical, peak, out=np.zeros_like(lexical), where=peak > 0)
+        fused = vec * 0.6 + lexical * 0.4
+        limit = min(top_k, settings.rerank_top_k)
+    order = np.argsort(-fused, axis=1, kind="stable")[:, :limit]
+    results: list[list[tuple[str, float, dict[str, Any]]]] = []
+    for rows, picks in zip(vector_results, order):
+        results.append(
+            [
+                (rows[j][1], float(rows[j][2]), {"chunk_id": rows[j][0]})
+                for j in picks
+                if j < len(rows)
+            ]
+        )
+    return results
+
+
+def _summary_results(
+    summary_results: Sequence[Sequence[tuple[int, str, float]]], top_k: int
+) -> list[list[tuple[str, float, dict[str, Any]]]]:
+    return [
+        [
+            (summary, score, {"document_id": doc_id, "source": "summary"})
+            for doc_id, summary, score in rows[:top_k]
+        ]
+        for rows in summary_results
+    ]
+
+
+def _hierarchical_filters(
+    summary_results: Sequence[Sequence[tuple[int, str, float]]], filters: RetrievalFilters | None
+) -> list[RetrievalFilters | None]:
+    """Per query, ``filters`` narrowed to the documents its own summaries selected."""
+    out: list[RetrievalFilters | None] = []
+    for rows in summary_results:
+        doc_ids = sorted({doc_id for doc_id, _, _ in rows})
+        # Without any summarized document the query degrades to a flat search.
+        if doc_ids:
+            out.append((filters or RetrievalFilters()).model_copy(update={"document_ids": doc_ids}))
+        else:
+            out.append(filters)
+    return out
+
+
+def retrieve_many(
+    queries: Sequence[str],
+    top_k: int = 5,
+    filters: RetrievalFilters | None = None,
+    mode: str | None = None,
+) -> list[list[tuple[str, float, dict[str, Any]]]]:
+    """``retrieve_similar`` for many queries: one embedding call and one k-NN round trip.
+
+    ``filters`` are applied inside the vector search, not to its top-k.
+    ``mode`` (default ``RAG_RETRIEVAL_MODE``) selects what is searched:
+    ``flat`` searches all chunks; ``hierarchical`` first picks the
+    ``RAG_SUMMARY_TOP_DOCS`` documents with the closest summaries and searches
+    only their chunks (each query its own documents, so queries with different
+    document sets are searched in separate round trips); ``summary`` returns
+    the document summaries themselves.
+    """
+    with tracer.start_as_current_span("rag.retrieve_many") as span:
+        queries = list(queries)
+        if filters is not None and filters.is_empty():
+            filters = None
+        settings = get_rag_settings()
+        mode = mode or settings.retrieval_mode
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"unknown retrieval mode {mode!r}; expected one of {RETRIEVAL_MODES}")
         span.set_attributes({
-            "rag.query_length": len(query),
+            "rag.query_count": len(queries),
             "rag.top_k": top_k,
+            "rag.filtered": filters is not None,
+            "rag.retrieval_mode": mode,
         })
-        
-        settings = get_rag_settings()
-        
+        if not queries:
+            return []
+
         with tracer.start_as_current_span("rag.embed_query"):
-            query_emb = embed_texts([query])[0]
-        
-        with tracer.start_as_current_span("rag.vector_search"):
-            with db_session() as s:
-                sql = sql_text(
-                    """
-                    SELECT id, text, 1 - (embedding <=> :query_embedding) AS score
-                    FROM chunks
-                    ORDER BY embedding <=> :query_embedding
-                    LIMIT :k
-                    """
-                )
-                rows = s.execute(sql, {"query_embedding": query_emb, "k": settings.vector_top_k}).fetchall()
-                vector_results = [(int(r[0]), str(r[1]), float(r[2])) for r in rows]
-                span.set_attribute("rag.vector_results_count", len(vector_results))
-
-        if settings.bm25_enable:
-            with tracer.start_as_current_span("rag.bm25_rerank"):
-                texts = [t for _, t, _ in vector_results]
-                corpus_tokens = [t.split() for t in texts]
-                bm25 = BM25Okapi(corpus_tokens)
-                scores = bm25.get_scores(query.split())
-                reranked = sorted(
-                    zip(vector_results, scores), key=lambda x: (x[0][2] * 0.6 + float(x[1]) * 0.4), reverse=True
-                )
-                top = reranked[: settings.rerank_top_k]
-                results = []
-                for item in top[: top_k]:
-                    (chunk_id, text, score) = item[0]
-                    results.append((text, float(score), {"chunk_id": chunk_id}))
-                span.set_attribute("rag.bm25_enabled", True)
-                span.set_attribute("rag.final_results_count", len(results))
-                return results
-        
-        span.set_attribute("rag.bm25_enabled", False)
-        results = [(text, score, {"chunk_id": cid}) for (cid, text, score) in vector_results[:top_k]]
-        span.set_attribute("rag.final_results_count", len(results))
+            query_embs = get_query_cache(settings).embed(
+                queries, batch_size=settings.embed_batch_size
+            )
+
+        if mode != "flat":
+            with tracer.start_as_current_span("rag.summary_search"):
+                k = top_k if mode == "summary" else settings.summary_top_docs
+                with read_session() as s:
+                    summary_results = summary_search_many(s, settings, query_embs, k, filters)
+            if mode == "summary":
+                return _summary_results(summary_results, top_k)
+            query_filters = _hierarchical_filters(summary_results, filters)
+            span.set_attribute(
+                "rag.summary_documents",
+                len({d for f in query_filters if f is not None for d in f.document_ids or ()}),
+            )
+        else:
+            query_filters = [filters] * len(queries)
+
+        vector_results: list[list[tuple[int, str, float]]] = [[] for _ in queries]
+        # Queries with the same filters (in hierarchical mode: the same documents) share one search.
+        groups: dict[str, list[int]] = {}
+        for i, f in enumerate(query_filters):
+            groups.setdefault(f.model_dump_json() if f is not None else "", []).append(i)
+        for members in groups.values():
+            group_filters = query_filters[members[0]]
+            group_embs = query_embs[members]
+            # The local replica carries no document metadata, so filtered searches go to Postgres.
+            local = get_local_index(settings) if group_filters is None else None
+            if local is not None:
+                with tracer.start_as_current_span("rag.local_vector_search"):
+                    found = local.search_many(group_embs, settings.vector_top_k)
+                    span.set_attribute("rag.vector_storage", "local")
+            else:
+                with tracer.start_as_current_span("rag.vector_search"):
+                    with read_session() as s:
+                        found = vector_search_many(
+                            s, settings, group_embs, settings.vector_top_k, group_filters
+                        )
+                    span.set_attribute("rag.vector_storage", settings.vector_storage)
+            for i, hits in zip(members, found):
+                vector_results[i] = hits
+        span.set_attribute("rag.vector_results_count", sum(len(r) for r in vector_results))
+
+        # With a cross-encoder, the fused ranking only shortlists rerank_top_k candidates for it.
+        stage = get_rerank_stage(settings)
+        shortlist = settings.rerank_top_k if stage is not None else top_k
+        with tracer.start_as_current_span(
+            "rag.bm25_rerank" if settings.bm25_enable else "rag.rank"
+        ):
+            results = _rerank_many(queries, vector_results, settings, shortlist)
+        if stage is not None:
+            results = stage.rerank(queries, results, top_k)
+        span.set_attribute("rag.reranker", settings.reranker)
+        span.set_attribute("rag.bm25_enabled", settings.bm25_enable)
+        span.set_attribute("rag.final_results_count", sum(len(r) for r in results))
         return results
 
 
+def retrieve_similar(
+    query: str,
+    top_k: int = 5,
+    filters: RetrievalFilters | None = None,
+    mode: str | None = None,
+) -> list[tuple[str, float, dict[str, Any]]]:
+    with tracer.start_as_current_span("rag.retrieve_similar") as span:
+        span.set_attributes({
+            "rag.query_length": len(query),
+            "rag.top_k": top_k,
+        })
+        results = retrieve_many([query], top_k, filters, mode)[0]
+        span.set_attribute("rag.final_results_count", len(results))
+        return results
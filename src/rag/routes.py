@@ -1,33 +1,48 @@
 from __future__ import annotations
 
-from typing import List
+from typing import Literal, Optional
 
 from fastmcp import FastMCP
-from starlette.responses import JSONResponse
-from starlette.requests import Request
 from pydantic import BaseModel, Field
+from sqlalchemy import text as sql_text
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from mcp_server.logging_config import get_logger
 
-from .ingest import ingest_file
 from .agent import answer_question
+from .db import read_session
+from .filters import RetrievalFilters
+from .ingest import ingest_file
+from .listing import DocumentListFilters, iter_documents, list_documents, listing_response
+from .retriever import retrieve_many
 from .settings import get_rag_settings
-from mcp_server.logging_config import get_logger
-from .worker import enqueue_ingest
-from sqlalchemy import text as sql_text
-from .db import db_session
+from .worker import enqueue_ingest, get_job_status, get_jobs_status
 
 
 class QueryRequest(BaseModel):
     question: str = Field(min_length=1, max_length=4000)
 
 
+class RetrieveManyRequest(BaseModel):
+    queries: list[str] = Field(min_length=1, max_length=256)
+    top_k: int = Field(default=5, ge=1, le=50)
+    filters: Optional[RetrievalFilters] = Field(default=None)
+    mode: Optional[Literal["flat", "hierarchical", "summary"]] = Field(default=None)
+
+
+class JobStatusRequest(BaseModel):
+    job_ids: list[str] = Field(min_length=1, max_length=500)
+
+
 def register_rag_routes(app: FastMCP) -> None:
     logger = get_logger(__name__)
     @app.custom_route("/rag/upload", methods=["POST"])
-    async def upload(request: Request):
+    async def upload(request: Request) -> Response:
         form = await request.form()
         files = form.getlist("files")  # type: ignore[assignment]
-        ids: List[int] = []
-        job_ids: List[str] = []
+        ids: list[int] = []
+        job_ids: list[str] = []
         for file in files:
             content = await file.read()  # type: ignore[attr-defined]
             if get_rag_settings().async_ingest:
@@ -37,8 +52,25 @@ def register_rag_routes(app: FastMCP) -> None:
         logger.info("rag_upload", count=len(ids) + len(job_ids))
         return JSONResponse({"document_ids": ids, "jobs": job_ids})
 
+    @app.custom_route("/rag/jobs/{job_id}", methods=["GET"])
+    async def job_status(request: Request) -> Response:
+        status = get_job_status(request.path_params["job_id"])
+        if status is None:
+            return JSONResponse({"error": "not found"}, status_code=404)
+        return JSONResponse(status)
+
+    @app.custom_route("/rag/jobs/status", methods=["POST"])
+    async def jobs_status(request: Request) -> Response:
+        data = await request.json()
+        try:
+            payload = JobStatusRequest(**data)
+        except Exception as exc:  # noqa: BLE001
+            return JSONResponse({"error": str(exc)}, status_code=400)
+        statuses = get_jobs_status(payload.job_ids)
+        return JSONResponse({"jobs": dict(zip(payload.job_ids, statuses))})
+
     @app.custom_route("/rag/query", methods=["POST"])
-    async def query(request: Request):
+    async def query(request: Request) -> Response:
         data = await request.json()
         try:
             payload = QueryRequest(**data)
@@ -48,14 +80,53 @@ def register_rag_routes(app: FastMCP) -> None:
         logger.info("rag_query", q_len=len(payload.question))
         return JSONResponse(result)
 
+    @app.custom_route("/rag/retrieve", methods=["POST"])
+    async def retrieve(request: Request) -> Response:
+        data = await request.json()
+        try:
+            payload = RetrieveManyRequest(**data)
+        except Exception as exc:  # noqa: BLE001
+            return JSONResponse({"error": str(exc)}, status_code=400)
+        results = retrieve_many(
+            payload.queries, top_k=payload.top_k, filters=payload.filters, mode=payload.mode
+        )
+        logger.info(
+            "rag_retrieve", queries=len(payload.queries), top_k=payload.top_k, mode=payload.mode
+        )
+        return JSONResponse({
+            "results": [
+                # Chunk hits carry chunk_id; summary-mode hits carry document_id instead.
+                [{**meta, "score": score, "text": text} for text, score, meta in hits]
+                for hits in results
+            ]
+        })
+
+    @app.custom_route("/rag/documents", methods=["GET"])
+    async def documents(request: Request) -> Response:
+        params = request.query_params
+        try:
+            filters = DocumentListFilters.model_validate(
+                {
+                    "content_types": params.getlist("content_type") or None,
+                    "created_after": params.get("created_after") or None,
+                    "created_before": params.get("created_before") or None,
+                }
+            )
+        except Exception as exc:  # noqa: BLE001
+            return JSONResponse({"error": str(exc)}, status_code=400)
+        return listing_response(request, filters, list_documents, iter_documents)
+
     @app.custom_route("/rag/chunk/{chunk_id}", methods=["GET"])
-    async def get_chunk(request: Request):
+    async def get_chunk(request: Request) -> Response:
         try:
             chunk_id = int(request.path_params.get("chunk_id"))
         except Exception:  # noqa: BLE001
             return JSONResponse({"error": "invalid chunk_id"}, status_code=400)
-        with db_session() as s:
-            sql = sql_text("SELECT id, document_id, ordinal, start_char, end_char, text FROM chunks WHERE id = :id")
+        with read_session() as s:
+            sql = sql_text(
+                "SELECT id, document_id, ordinal, start_char, end_char, text "
+                "FROM chunks WHERE id = :id"
+            )
             row = s.execute(sql, {"id": chunk_id}).fetchone()
             if not row:
                 return JSONResponse({"error": "not found"}, status_code=404)
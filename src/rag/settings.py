@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import os
 from functools import lru_cache
+
 from pydantic import BaseModel, Field
 
 
@@ -14,11 +15,183 @@ class RAGSettings(BaseModel):
     rerank_top_k: int = Field(default_factory=lambda: int(os.getenv("RAG_RERANK_TOP_K", "10")))
     vector_top_k: int = Field(default_factory=lambda: int(os.getenv("RAG_VECTOR_TOP_K", "12")))
 
-    embed_cache_enable: bool = Field(default_factory=lambda: os.getenv("RAG_EMBED_CACHE", "1") == "1")
+    # Cross-encoder rerank stage (rag.rerank): none | onnx | package.module:ClassName
+    reranker: str = Field(default_factory=lambda: os.getenv("RAG_RERANKER", "none"))
+    reranker_model_path: str = Field(default_factory=lambda: os.getenv("RAG_RERANKER_MODEL", ""))
+    reranker_tokenizer_path: str = Field(
+        default_factory=lambda: os.getenv("RAG_RERANKER_TOKENIZER", "")
+    )
+    rerank_budget_ms: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_RERANK_BUDGET_MS", "150"))
+    )
+    rerank_cache_size: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_RERANK_CACHE_SIZE", "50000"))
+    )
+    rerank_batch_size: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_RERANK_BATCH_SIZE", "64"))
+    )
+    rerank_max_length: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_RERANK_MAX_LENGTH", "256"))
+    )
+    rerank_threads: int = Field(default_factory=lambda: int(os.getenv("RAG_RERANK_THREADS", "0")))
+    reranked_top_k: int = Field(default_factory=lambda: int(os.getenv("RAG_RERANKED_TOP_K", "3")))
+    # Prompt context budget for rag.context.pack_context
+    context_max_tokens: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_CONTEXT_MAX_TOKENS", "3000"))
+    )
+
+    # Single-flight coalescing of identical concurrent questions (rag.singleflight)
+    coalesce_enable: bool = Field(default_factory=lambda: os.getenv("RAG_COALESCE", "1") == "1")
+    coalesce_redis: bool = Field(
+        default_factory=lambda: os.getenv("RAG_COALESCE_REDIS", "0") == "1"
+    )
+    coalesce_timeout_seconds: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_COALESCE_TIMEOUT", "60"))
+    )
+
+    # Vector index representation: full | halfvec | matryoshka | binary (see rag.vector_index)
+    vector_storage: str = Field(default_factory=lambda: os.getenv("RAG_VECTOR_STORAGE", "full"))
+    vector_coarse_dims: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_VECTOR_COARSE_DIMS", "512"))
+    )
+    rescore_candidates: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_RESCORE_CANDIDATES", "100"))
+    )
+
+    # In-process memory-mapped replica of chunks (rag.local_index); empty disables it
+    local_index_dir: str = Field(default_factory=lambda: os.getenv("RAG_LOCAL_INDEX_DIR", ""))
+    local_index_sync_seconds: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_LOCAL_INDEX_SYNC_SECONDS", "30"))
+    )
+    local_index_hnsw_min_rows: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_LOCAL_INDEX_HNSW_MIN_ROWS", "200000"))
+    )
+
+    embed_cache_enable: bool = Field(
+        default_factory=lambda: os.getenv("RAG_EMBED_CACHE", "1") == "1"
+    )
+    embed_batch_size: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_EMBED_BATCH_SIZE", "256"))
+    )
+
+    # Query embedding cache (rag.query_cache): in-process LRU entries, TTL and optional Redis tier
+    query_cache_size: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_QUERY_CACHE_SIZE", "4096"))
+    )
+    query_cache_ttl_seconds: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_QUERY_CACHE_TTL", "86400"))
+    )
+    query_cache_redis: bool = Field(
+        default_factory=lambda: os.getenv("RAG_QUERY_CACHE_REDIS", "0") == "1"
+    )
+
+    # Database pools (rag.db); replicas are comma-separated URLs used for retrieval and status reads
+    db_pool_size: int = Field(default_factory=lambda: int(os.getenv("RAG_DB_POOL_SIZE", "10")))
+    db_max_overflow: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_DB_MAX_OVERFLOW", "20"))
+    )
+    db_pool_timeout: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_DB_POOL_TIMEOUT", "30"))
+    )
+    db_pool_recycle: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_DB_POOL_RECYCLE", "1800"))
+    )
+    db_statement_timeout_ms: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_DB_STATEMENT_TIMEOUT_MS", "0"))
+    )
+    db_read_statement_timeout_ms: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_DB_READ_STATEMENT_TIMEOUT_MS", "5000"))
+    )
+    db_read_replica_urls: str = Field(default_factory=lambda: os.getenv("RAG_DB_READ_REPLICAS", ""))
+    db_replica_retry_seconds: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_DB_REPLICA_RETRY_SECONDS", "10"))
+    )
+
+    # GRC analysis cache (Postgres grc_analysis_cache plus an in-process LRU)
+    grc_analysis_cache_enable: bool = Field(
+        default_factory=lambda: os.getenv("GRC_ANALYSIS_CACHE", "1") == "1"
+    )
+    grc_analysis_cache_size: int = Field(
+        default_factory=lambda: int(os.getenv("GRC_ANALYSIS_CACHE_SIZE", "1024"))
+    )
+
+    # GRC compliance reports (map step per document, then one reduce call)
+    grc_report_concurrency: int = Field(
+        default_factory=lambda: int(os.getenv("GRC_REPORT_CONCURRENCY", "8"))
+    )
+    grc_report_max_documents: int = Field(
+        default_factory=lambda: int(os.getenv("GRC_REPORT_MAX_DOCUMENTS", "100"))
+    )
+    grc_report_document_chars: int = Field(
+        default_factory=lambda: int(os.getenv("GRC_REPORT_DOCUMENT_CHARS", "12000"))
+    )
+
+    # GRC control coverage: top chunk matches kept per control; a control counts as covered
+    # at the threshold
+    grc_coverage_top_k: int = Field(
+        default_factory=lambda: int(os.getenv("GRC_COVERAGE_TOP_K", "10"))
+    )
+    grc_coverage_threshold: float = Field(
+        default_factory=lambda: float(os.getenv("GRC_COVERAGE_THRESHOLD", "0.5"))
+    )
+    grc_coverage_batch_size: int = Field(
+        default_factory=lambda: int(os.getenv("GRC_COVERAGE_BATCH_SIZE", "2048"))
+    )
+
+    # GRC dashboard endpoints: seconds a serialized response (and its ETag) is reused
+    grc_dashboard_cache_ttl: float = Field(
+        default_factory=lambda: float(os.getenv("GRC_DASHBOARD_CACHE_TTL", "5"))
+    )
+
+    # GRC document status (grc.status): cached payloads, dropped on writes (in every
+    # process through Redis counters when enabled) and otherwise after the TTL
+    grc_status_cache_size: int = Field(
+        default_factory=lambda: int(os.getenv("GRC_STATUS_CACHE_SIZE", "4096"))
+    )
+    grc_status_cache_ttl: float = Field(
+        default_factory=lambda: float(os.getenv("GRC_STATUS_CACHE_TTL", "30"))
+    )
+    grc_status_cache_redis: bool = Field(
+        default_factory=lambda: os.getenv("GRC_STATUS_CACHE_REDIS", "1") == "1"
+    )
+
+    # Document summaries; retrieval mode flat | hierarchical (summaries pick documents, then
+    # chunks) | summary
+    retrieval_mode: str = Field(default_factory=lambda: os.getenv("RAG_RETRIEVAL_MODE", "flat"))
+    summary_top_docs: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_SUMMARY_TOP_DOCS", "20"))
+    )
+    summarize_on_ingest: bool = Field(
+        default_factory=lambda: os.getenv("RAG_SUMMARIZE_ON_INGEST", "1") == "1"
+    )
+    summary_source_chars: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_SUMMARY_SOURCE_CHARS", "12000"))
+    )
+    summary_concurrency: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_SUMMARY_CONCURRENCY", "4"))
+    )
 
     # Async ingestion
     async_ingest: bool = Field(default_factory=lambda: os.getenv("RAG_ASYNC_INGEST", "0") == "1")
     redis_url: str = Field(default_factory=lambda: os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    redis_max_connections: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_REDIS_MAX_CONNECTIONS", "50"))
+    )
+    worker_batch_jobs: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_WORKER_BATCH_JOBS", "32"))
+    )
+    worker_metrics_port: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_WORKER_METRICS_PORT", "0"))
+    )
+    worker_processes: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_WORKER_PROCESSES", "2"))
+    )
+    worker_max_jobs: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_WORKER_MAX_JOBS", "500"))
+    )
+    worker_max_memory_mb: int = Field(
+        default_factory=lambda: int(os.getenv("RAG_WORKER_MAX_MEMORY_MB", "1024"))
+    )
 
 
 @lru_cache(maxsize=1)
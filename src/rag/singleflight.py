@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, TypeVar
+
+from redis.exceptions import RedisError
+
+from mcp_server.logging_config import get_logger
+
+from .metrics import RAG_COALESCED_REQUESTS
+from .query_cache import normalize_query
+from .settings import RAGSettings, get_rag_settings
+
+T = TypeVar("T")
+
+logger = get_logger(__name__)
+
+# How long a finished result stays readable for followers that subscribed late.
+RESULT_TTL_SECONDS = 15
+
+_inflight: dict[str, Future[Any]] = {}
+_inflight_lock = threading.Lock()
+
+
+def request_key(*parts: Any) -> str:
+    """Stable key for a request: normalized strings plus any JSON-serializable extras."""
+    canonical = [normalize_query(p).casefold() if isinstance(p, str) else p for p in parts]
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _redis_leader_or_wait(
+    namespace: str, key: str, fn: Callable[[], T], settings: RAGSettings
+) -> T:
+    """Coalesce across replicas: the Redis lock holder computes, the rest wait for its result."""
+    from .worker import get_redis
+
+    r = get_redis()
+    base = f"rag:sf:{namespace}:{key}"
+    timeout = settings.coalesce_timeout_seconds
+    deadline = time.monotonic() + timeout
+    pubsub = r.pubsub(ignore_subscribe_messages=True)  # type: ignore[no-untyped-call]
+    try:
+        pubsub.subscribe(f"{base}:done")
+        while time.monotonic() < deadline:
+            lock = r.lock(f"{base}:lock", timeout=timeout)
+            if lock.acquire(blocking=False):
+                try:
+                    result = fn()
+                    try:
+                        payload = json.dumps({"result": result})
+                    except (TypeError, ValueError) as exc:
+                        # Waiting replicas find the lock released and compute it themselves.
+                        logger.warning(
+                            "rag_singleflight_unserializable_result",
+                            namespace=namespace,
+                            error=str(exc),
+                        )
+                        return result
+                    try:
+                        r.set(f"{base}:result", payload, ex=RESULT_TTL_SECONDS)
+                        r.publish(f"{base}:done", payload)
+                    except RedisError:
+                        logger.warning(
+                            "rag_singleflight_publish_failed", namespace=namespace, exc_info=True
+                        )
+                    return result
+                finally:
+                    try:
+                        lock.release()
+                    except Exception:  # noqa: BLE001
+                        pass  # expired while computing
+            # Another replica is computing: wait for its broadcast, re-checking the stored
+            # result and the lock so a crashed leader hands over to us.
+            while time.monotonic() < deadline:
+                raw = r.get(f"{base}:result")
+                if raw is None:
+                    message = pubsub.get_message(timeout=1.0)
+                    raw = message["data"] if message else None
+                if raw is not None:
+                    RAG_COALESCED_REQUESTS.labels(namespace=namespace, scope="redis").inc()
+                    shared: T = json.loads(raw)["result"]
+                    return shared
+                if not r.exists(f"{base}:lock"):
+                    break
+        logger.warning("rag_singleflight_wait_timeout", namespace=namespace)
+        return fn()
+    finally:
+        pubsub.close()
+
+
+def coalesce(
+    namespace: str, key: str, fn: Callable[[], T], settings: RAGSettings | None = None
+) -> T:
+    """Run ``fn`` once for all concurrent callers with the same ``(namespace, key)``.
+
+    Callers in this process share one in-flight call. With
+    ``RAG_COALESCE_REDIS=1`` the in-process leader also coordinates with other
+    replicas through a Redis lock and a pub/sub result channel. Only
+    JSON-serializable results are shared with other replicas; others are
+    returned to local callers only. Redis errors fall back to computing locally.
+    """
+    settings = settings or get_rag_settings()
+    if not settings.coalesce_enable:
+        return fn()
+    slot = f"{namespace}:{key}"
+    with _inflight_lock:
+        pending = _inflight.get(slot)
+        if pending is None:
+            future: Future[Any] = Future()
+            _inflight[slot] = future
+    if pending is not None:
+        RAG_COALESCED_REQUESTS.labels(namespace=namespace, scope="process").inc()
+        shared: T = pending.result()
+        return shared
+    try:
+        if settings.coalesce_redis:
+            try:
+                result = _redis_leader_or_wait(namespace, key, fn, settings)
+            except RedisError as exc:
+                logger.warning("rag_singleflight_redis_unavailable", error=str(exc))
+                result = fn()
+        else:
+            result = fn()
+        future.set_result(result)
+        return result
+    except BaseException as exc:
+        future.set_exception(exc)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(slot, None)
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import contextvars
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any
+
+import numpy as np
+from opentelemetry import trace
+from sqlalchemy import text as sql_text
+from sqlalchemy.orm import Session
+
+from mcp_server.logging_config import get_logger
+
+from .ingest import load_document_texts
+from .openai_utils import embed_texts, generate_answer
+from .settings import get_rag_settings
+
+tracer = trace.get_tracer(__name__)
+logger = get_logger(__name__)
+
+SUMMARY_PROMPT = (
+    "Summarize the following document in at most 150 words for a search index.\n"
+    "State what kind of document it is, its scope, the frameworks, regulations or systems "
+    "it covers,\n"
+    "and its main obligations or conclusions. Use plain prose without headings.\n\n"
+    "Document: {filename}\n"
+    "Content:\n{text}\n"
+)
+
+
+def summarize_text(filename: str, text: str) -> str:
+    with tracer.start_as_current_span("rag.summarize_document"):
+        return generate_answer(SUMMARY_PROMPT.format(filename=filename, text=text)).strip()
+
+
+def write_summaries(s: Session, rows: Sequence[tuple[int, str, np.ndarray]]) -> None:
+    """Store ``(document_id, summary, embedding)`` rows in one bulk UPDATE.
+
+    GRC documents without an ``ai_summary`` get the same text.
+    """
+    if not rows:
+        return
+    now = datetime.utcnow()
+    params = [
+        {"id": doc_id, "summary": summary, "embedding": emb, "now": now}
+        for doc_id, summary, emb in rows
+    ]
+    s.execute(
+        sql_text(
+            "UPDATE documents SET summary = :summary, summary_embedding = :embedding, "
+            "summarized_at = :now "
+            "WHERE id = :id"
+        ),
+        params,
+    )
+    if s.execute(sql_text("SELECT to_regclass('grc_documents') IS NOT NULL")).scalar():
+        s.execute(
+            sql_text(
+                "UPDATE grc_documents SET ai_summary = :summary "
+                "WHERE document_id = :id AND ai_summary IS NULL"
+            ),
+            params,
+        )
+
+
+def _pending(
+    s: Session, after_id: int, limit: int, document_ids: Sequence[int] | None
+) -> list[tuple[int, str]]:
+    where = "summary IS NULL AND id > :after_id"
+    params: dict[str, Any] = {"after_id": after_id, "limit": limit}
+    if document_ids is not None:
+        where += " AND id = ANY(:ids)"
+        params["ids"] = list(document_ids)
+    rows = s.execute(
+        sql_text(f"SELECT id, filename FROM documents WHERE {where} ORDER BY id LIMIT :limit"),
+        params,
+    )
+    return [(int(r[0]), str(r[1])) for r in rows]
+
+
+def summarize_documents(
+    document_ids: Sequence[int] | None = None, limit: int | None = None, batch_size: int = 20
+) -> int:
+    """Summarize and embed documents that have no summary yet; returns how many were written.
+
+    Documents are taken in id order, ``batch_size`` at a time: their leading text
+    (``RAG_SUMMARY_SOURCE_CHARS``) is summarized on ``RAG_SUMMARY_CONCURRENCY``
+    threads, the summaries are embedded in one call and stored in one statement.
+    A document whose summary fails is skipped and stays pending.
+    """
+    from .db import db_session, read_session
+
+    settings = get_rag_settings()
+    written, after_id = 0, 0
+
+    def summarize(item: tuple[int, str, str]) -> tuple[int, str | None]:
+        doc_id, filename, text = item
+        try:
+            return doc_id, summarize_text(filename, text)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("rag_summary_failed", document_id=doc_id, error=str(exc))
+            return doc_id, None
+
+    with tracer.start_as_current_span("rag.summarize_documents") as span, ThreadPoolExecutor(
+        max_workers=max(1, settings.summary_concurrency), thread_name_prefix="rag-summary"
+    ) as pool:
+        while limit is None or written < limit:
+            take = batch_size if limit is None else min(batch_size, limit - written)
+            with read_session() as s:
+                batch = _pending(s, after_id, take, document_ids)
+                texts = load_document_texts(
+                    s, [doc_id for doc_id, _ in batch], settings.summary_source_chars
+                )
+            if not batch:
+                break
+            after_id = batch[-1][0]
+            items = [(doc_id, filename, texts.get(doc_id, "")) for doc_id, filename in batch]
+            summaries = [
+                (doc_id, summary)
+                for doc_id, summary in pool.map(
+                    lambda i: contextvars.copy_context().run(summarize, i), items
+                )
+                if summary
+            ]
+            if not summaries:
+                continue
+            embeddings = embed_texts([summary for _, summary in summaries])
+            with db_session() as s:
+                write_summaries(s, [(d, t, e) for (d, t), e in zip(summaries, embeddings)])
+            written += len(summaries)
+            logger.info("rag_summaries_written", count=len(summaries), last_id=after_id)
+        span.set_attribute("rag.summaries_written", written)
+    return written
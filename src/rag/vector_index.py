@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+from sqlalchemy import Connection
+from sqlalchemy import text as sql_text
+from sqlalchemy.orm import Session
+
+from .filters import APPROVED_PREDICATE, RetrievalFilters
+from .models import EMBEDDING_DIM
+from .settings import RAGSettings
+
+# Compact representations searched by the coarse stage. Only the HNSW index is
+# compact: ``chunks.embedding`` always keeps the full-precision vector used for
+# exact rescoring, so the table itself does not shrink.
+VECTOR_STORAGES = ("full", "halfvec", "matryoshka", "binary")
+# LIKE pattern matching every chunk embedding index ``index_ddl`` can build.
+INDEX_PATTERN = "ix\\_chunks\\_embedding\\_%"
+
+
+def _coarse_expressions(
+    settings: RAGSettings, query: str = ":query_embedding"
+) -> tuple[str, str, str]:
+    """(indexed column expression, operator class, query-side distance) for the coarse scan."""
+    storage = settings.vector_storage
+    dim = EMBEDDING_DIM
+    if storage == "halfvec":
+        col = f"(embedding::halfvec({dim}))"
+        return col, "halfvec_cosine_ops", f"{col} <=> CAST({query} AS halfvec({dim}))"
+    if storage == "matryoshka":
+        # A text-embedding-3 vector requested with ``dimensions=d`` is this prefix
+        # renormalized, and cosine distance ignores the norm, so the full vector
+        # stored for rescoring also serves the coarse scan without a second API call.
+        d = settings.vector_coarse_dims
+        col = f"(subvector(embedding, 1, {d})::vector({d}))"
+        return (
+            col,
+            "vector_cosine_ops",
+            f"{col} <=> subvector(CAST({query} AS vector({dim})), 1, {d})",
+        )
+    if storage == "binary":
+        col = f"(binary_quantize(embedding)::bit({dim}))"
+        return col, "bit_hamming_ops", f"{col} <~> binary_quantize(CAST({query} AS vector({dim})))"
+    if storage == "full":
+        return "(embedding)", "vector_cosine_ops", f"embedding <=> {query}"
+    raise ValueError(f"unknown RAG_VECTOR_STORAGE {storage!r}; expected one of {VECTOR_STORAGES}")
+
+
+def index_name(settings: RAGSettings, approved_only: bool = False) -> str:
+    if settings.vector_storage == "matryoshka":
+        name = f"ix_chunks_embedding_matryoshka_{settings.vector_coarse_dims}"
+    else:
+        name = f"ix_chunks_embedding_{settings.vector_storage}"
+    return f"{name}_approved" if approved_only else name
+
+
+def index_ddl(settings: RAGSettings, approved_only: bool = False) -> str:
+    """HNSW index over the compact representation selected in ``settings``.
+
+    ``approved_only`` builds the partial index matching ``RetrievalFilters(approved_only=True)``.
+    """
+    col, opclass, _ = _coarse_expressions(settings)
+    return (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name(settings, approved_only)} "
+        f"ON chunks USING hnsw ({col} {opclass})"
+        + (f" WHERE {APPROVED_PREDICATE}" if approved_only else "")
+    )
+
+
+def stale_index_names(conn: Connection, settings: RAGSettings) -> list[str]:
+    """Chunk embedding indexes built for another ``RAG_VECTOR_STORAGE`` or coarse width."""
+    keep = {index_name(settings), index_name(settings, approved_only=True)}
+    names = conn.execute(
+        sql_text(
+            "SELECT indexname FROM pg_indexes"
+            " WHERE tablename = 'chunks' AND indexname LIKE :pattern ORDER BY indexname"
+        ),
+        {"pattern": INDEX_PATTERN},
+    ).scalars()
+    return [name for name in names if name not in keep]
+
+
+def storage_sizes(conn: Connection) -> dict[str, int]:
+    """Bytes on disk of ``chunks`` (heap and TOAST) and of each chunk embedding index."""
+    rows = conn.execute(
+        sql_text(
+            """
+            SELECT 'chunks', pg_table_size('chunks')
+            UNION ALL
+            SELECT indexname, pg_relation_size(quote_ident(indexname)::regclass)
+            FROM pg_indexes
+            WHERE tablename = 'chunks' AND indexname LIKE :pattern
+            """
+        ),
+        {"pattern": INDEX_PATTERN},
+    ).all()
+    return {str(name): int(size) for name, size in rows}
+
+
+def search_sql(settings: RAGSettings, query: str = ":query_embedding", where: str = "") -> str:
+    """Top-k SQL: a coarse index scan on the compact vectors, then exact rescoring.
+
+    With ``full`` storage the vectors are already full precision and a single
+    stage is used. ``query`` is the SQL expression of the query vector and
+    ``where`` an optional filter predicate applied inside the index scan.
+    """
+    _, _, coarse = _coarse_expressions(settings, query)
+    where_sql = f"WHERE {where}" if where else ""
+    if settings.vector_storage == "full":
+        return f"""
+            SELECT id, text, 1 - (embedding <=> {query}) AS score
+            FROM chunks
+            {where_sql}
+            ORDER BY embedding <=> {query}
+            LIMIT :k
+        """
+    return f"""
+        SELECT id, text, 1 - (embedding <=> {query}) AS score
+        FROM (
+            SELECT id, text, embedding
+            FROM chunks
+            {where_sql}
+            ORDER BY {coarse}
+            LIMIT :candidates
+        ) AS candidates
+        ORDER BY embedding <=> {query}
+        LIMIT :k
+    """
+
+
+def search_many_sql(settings: RAGSettings, where: str = "") -> str:
+    """Top-k for every vector in ``:query_embeddings`` in one statement (LATERAL over unnest)."""
+    return f"""
+        SELECT q.ord, hit.id, hit.text, hit.score
+        FROM unnest(CAST(:query_embeddings AS vector({EMBEDDING_DIM})[]))
+            WITH ORDINALITY AS q(embedding, ord)
+        CROSS JOIN LATERAL ({search_sql(settings, "q.embedding", where)}) AS hit
+        ORDER BY q.ord, hit.score DESC
+    """
+
+
+
+def summary_search_many_sql(where: str = "") -> str:
+    """Top-k documents by summary embedding for every vector in ``:query_embeddings``.
+
+    ``where`` is a chunk predicate (``RetrievalFilters.to_sql``); a document
+    qualifies when at least one of its chunks matches it.
+    """
+    matches = (
+        f"AND EXISTS (SELECT 1 FROM chunks WHERE chunks.document_id = d.id AND {where})"
+        if where
+        else ""
+    )
+    return f"""
+        SELECT q.ord, hit.id, hit.summary, hit.score
+        FROM unnest(CAST(:query_embeddings AS vector({EMBEDDING_DIM})[]))
+            WITH ORDINALITY AS q(embedding, ord)
+        CROSS JOIN LATERAL (
+            SELECT d.id, d.summary, 1 - (d.summary_embedding <=> q.embedding) AS score
+            FROM documents d
+            WHERE d.summary_embedding IS NOT NULL {matches}
+            ORDER BY d.summary_embedding <=> q.embedding
+            LIMIT :k
+        ) AS hit
+        ORDER BY q.ord, hit.score DESC
+    """
+
+
+_iterative_scan: bool | None = None
+
+
+def _supports_iterative_scan(s: Session) -> bool:
+    """pgvector >= 0.8 keeps scanning the HNSW graph until enough rows pass the filter."""
+    global _iterative_scan
+    if _iterative_scan is None:
+        version = s.execute(
+            sql_text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        ).scalar()
+        parts = tuple(int(p) for p in str(version or "0").split(".")[:2] if p.isdigit())
+        _iterative_scan = parts >= (0, 8)
+    return _iterative_scan
+
+
+def prepare_search(
+    s: Session, settings: RAGSettings, k: int, filtered: bool = False
+) -> dict[str, Any]:
+    """Set the HNSW search width for this transaction and return the shared bind params."""
+    candidates = max(k, settings.rescore_candidates)
+    # HNSW returns at most ef_search rows, so it must cover the candidate pool.
+    s.execute(
+        sql_text("SELECT set_config('hnsw.ef_search', :ef, true)"), {"ef": str(max(40, candidates))}
+    )
+    if filtered and _supports_iterative_scan(s):
+        # Without this a selective filter leaves fewer than k of the ef_search rows.
+        s.execute(sql_text("SELECT set_config('hnsw.iterative_scan', 'strict_order', true)"))
+    return {"k": k, "candidates": candidates}
+
+
+def vector_search(
+    s: Session,
+    settings: RAGSettings,
+    query_embedding: np.ndarray,
+    k: int,
+    filters: RetrievalFilters | None = None,
+) -> list[tuple[int, str, float]]:
+    where, filter_params = filters.to_sql() if filters else ("", {})
+    params = prepare_search(s, settings, k, filtered=bool(where))
+    rows = s.execute(
+        sql_text(search_sql(settings, where=where)),
+        {"query_embedding": query_embedding, **params, **filter_params},
+    ).fetchall()
+    return [(int(r[0]), str(r[1]), float(r[2])) for r in rows]
+
+
+def vector_search_many(
+    s: Session,
+    settings: RAGSettings,
+    query_embeddings: np.ndarray,
+    k: int,
+    filters: RetrievalFilters | None = None,
+) -> list[list[tuple[int, str, float]]]:
+    """``vector_search`` for each row of ``query_embeddings`` in a single round trip."""
+    results: list[list[tuple[int, str, float]]] = [[] for _ in range(len(query_embeddings))]
+    if not len(query_embeddings):
+        return results
+    where, filter_params = filters.to_sql() if filters else ("", {})
+    params = prepare_search(s, settings, k, filtered=bool(where))
+    rows = s.execute(
+        sql_text(search_many_sql(settings, where)),
+        {"query_embeddings": list(query_embeddings), **params, **filter_params},
+    ).fetchall()
+    for ord_, chunk_id, text, score in rows:
+        results[int(ord_) - 1].append((int(chunk_id), str(text), float(score)))
+    return results
+
+
+def summary_search_many(
+    s: Session,
+    settings: RAGSettings,
+    query_embeddings: np.ndarray,
+    k: int,
+    filters: RetrievalFilters | None = None,
+) -> list[list[tuple[int, str, float]]]:
+    """``(document_id, summary, score)`` of the ``k`` closest summaries for each query vector."""
+    results: list[list[tuple[int, str, float]]] = [[] for _ in range(len(query_embeddings))]
+    if not len(query_embeddings):
+        return results
+    where, filter_params = filters.to_sql() if filters else ("", {})
+    params = prepare_search(s, settings, k, filtered=bool(where))
+    rows = s.execute(
+        sql_text(summary_search_many_sql(where)),
+        {"query_embeddings": list(query_embeddings), **params, **filter_params},
+    ).fetchall()
+    for ord_, doc_id, summary, score in rows:
+        results[int(ord_) - 1].append((int(doc_id), str(summary), float(score)))
+    return results
+
+
+def measure_recall(s: Session, settings: RAGSettings, samples: int, k: int) -> float:
+    """Mean recall@k of the configured search against an exact scan over stored chunk queries."""
+    queries = s.execute(
+        sql_text("SELECT embedding FROM chunks ORDER BY random() LIMIT :n"), {"n": samples}
+    ).scalars().all()
+    if not queries:
+        return 1.0
+    exact_sql = sql_text("SELECT id FROM chunks ORDER BY embedding <=> :query_embedding LIMIT :k")
+    total = 0.0
+    for q in queries:
+        q = np.asarray(q, dtype=np.float32)
+        found = {cid for cid, _, _ in vector_search(s, settings, q, k)}
+        s.execute(sql_text("SET LOCAL enable_indexscan = off"))
+        exact = set(s.execute(exact_sql, {"query_embedding": q, "k": k}).scalars().all())
+        s.execute(sql_text("SET LOCAL enable_indexscan = on"))
+        total += len(found & exact) / max(1, len(exact))
+    return total / len(queries)
@@ -1,22 +1,261 @@
 from __future__ import annotations
 
-import json
-from rq import Queue
-from redis import Redis
+import time
+import traceback
+from functools import lru_cache
+from typing import Any
 
+from redis import ConnectionPool, Redis
+from rq import Queue, Retry, SimpleWorker, get_current_job
+from rq.exceptions import NoSuchJobError
+from rq.executions import Execution
+from rq.job import Job, JobStatus
+from rq.timeouts import JobTimeoutException
+from rq.utils import now
+from rq.worker import WorkerStatus
+
+from mcp_server.logging_config import get_logger
+
+from .checkpoint import IngestCheckpoint
+from .ingest import ingest_file, ingest_many
+from .metrics import observe_ingest_job
 from .settings import get_rag_settings
-from .ingest import ingest_file
+from .summaries import summarize_documents
 
+logger = get_logger(__name__)
 
-def get_queue() -> Queue:
+@lru_cache(maxsize=1)
+def _redis_pool() -> ConnectionPool:
     settings = get_rag_settings()
-    redis = Redis.from_url(settings.redis_url)
-    return Queue("rag", connection=redis, default_timeout=600)
+    return ConnectionPool.from_url(
+        settings.redis_url, max_connections=settings.redis_max_connections
+    )
+
+
+def get_redis() -> Redis:
+    """Redis client backed by the process-wide connection pool."""
+    return Redis(connection_pool=_redis_pool())
+
+
+def get_queue() -> Queue:
+    return Queue("rag", connection=get_redis(), default_timeout=600)
+
+
+def ingest_job(filename: str, data: bytes, source_path: str | None = None) -> int:
+    """RQ entry point for ``ingest_file`` that checkpoints each stage on the job."""
+    job = get_current_job()
+    checkpoint = IngestCheckpoint(job) if job is not None else None
+    start = time.perf_counter()
+    ok = False
+    try:
+        doc_id = ingest_file(filename, data, source_path=source_path, checkpoint=checkpoint)
+        ok = True
+    finally:
+        observe_ingest_job(time.perf_counter() - start, len(data), ok)
+    enqueue_summaries([doc_id])
+    return doc_id
+
+
+INGEST_FUNC_NAME = f"{ingest_job.__module__}.{ingest_job.__name__}"
 
 
 def enqueue_ingest(filename: str, data: bytes, source_path: str | None = None) -> str:
     q = get_queue()
-    job = q.enqueue(ingest_file, filename, data, source_path=source_path, retry=3)
+    job = q.enqueue(ingest_job, filename, data, source_path=source_path, retry=Retry(max=3))
     return job.get_id()
 
 
+def summarize_job(document_ids: list[int]) -> int:
+    """RQ entry point for ``summarize_documents`` over freshly ingested documents."""
+    return summarize_documents(document_ids=document_ids)
+
+
+def enqueue_summaries(document_ids: list[int]) -> None:
+    """Queue summarization of ``document_ids`` when ``RAG_SUMMARIZE_ON_INGEST`` is set.
+
+    A failure to enqueue is logged, not raised: the ingest itself succeeded and
+    ``rag summarize`` backfills missing summaries.
+    """
+    if not document_ids or not get_rag_settings().summarize_on_ingest:
+        return
+    try:
+        get_queue().enqueue(summarize_job, list(document_ids), retry=Retry(max=3))
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("rag_summary_enqueue_failed", document_ids=document_ids, error=str(exc))
+
+
+def start_worker_metrics_server(port_offset: int = 0) -> None:
+    """Serve this worker's Prometheus metrics (including queue gauges) if configured.
+
+    Preforked children pass their slot index as ``port_offset`` so each gets its own port.
+    """
+    port = get_rag_settings().worker_metrics_port
+    if port:
+        from prometheus_client import start_http_server
+
+        from .metrics import register_queue_collector
+
+        register_queue_collector()
+        start_http_server(port + port_offset)
+
+
+class BatchTimeout(BaseException):
+    """Raised by the death penalty when a batch outlives its timeout.
+
+    It is not an ``Exception``, so ``ingest_many``'s per-item error handling
+    cannot swallow it and carry on with the rest of the batch.
+    """
+
+
+class BatchIngestWorker(SimpleWorker):
+    """Worker that coalesces pending ``ingest_job`` jobs into shared embedding batches.
+
+    When an ingest job is dequeued, up to ``RAG_WORKER_BATCH_JOBS - 1`` further
+    pending jobs are popped from the same queue and ingested together through
+    ``ingest_many``. Each document is still committed on its own and each job
+    gets its own success/failure callbacks (and retry) handling. Only jobs with
+    the same timeout as the dequeued one join its batch, and the batch as a
+    whole runs under that timeout; collection stops at the first job that
+    cannot join, which goes back to the front of the queue. Popped jobs enter
+    the ``StartedJobRegistry`` at once, so if the worker dies RQ's abandoned
+    job cleanup retries them. Start it with::
+
+        rq worker -w rag.worker.BatchIngestWorker rag
+
+    Jobs run in the worker process, so per-job duration and throughput
+    histograms are kept and served on ``RAG_WORKER_METRICS_PORT`` when set.
+    """
+
+    def __init__(self, *args: Any, metrics_port_offset: int = 0, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        start_worker_metrics_server(metrics_port_offset)
+
+    def execute_job(self, job: Job, queue: Queue) -> None:
+        if job.func_name != INGEST_FUNC_NAME:
+            super().execute_job(job, queue)
+            return
+
+        batch = [job]
+        executions = {job.id: self.prepare_execution(job)}
+        limit = max(1, get_rag_settings().worker_batch_jobs)
+        while len(batch) < limit:
+            job_id = queue.pop_job_id()
+            if job_id is None:
+                break
+            try:
+                extra = Job.fetch(job_id, connection=self.connection)
+            except NoSuchJobError:
+                continue
+            if not self._batchable(extra, job):
+                queue.push_job_id(job_id, at_front=True)
+                break
+            batch.append(extra)
+            executions[extra.id] = self.prepare_execution(extra)
+
+        self._perform_batch(batch, queue, executions)
+        self.set_state(WorkerStatus.IDLE)
+
+    def _timeout(self, job: Job) -> int:
+        return int(job.timeout or self.queue_class.DEFAULT_TIMEOUT)
+
+    def _batchable(self, job: Job, head: Job) -> bool:
+        """Ingest jobs share the head job's batch only if its timeout also bounds theirs."""
+        return job.func_name == INGEST_FUNC_NAME and self._timeout(job) == self._timeout(head)
+
+    def _perform_batch(
+        self, jobs: list[Job], queue: Queue, executions: dict[str, Execution]
+    ) -> None:
+        registry = queue.started_job_registry
+        for n, job in enumerate(jobs):
+            # Only the dequeued head job went through the intermediate queue; the
+            # others were popped straight off the queue.
+            head = n == 0 and len(self.queues) == 1
+            self.prepare_job_execution(job, remove_from_intermediate_queue=head)
+            job.started_at = now()
+
+        items = []
+        for job in jobs:
+            filename, data = job.args[0], job.args[1]
+            items.append((filename, data, job.kwargs.get("source_path")))
+        results: list[int | Exception]
+        try:
+            # The batch gets the timeout each of its jobs would have had on its own.
+            with self.death_penalty_class(self._timeout(jobs[0]), BatchTimeout, job_id=jobs[0].id):
+                results = ingest_many(items, [IngestCheckpoint(job) for job in jobs])
+        except BatchTimeout as exc:
+            timeout = JobTimeoutException(str(exc))
+            results = [timeout] * len(jobs)
+        except Exception as exc:  # noqa: BLE001
+            results = [exc] * len(jobs)
+
+        for job, item, result in zip(jobs, items, results):
+            # RQ tracks one execution per worker; point it at the job being finalised.
+            self.execution = executions[job.id]
+            ok = not isinstance(result, Exception)
+            self.handle_execution_ended(
+                job, queue, job.success_callback_timeout if ok else job.failure_callback_timeout
+            )
+            assert job.started_at is not None and job.ended_at is not None
+            observe_ingest_job((job.ended_at - job.started_at).total_seconds(), len(item[1]), ok)
+            error: BaseException
+            if isinstance(result, Exception):
+                error = result
+            else:
+                try:
+                    job._status = JobStatus.FINISHED
+                    job.execute_success_callback(self.death_penalty_class, result)
+                except Exception as exc:  # noqa: BLE001
+                    error = exc
+                else:
+                    job._result = result
+                    self.handle_job_success(job=job, queue=queue, started_job_registry=registry)
+                    continue
+            job._status = JobStatus.FAILED
+            exc_info = (type(error), error, error.__traceback__)
+            try:
+                job.execute_failure_callback(self.death_penalty_class, *exc_info)
+            except Exception as exc:  # noqa: BLE001
+                exc_info = (type(exc), exc, exc.__traceback__)
+            self.handle_exception(job, *exc_info)
+            self.handle_job_failure(
+                job=job,
+                exc_string="".join(traceback.format_exception(*exc_info)),
+                queue=queue,
+                started_job_registry=registry,
+            )
+        enqueue_summaries([r for r in results if not isinstance(r, Exception)])
+
+
+def _job_status(job: Job) -> dict[str, Any]:
+    meta = job.meta or {}
+    status = job.get_status(refresh=False)
+    error = None
+    if job.exc_info:
+        error = job.exc_info.strip().splitlines()[-1]
+    return {
+        "id": job.id,
+        "status": str(getattr(status, "value", status)),
+        "stage": meta.get("stage", "queued"),
+        "chunk_count": meta.get("chunk_count"),
+        "chunks_processed": meta.get("embedded_offset", 0),
+        "cache_hits": meta.get("cache_hits", 0),
+        "timings": meta.get("timings", {}),
+        "document_id": meta.get("document_id"),
+        "retries_left": job.retries_left,
+        "enqueued_at": job.enqueued_at.isoformat() if job.enqueued_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "ended_at": job.ended_at.isoformat() if job.ended_at else None,
+        "error": error,
+    }
+
+
+def get_jobs_status(job_ids: list[str]) -> list[dict[str, Any] | None]:
+    """Status of ingest jobs in the order requested; ``None`` for unknown ids."""
+    if not job_ids:
+        return []
+    jobs = Job.fetch_many(job_ids, connection=get_queue().connection)
+    return [_job_status(job) if job is not None else None for job in jobs]
+
+
+def get_job_status(job_id: str) -> dict[str, Any] | None:
+    return get_jobs_status([job_id])[0]
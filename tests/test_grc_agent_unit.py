@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+
+from grc import agent as grc_agent
+from grc.agent import GRCAgent
+
+
+class _Session:
+    def __init__(self, rows):
+        self.rows = rows
+        self.params = []
+
+    def execute(self, stmt, params):
+        self.params.append(params)
+        return iter(self.rows)
+
+
+def test_context_documents_are_mapped_to_rag_document_ids(monkeypatch):
+    # GRC documents 1 and 2 hold RAG documents 41 and 17.
+    session = _Session([(41,), (17,)])
+
+    @contextmanager
+    def fake_read_session():
+        yield session
+
+    asked = []
+    monkeypatch.setattr("rag.db.read_session", fake_read_session)
+    monkeypatch.setattr(grc_agent, "coalesce", lambda namespace, key, fn: fn())
+    agent = GRCAgent.__new__(GRCAgent)
+    monkeypatch.setattr(
+        agent, "_answer_grc_question", lambda question, filters: asked.append(filters) or {}
+    )
+
+    agent.answer_grc_question("Who approves access?", context_documents=[1, 2])
+
+    assert session.params == [{"ids": [1, 2]}]
+    assert asked[0].document_ids == [17, 41]
+    assert asked[0].to_sql()[1]["f_document_ids"] == [17, 41]
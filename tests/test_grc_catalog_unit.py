@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import io
+import json
+
+import pytest
+
+from grc.catalog import normalize_control, read_records
+
+
+def test_csv_columns_are_matched_by_alias():
+    f = io.StringIO(
+        "Control ID,Name,Family,Statement\n"
+        "AC-1,Policy and Procedures,Access Control,Develop a policy\n"
+    )
+    row = normalize_control(next(read_records(f, "csv")), framework="nist")
+    assert row == {
+        "framework": "NIST",
+        "control_id": "AC-1",
+        "title": "Policy and Procedures",
+        "description": "Develop a policy",
+        "category": "Access Control",
+        "is_active": True,
+    }
+    with pytest.raises(ValueError):
+        normalize_control({"title": "no id"}, framework="NIST")
+    with pytest.raises(ValueError):
+        normalize_control({"id": "A.5.1"}, framework="ISO 9001")
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [("ISO 27001", "ISO27001"), ("iso-27001", "ISO27001"), ("SOC 2", "SOC2"),
+     ("PCI-DSS", "PCI_DSS"), ("pci dss", "PCI_DSS"), ("PCI_DSS", "PCI_DSS"), ("sox", "SOX")],
+)
+def test_framework_names_match_regardless_of_separators(name, expected):
+    assert normalize_control({"id": "1.1"}, framework=name)["framework"] == expected
+
+
+def test_oscal_catalog_yields_controls_and_enhancements():
+    catalog = {
+        "catalog": {
+            "groups": [
+                {
+                    "id": "ac",
+                    "title": "Access Control",
+                    "controls": [
+                        {
+                            "id": "ac-2",
+                            "title": "Account Management",
+                            "props": [{"name": "label", "value": "AC-2"}],
+                            "parts": [
+                                {
+                                    "name": "statement",
+                                    "prose": "Manage accounts:",
+                                    "parts": [{"prose": "define types"}],
+                                },
+                                {"name": "guidance", "prose": "not part of the statement"},
+                            ],
+                            "controls": [
+                                {"id": "ac-2.1", "title": "Automated Management", "props": []}
+                            ],
+                        }
+                    ],
+                }
+            ]
+        }
+    }
+    records = list(read_records(io.StringIO(json.dumps(catalog)), "oscal"))
+    assert [r["control_id"] for r in records] == ["AC-2", "ac-2.1"]
+    assert records[0]["description"] == "Manage accounts:\ndefine types"
+    assert {r["category"] for r in records} == {"Access Control"}
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import numpy as np
+
+from grc.coverage import top_matches
+
+
+def test_top_matches_keeps_best_chunks_per_control():
+    rng = np.random.default_rng(0)
+    chunks = rng.normal(size=(50, 8)).astype(np.float32)
+    controls = rng.normal(size=(4, 8)).astype(np.float32)
+    controls /= np.linalg.norm(controls, axis=1, keepdims=True)
+    chunk_ids = np.arange(100, 150)
+    document_ids = chunk_ids // 10
+    control_ids = np.array([3, 5, 8, 13])
+
+    control_col, chunk_col, doc_col, scores = top_matches(
+        chunk_ids, document_ids, chunks, control_ids, controls, k=3
+    )
+
+    unit = chunks / np.linalg.norm(chunks, axis=1, keepdims=True)
+    for j, control_id in enumerate(control_ids):
+        expected = np.argsort(-(unit @ controls[j]))[:3]
+        mine = control_col == control_id
+        assert set(chunk_col[mine]) == set(chunk_ids[expected])
+        assert np.allclose(sorted(scores[mine]), sorted(unit[expected] @ controls[j]), atol=1e-5)
+    assert np.array_equal(doc_col, chunk_col // 10)
+
+    # Fewer chunks than k: every chunk is a candidate for every control.
+    control_col, chunk_col, _, _ = top_matches(
+        chunk_ids[:2], document_ids[:2], chunks[:2], control_ids, controls, k=3
+    )
+    assert len(chunk_col) == 2 * len(control_ids)
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from grc.dashboard import (
+    ResponseCache,
+    compliance_status,
+    dashboard_stats,
+    etag_matches,
+    load_stats,
+)
+from grc.models import DashboardStat
+
+
+def _stat(dimension, value, count, cscore=0.0, ccount=0, rscore=0.0, rcount=0):
+    return (dimension, value), DashboardStat(
+        dimension=dimension,
+        value=value,
+        count=count,
+        compliance_score_sum=cscore,
+        compliance_score_count=ccount,
+        risk_score_sum=rscore,
+        risk_score_count=rcount,
+    )
+
+
+def test_dashboard_payloads_are_derived_from_running_totals():
+    stats = dict([
+        _stat("all", "", 3, cscore=1.5, ccount=2, rscore=0.9, rcount=3),
+        _stat("framework", "GDPR", 2, cscore=1.5, ccount=2),
+        _stat("framework", "SOX", 1),
+        _stat("framework", "HIPAA", 0),
+        _stat("status", "DRAFT", 3),
+        _stat("risk_assessment", "", 4, rscore=12.0, rcount=4),
+    ])
+    payload = dashboard_stats(stats)
+    assert payload["totalDocuments"] == 3
+    assert payload["complianceScore"] == 0.75
+    assert payload["riskAssessments"] == 4 and payload["averageAssessedRisk"] == 3.0
+    assert payload["activeFrameworks"] == 2 and payload["byFramework"] == {"GDPR": 2, "SOX": 1}
+
+    status = compliance_status(stats)
+    assert [(f["name"], f["score"]) for f in status["frameworks"]] == [
+        ("GDPR", 0.75),
+        ("SOX", None),
+    ]
+    assert dashboard_stats({})["totalDocuments"] == 0
+
+
+def test_load_stats_sums_the_slots_of_each_total():
+    engine = create_engine("sqlite://")
+    DashboardStat.__table__.create(engine)
+    with Session(engine) as s:
+        s.add_all([
+            DashboardStat(dimension="all", value="", slot=0, count=2, compliance_score_sum=1.0,
+                          compliance_score_count=2, risk_score_sum=0.0, risk_score_count=0),
+            DashboardStat(dimension="all", value="", slot=5, count=-1, compliance_score_sum=-0.5,
+                          compliance_score_count=-1, risk_score_sum=0.0, risk_score_count=0),
+            DashboardStat(dimension="framework", value="SOX", slot=5, count=1,
+                          compliance_score_sum=0.0, compliance_score_count=0,
+                          risk_score_sum=0.0, risk_score_count=0),
+        ])
+        s.flush()
+        stats = load_stats(s)
+    assert sorted(stats) == [("all", ""), ("framework", "SOX")]
+    total = stats[("all", "")]
+    assert (total.count, total.compliance_score_sum, total.compliance_score_count) == (1, 0.5, 1)
+    assert dashboard_stats(stats)["complianceScore"] == 0.5
+
+
+def test_response_cache_reuses_body_and_etag_within_ttl():
+    calls = []
+    cache = ResponseCache(ttl_seconds=60)
+    body, etag = cache.get("stats", lambda: calls.append(1) or {"totalDocuments": 1})
+    again, same = cache.get("stats", lambda: calls.append(1) or {"totalDocuments": 2})
+    assert (again, same) == (body, etag) and calls == [1]
+    assert etag_matches(f'W/{etag}, "other"', etag)
+    assert not etag_matches(None, etag)
+
+    expired = ResponseCache(ttl_seconds=0)
+    expired.get("stats", lambda: {"n": 1})
+    assert expired.get("stats", lambda: {"n": 2})[0] == b'{"n":2}'
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import numpy as np
+
+from grc import ingest as grc_ingest
+from grc.classifier import _fallback_classification
+from grc.models import DocumentAuditLog, GRCDocument, RiskAssessment
+
+
+class _Session:
+    def __init__(self):
+        self.added = []
+        self.executed = 0
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    def flush(self):
+        for obj in self.added:
+            obj.id = obj.id or len(self.added)
+
+    def execute(self, *args, **kwargs):
+        self.executed += 1
+
+
+def test_ingest_parses_once_and_writes_in_one_session(monkeypatch):
+    sessions = []
+    threads = {}
+
+    @contextmanager
+    def fake_db_session():
+        sessions.append(_Session())
+        yield sessions[-1]
+
+    class _Classifier:
+        def analyze_document(self, text, filename):
+            threads["analyze"] = threading.current_thread().name
+            return {
+                "summary": "Access control policy for production systems.",
+                "classification": _fallback_classification(filename),
+                "risk_assessment": {
+                    "overall_risk_score": 0.8,
+                    "risk_factors": [
+                        {"factor": "Weak MFA", "likelihood": "HIGH", "impact": "CRITICAL"}
+                    ],
+                    "mitigation_suggestions": ["Enforce MFA"],
+                },
+            }
+
+    def fake_embed(chunks):
+        threads["embed"] = threading.current_thread().name
+        return np.zeros((len(chunks), 3), np.float32), [False] * len(chunks)
+
+    written = []
+    monkeypatch.setattr("rag.db.db_session", fake_db_session)
+    monkeypatch.setattr(grc_ingest, "ensure_schema", lambda: None)
+    monkeypatch.setattr(grc_ingest, "GRCDocumentClassifier", _Classifier)
+    monkeypatch.setattr(grc_ingest, "_embed_chunks", fake_embed)
+    monkeypatch.setattr(
+        grc_ingest, "write_document", lambda s, *args, **kwargs: written.append((s, args)) or 42
+    )
+    summaries = []
+    monkeypatch.setattr(
+        grc_ingest, "embed_texts", lambda texts: np.ones((len(texts), 3), np.float32)
+    )
+    monkeypatch.setattr(grc_ingest, "write_summaries", lambda s, rows: summaries.extend(rows))
+    coverage = []
+    monkeypatch.setattr(grc_ingest, "update_coverage", coverage.append)
+
+    grc_ingest.ingest_grc_document("policy.txt", b"Access control policy " * 100, "alice")
+
+    assert len(sessions) == 1 and written[0][0] is sessions[0]
+    assert written[0][1][3] is None and len(written[0][1][4]) == 2  # source_path, chunks
+    assert threads["analyze"] != threads["embed"]
+    kinds = [type(o) for o in sessions[0].added]
+    assert kinds == [GRCDocument, DocumentAuditLog, RiskAssessment]
+    risk = sessions[0].added[2]
+    assert (risk.likelihood, risk.impact, risk.risk_score) == (4, 5, 4.0)
+    assert sessions[0].added[0].document_id == 42
+    assert sessions[0].added[0].ai_summary == "Access control policy for production systems."
+    assert [(doc_id, text) for doc_id, text, _ in summaries] == [
+        (42, sessions[0].added[0].ai_summary)
+    ]
+    assert coverage == [[42]]
+
+
+def test_analysis_cache_skips_repeat_llm_calls(monkeypatch):
+    import json
+    from types import SimpleNamespace
+
+    from grc import classifier as grc_classifier
+    from grc.analysis_cache import AnalysisCache
+
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs["messages"][0]["content"])
+        content = json.dumps(
+            {"document_type": "POLICY", "compliance_framework": "GDPR", "title": "Privacy"}
+        )
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    cache = AnalysisCache(16, use_db=False)
+    monkeypatch.setattr(grc_classifier, "_client", lambda: client)
+    monkeypatch.setattr(grc_classifier, "get_analysis_cache", lambda: cache)
+
+    clf = grc_classifier.GRCDocumentClassifier()
+    first = clf.classify_document("Personal data is processed lawfully.", "privacy.txt")
+    again = grc_classifier.GRCDocumentClassifier().classify_document(
+        "Personal data is processed lawfully.", "privacy.txt"
+    )
+    assert first == again and first["compliance_framework"].value == "GDPR"
+    assert len(calls) == 1
+
+    clf.classify_document("Different text.", "privacy.txt")
+    monkeypatch.setattr(
+        grc_classifier, "CLASSIFY_PROMPT", grc_classifier.CLASSIFY_PROMPT + "\nBe concise."
+    )
+    clf.classify_document("Personal data is processed lawfully.", "privacy.txt")
+    assert len(calls) == 3
+
+
+def test_chunk_filters_follow_every_grc_document_write():
+    from grc.models import CHUNK_FILTERS_BACKFILL, CHUNK_FILTERS_FUNCTION, CHUNK_FILTERS_TRIGGER
+
+    function = " ".join(CHUNK_FILTERS_FUNCTION.split())
+    backfill = " ".join(CHUNK_FILTERS_BACKFILL.split())
+    for column, source in (
+        ("compliance_framework", "{}.compliance_framework::text"),
+        ("document_type", "{}.document_type::text"),
+        ("doc_status", "coalesce({}.status::text, 'DRAFT')"),
+        ("effective_date", "{}.effective_date"),
+    ):
+        assert f"{column} = {source.format('NEW')}" in function
+        assert f"{column} = {source.format('g')}" in backfill
+        # Deleted or re-pointed GRC documents leave no stale filter values behind.
+        assert f"{column} = NULL" in function
+    # A status-only UPDATE (e.g. approval by direct SQL) is not skipped as unchanged.
+    assert "OLD.status" in function and "NEW.status" in function
+    trigger = " ".join(CHUNK_FILTERS_TRIGGER.split())
+    assert "AFTER INSERT OR UPDATE OR DELETE ON grc_documents" in trigger
+    assert not hasattr(grc_ingest, "sync_chunk_filters")
+
+
+def test_update_document_classification_stores_enum_members(monkeypatch):
+    import pytest
+
+    from grc.models import ComplianceFramework, RiskLevel
+
+    doc = GRCDocument(id=3, document_id=30)
+    s = _Session()
+    s.query = lambda model: SimpleNamespace(filter=lambda *a: SimpleNamespace(first=lambda: doc))
+    s.commit = lambda: None
+    opened = []
+
+    @contextmanager
+    def fake_db_session():
+        opened.append(s)
+        yield s
+
+    monkeypatch.setattr("rag.db.db_session", fake_db_session)
+
+    with pytest.raises(ValueError):
+        grc_ingest.update_document_classification(3, "alice", risk_level="SEVERE")
+    assert opened == []
+
+    assert grc_ingest.update_document_classification(
+        3, "alice", compliance_framework="SOX", risk_level="HIGH"
+    )
+    assert doc.compliance_framework is ComplianceFramework.SOX
+    assert doc.risk_level is RiskLevel.HIGH
+
+
+def test_analysis_cache_skips_replies_that_fail_validation(monkeypatch):
+    import json
+
+    from grc import classifier as grc_classifier
+    from grc.analysis_cache import AnalysisCache
+
+    replies = [
+        {"document_type": "MEMO", "compliance_framework": "GDPR"},  # not in the taxonomy
+        {"document_type": "POLICY", "compliance_framework": "GDPR"},
+    ]
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        content = json.dumps(replies[len(calls) - 1])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    cache = AnalysisCache(16, use_db=False)
+    monkeypatch.setattr(grc_classifier, "_client", lambda: client)
+    monkeypatch.setattr(grc_classifier, "get_analysis_cache", lambda: cache)
+
+    clf = grc_classifier.GRCDocumentClassifier()
+    first = clf.classify_document("Personal data is processed lawfully.", "privacy.txt")
+    assert first == _fallback_classification("privacy.txt")
+    second = clf.classify_document("Personal data is processed lawfully.", "privacy.txt")
+    assert len(calls) == 2
+    assert second["document_type"].value == "POLICY"
+    clf.classify_document("Personal data is processed lawfully.", "privacy.txt")
+    assert len(calls) == 2
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from grc.listing import GRCListFilters, grc_documents_stmt
+from rag.listing import decode_cursor, encode_cursor, page
+
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    created = datetime(2026, 10, 19, 12, 30, 5, 123456)
+    assert decode_cursor(encode_cursor(created, 42)) == (created, 42)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_page_sets_next_cursor_only_when_more_rows_exist():
+    rows = [{"id": i, "created_at": datetime(2026, 1, i).isoformat()} for i in (3, 2, 1)]
+    first = page(rows, 2)
+    assert [r["id"] for r in first["items"]] == [3, 2]
+    assert decode_cursor(first["next_cursor"]) == (datetime(2026, 1, 2), 2)
+    assert page(rows, 3)["next_cursor"] is None
+
+
+def test_filters_and_cursor_become_an_index_range():
+    filters = GRCListFilters(
+        frameworks=["gdpr"], statuses=["APPROVED", "draft"], created_after="2026-01-01"
+    )
+    cursor = encode_cursor(datetime(2026, 6, 1), 7)
+    sql = _sql(grc_documents_stmt(filters, cursor))
+    assert "grc_documents.compliance_framework = %(compliance_framework_1)s" in sql
+    assert "grc_documents.status IN" in sql
+    assert "(grc_documents.created_at, grc_documents.id) < (%(param_1)s" in sql
+    assert sql.endswith("ORDER BY grc_documents.created_at DESC, grc_documents.id DESC")
+    assert "OFFSET" not in sql
+
+    with pytest.raises(ValueError):
+        GRCListFilters(risk_levels=["SEVERE"])
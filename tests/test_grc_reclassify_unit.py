@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import io
+import json
+from types import SimpleNamespace
+
+from grc.reclassify import (
+    Candidate,
+    apply_classifications,
+    read_batch_results,
+    run_batch_locally,
+    write_batch_requests,
+)
+from rag.ingest import load_document_texts
+
+
+class _Session:
+    def __init__(self, rows=()):
+        self.rows = rows
+        self.statements = []
+
+    def execute(self, stmt, params=None):
+        self.statements.append((str(stmt), params))
+        return self.rows
+
+
+def test_batch_file_round_trip_and_bulk_apply(tmp_path):
+    candidates = [
+        Candidate(1, 10, "a.txt", "POLICY", "SOX", "MEDIUM"),
+        Candidate(2, 20, "b.txt", "OTHER", "SOX", "LOW"),
+    ]
+    out = io.StringIO()
+    assert write_batch_requests(out, candidates, {10: "Privacy policy", 20: "Incident log"}) == 2
+    requests_path = tmp_path / "requests.jsonl"
+    requests_path.write_text(out.getvalue())
+    first = json.loads(out.getvalue().splitlines()[0])
+    assert first["custom_id"] == "grc-1" and "GDPR" in first["body"]["messages"][0]["content"]
+
+    def create(**body):
+        label = "POLICY" if "Privacy" in body["messages"][0]["content"] else "INCIDENT_REPORT"
+        content = json.dumps(
+            {"document_type": label, "compliance_framework": "SOX", "risk_level": "MEDIUM"}
+        )
+        if label == "INCIDENT_REPORT":
+            content = json.dumps(
+                {"document_type": label, "compliance_framework": "GDPR", "risk_level": "LOW"}
+            )
+        return SimpleNamespace(model_dump=lambda: {"choices": [{"message": {"content": content}}]})
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    results_path = tmp_path / "results.jsonl"
+    assert run_batch_locally(requests_path, results_path, client=client) == 2
+    results = read_batch_results(results_path)
+    assert set(results) == {1, 2}
+
+    s = _Session()
+    assert apply_classifications(s, candidates, results, "alice") == 1  # doc 1 is unchanged
+    grc_update, audit = s.statements
+    assert grc_update[1] == [
+        {"id": 2, "document_type": "INCIDENT_REPORT", "compliance_framework": "GDPR",
+         "risk_level": "LOW", "updated_at": grc_update[1][0]["updated_at"]}
+    ]
+    assert "compliance_framework: SOX -> GDPR" in audit[1][0]["details"]
+
+
+def test_load_document_texts_drops_chunk_overlap():
+    rows = [(1, "abcdefgh", 0), (1, "fghijk", 5), (2, "xyz", None), (2, "uvw", None)]
+    assert load_document_texts(_Session(rows), [1, 2], max_chars=10) == {
+        1: "abcdefghij",
+        2: "xyz uvw",
+    }
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import json
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from grc import classifier as grc_classifier
+from grc import report as grc_report
+from grc.analysis_cache import AnalysisCache
+from grc.models import ComplianceFramework
+from rag.settings import RAGSettings
+
+
+def test_report_streams_sections_and_reuses_cached_map_results(monkeypatch):
+    texts = {10: "Access reviews are quarterly.", 20: "Backups are encrypted."}
+    prompts = []
+
+    def create(**body):
+        prompt = body["messages"][0]["content"]
+        prompts.append(prompt)
+        if "executive summary" in prompt:
+            content = {
+                "executive_summary": "Mostly compliant.",
+                "key_findings": ["MFA gap"],
+                "recommendations": ["Add MFA"],
+            }
+        else:
+            content = {
+                "summary": "s",
+                "controls_addressed": ["AC-2"],
+                "gaps": ["MFA"],
+                "compliance_score": 0.8,
+            }
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(content)))]
+        )
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    cache = AnalysisCache(64, use_db=False)
+
+    @contextmanager
+    def fake_read_session():
+        yield None
+
+    monkeypatch.setattr(grc_classifier, "get_analysis_cache", lambda: cache)
+    monkeypatch.setattr(
+        grc_report, "get_rag_settings", lambda: RAGSettings(grc_report_concurrency=2)
+    )
+    monkeypatch.setattr("rag.db.read_session", fake_read_session)
+    monkeypatch.setattr(
+        grc_report,
+        "select_report_documents",
+        lambda s, fw, ids, limit: [grc_report.ReportDocument(1, 10, "Access", "POLICY"),
+                                   grc_report.ReportDocument(2, 20, "Backup", "PROCEDURE")],
+    )
+    monkeypatch.setattr(grc_report, "load_document_texts", lambda s, ids, max_chars: dict(texts))
+
+    sections = list(
+        grc_report.stream_compliance_report(ComplianceFramework.SOX, [1, 2], client=client)
+    )
+    assert [s["section"] for s in sections] == [
+        "scope",
+        "document",
+        "document",
+        "coverage",
+        "summary",
+    ]
+    assert len(prompts) == 3  # two map calls, one reduce
+
+    report = grc_report.build_compliance_report(ComplianceFramework.SOX, sections)
+    assert report["compliance_score"] == 0.8 and report["maturity_level"] == "ADVANCED"
+    assert report["coverage"]["gaps"] == [{"item": "MFA", "grc_document_ids": [1, 2]}]
+    assert report["recommendations"] == ["Add MFA"] and "## Gaps" in report["report"]
+
+    texts[20] = "Backups are encrypted and tested monthly."
+    list(grc_report.stream_compliance_report(ComplianceFramework.SOX, [1, 2], client=client))
+    assert len(prompts) == 4  # only the changed document's map step re-ran; the reduce was cached
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from sqlalchemy import text as sql_text
+from sqlalchemy.dialects import postgresql
+
+from grc.status import STATUS_SQL, StatusCache
+
+
+def test_status_cache_loads_only_missing_ids_in_one_call():
+    calls = []
+
+    def load(ids):
+        calls.append(list(ids))
+        return {i: {"document": {"id": i}} for i in ids if i != 99}
+
+    cache = StatusCache(max_entries=10, ttl_seconds=60)
+    assert set(cache.get_many([1, 2, 99], load)) == {1, 2}
+    assert set(cache.get_many([2, 3, 3], load)) == {2, 3}
+    assert calls == [[1, 2, 99], [3]]
+
+    cache.invalidate([2])
+    cache.get_many([1, 2], load)
+    assert calls[-1] == [2]
+
+
+def test_read_racing_an_invalidation_is_not_cached():
+    cache = StatusCache(max_entries=10, ttl_seconds=60)
+
+    def stale_load(ids):
+        # A write commits and invalidates while this read is in flight.
+        cache.invalidate(ids)
+        return {i: {"version": "old"} for i in ids}
+
+    assert cache.get_many([5], stale_load) == {5: {"version": "old"}}
+    assert cache.get_many([5], lambda ids: {5: {"version": "new"}}) == {5: {"version": "new"}}
+
+
+def test_status_sql_is_a_single_statement_over_all_ids():
+    compiled = str(sql_text(STATUS_SQL).compile(dialect=postgresql.dialect()))
+    assert compiled.count("FROM grc_documents") == 1
+    assert "ANY(%(ids)s)" in compiled
+    assert "LIMIT 10" in compiled
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def mget(self, keys):
+        return [self.values.get(k) for k in keys]
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def incr(self, key):
+        self.values[key] = str(int(self.values.get(key) or 0) + 1).encode()
+
+    def execute(self):
+        pass
+
+
+def test_invalidation_reaches_other_processes_through_redis(monkeypatch):
+    import rag.worker
+
+    fake = _FakeRedis()
+    monkeypatch.setattr(rag.worker, "get_redis", lambda: fake)
+    api, worker = StatusCache(10, 60, use_redis=True), StatusCache(10, 60, use_redis=True)
+    rows = {7: {"status": "DRAFT"}}
+
+    def load(ids):
+        return {i: rows[i] for i in ids}
+
+    assert api.get_many([7], load) == {7: {"status": "DRAFT"}}
+    rows[7] = {"status": "APPROVED"}
+    assert api.get_many([7], load) == {7: {"status": "DRAFT"}}
+
+    worker.invalidate([7])
+    assert api.get_many([7], load) == {7: {"status": "APPROVED"}}
+
+
+def test_status_cache_falls_back_to_ttl_without_redis(monkeypatch):
+    import rag.worker
+
+    def unavailable():
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(rag.worker, "get_redis", unavailable)
+    cache = StatusCache(10, 60, use_redis=True)
+    calls = []
+    cache.invalidate([1])
+    cache.get_many([1], lambda ids: calls.append(ids) or {1: {}})
+    cache.get_many([1], lambda ids: calls.append(ids) or {1: {}})
+    assert calls == [[1]]
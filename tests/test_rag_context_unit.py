@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from rag import context
+
+
+def _positions(mapping):
+    return lambda ids: {i: mapping[i] for i in ids if i in mapping}
+
+
+def test_pack_context_merges_overlapping_neighbors(monkeypatch):
+    text = "".join(f"word{i} " for i in range(200))
+    first, second = text[:500], text[400:900]
+    monkeypatch.setattr(context, "_chunk_positions", _positions({1: (7, 0, 500), 2: (7, 400, 900)}))
+
+    packed = context.pack_context(
+        [(second, 0.8, {"chunk_id": 2}), (first, 0.9, {"chunk_id": 1})], max_tokens=10_000
+    )
+    assert len(packed.passages) == 1
+    assert packed.text == text[:900]
+    assert sorted(packed.passages[0].chunk_ids) == [1, 2]
+    assert packed.tokens_saved > 0
+
+
+def test_pack_context_drops_duplicates_and_respects_budget(monkeypatch):
+    monkeypatch.setattr(context, "_chunk_positions", _positions({}))
+    body = " ".join(f"token{i}" for i in range(400))
+    contexts = [
+        ("alpha beta gamma delta epsilon zeta eta theta", 0.9, {"chunk_id": 1}),
+        ("Alpha beta gamma delta epsilon zeta eta theta", 0.8, {"chunk_id": 2}),
+        (body, 0.7, {"chunk_id": 3}),
+    ]
+    packed = context.pack_context(contexts, max_tokens=120)
+    ids = [p.chunk_ids[0] for p in packed.passages]
+    assert ids == [1, 3]
+    assert packed.tokens <= 120
+    assert packed.passages[1].text != body
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from sqlalchemy.exc import OperationalError
+
+from rag.db import ReplicaSet
+
+
+class _Engine:
+    def __init__(self, name, up=True):
+        self.name = name
+        self.up = up
+        self.connects = 0
+
+    def connect(self):
+        self.connects += 1
+        if not self.up:
+            raise OperationalError("SELECT 1", {}, Exception("down"))
+        return self.name
+
+
+def test_replica_set_round_robin_and_fallback():
+    primary, r1, r2 = _Engine("primary"), _Engine("r1"), _Engine("r2")
+    replicas = ReplicaSet([r1, r2], primary, retry_seconds=60)
+    assert [replicas.connect() for _ in range(4)] == ["r1", "r2", "r1", "r2"]
+
+    r1.up = False
+    assert [replicas.connect() for _ in range(3)] == ["r2", "r2", "r2"]
+    assert r1.connects == 3  # two served, one failed attempt, then skipped
+
+    r2.up = False
+    assert replicas.connect() == "primary"
+    assert ReplicaSet([], primary, retry_seconds=60).connect() == "primary"
@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import numpy as np
+import pytest
+
 from rag import ingest as rag_ingest
 
 
@@ -12,3 +15,104 @@ def test_chunk_text_basic():
     assert chunks[0].endswith("A")
 
 
+def test_ingest_many_coalesces_embedding_batches(monkeypatch):
+    from rag.settings import RAGSettings
+
+    calls: list[int] = []
+    monkeypatch.setattr(
+        rag_ingest,
+        "get_rag_settings",
+        lambda: RAGSettings(embed_cache_enable=False, embed_batch_size=4),
+    )
+    monkeypatch.setattr(
+        rag_ingest,
+        "embed_texts",
+        lambda texts: calls.append(len(texts)) or np.zeros((len(texts), 3), np.float32),
+    )
+    saved: list[tuple[str, int]] = []
+
+    def fake_save(filename, content_type, data, source_path, chunks, embeddings, ingest_key=None):
+        assert embeddings.shape == (len(chunks), 3)
+        assert embeddings.dtype == np.float32
+        saved.append((filename, len(chunks)))
+        return len(saved)
+
+    monkeypatch.setattr(rag_ingest, "_save_document", fake_save)
+    items = [(f"doc{i}.txt", f"text {i}".encode(), None) for i in range(6)]
+    results = rag_ingest.ingest_many(items)
+
+    assert results == [1, 2, 3, 4, 5, 6]
+    assert calls == [4, 2]
+    assert [name for name, _ in saved] == [f"doc{i}.txt" for i in range(6)]
+
+
+class _FakeCheckpoint:
+    key = "job-1"
+
+    def __init__(self, text=None, embeddings=None):
+        self.document_id = None
+        self.text = text
+        self.embeddings = embeddings if embeddings is not None else np.empty((0, 0), np.float32)
+        self.saved_offsets: list[int] = []
+        self.timings: dict[str, float] = {}
+
+    def load_text(self):
+        return self.text
+
+    def save_text(self, content_type, text):
+        self.text = (content_type, text)
+
+    def load_embeddings(self):
+        return self.embeddings
+
+    def save_embeddings(self, offset, embeddings, cache_hits=0):
+        self.saved_offsets.append(offset)
+
+    def start_stage(self, stage):
+        self.stage = stage
+
+    def finish_stage(self, stage, seconds):
+        self.timings[stage] = seconds
+
+    def set_chunk_count(self, count):
+        self.chunk_count = count
+
+    def save_document(self, document_id):
+        self.document_id = document_id
+
+
+def test_ingest_file_resumes_from_checkpoint(monkeypatch):
+    from rag.settings import RAGSettings
+
+    monkeypatch.setattr(
+        rag_ingest,
+        "get_rag_settings",
+        lambda: RAGSettings(embed_cache_enable=False, embed_batch_size=1),
+    )
+    monkeypatch.setattr(
+        rag_ingest, "_parse_content", lambda *a: pytest.fail("text should come from checkpoint")
+    )
+    embedded: list[str] = []
+    monkeypatch.setattr(
+        rag_ingest,
+        "embed_texts",
+        lambda texts: embedded.extend(texts) or np.ones((len(texts), 2), np.float32),
+    )
+    keys: list[str | None] = []
+
+    def fake_save(filename, content_type, data, source_path, chunks, embeddings, ingest_key=None):
+        assert embeddings.shape == (len(chunks), 2)
+        keys.append(ingest_key)
+        return 42
+
+    monkeypatch.setattr(rag_ingest, "_save_document", fake_save)
+    text = "B" * 2500
+    ckpt = _FakeCheckpoint(text=("text/plain", text), embeddings=np.zeros((1, 2), np.float32))
+
+    assert rag_ingest.ingest_file("a.txt", b"", checkpoint=ckpt) == 42
+    assert embedded == rag_ingest._chunk_text(text)[1:]
+    assert ckpt.saved_offsets == [1, 2]
+    assert keys == ["job-1"]
+    assert set(ckpt.timings) == {"parse", "chunk", "embed", "save"}
+    assert rag_ingest.ingest_file("a.txt", b"", checkpoint=ckpt) == 42
+    assert keys == ["job-1"]
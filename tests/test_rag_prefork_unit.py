@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import itertools
+import logging
+import signal
+
+import rag.prefork as prefork
+from rag.prefork import PreforkIngestWorker
+from rag.worker import BatchIngestWorker
+
+
+def _worker(max_rss_bytes):
+    worker = PreforkIngestWorker.__new__(PreforkIngestWorker)
+    worker.log = logging.getLogger("test")
+    worker.name = "prefork-test"
+    worker.max_rss_bytes = max_rss_bytes
+    worker._stop_requested = False
+    return worker
+
+
+def test_worker_stops_after_a_job_that_leaves_it_over_the_rss_limit(monkeypatch):
+    ran = []
+    monkeypatch.setattr(BatchIngestWorker, "execute_job", lambda self, job, queue: ran.append(job))
+    monkeypatch.setattr(prefork, "_current_rss_bytes", lambda: 300 * 1024 * 1024)
+
+    below = _worker(512 * 1024 * 1024)
+    below.execute_job("job-1", None)
+    assert ran == ["job-1"] and not below._stop_requested
+
+    above = _worker(256 * 1024 * 1024)
+    above.execute_job("job-2", None)
+    assert above._stop_requested
+
+    unlimited = _worker(0)
+    unlimited.execute_job("job-3", None)
+    assert not unlimited._stop_requested
+
+
+def test_supervisor_respawns_exited_children_until_stopped(monkeypatch):
+    pids = itertools.count(101)
+    forked, killed, handlers = [], [], {}
+
+    def fork():
+        pid = next(pids)
+        forked.append(pid)
+        return pid
+
+    def wait():
+        step = len(waits)
+        waits.append(step)
+        if step == 0:
+            return 101, 0  # recycled child: its slot gets a new one
+        if step == 1:
+            handlers[signal.SIGTERM](signal.SIGTERM, None)
+            return 102, 0  # exits during shutdown: not replaced
+        return 103, 0
+
+    waits = []
+    monkeypatch.setattr(prefork, "preload", lambda: None)
+    monkeypatch.setattr(prefork.os, "fork", fork)
+    monkeypatch.setattr(prefork.os, "wait", wait)
+    monkeypatch.setattr(prefork.os, "kill", lambda pid, sig: killed.append((pid, sig)))
+    monkeypatch.setattr(prefork.signal, "signal", handlers.__setitem__)
+
+    prefork.run_prefork(processes=2, max_jobs=10, max_memory_mb=512)
+
+    assert forked == [101, 102, 103]
+    assert killed == [(102, signal.SIGTERM), (103, signal.SIGTERM)]
+    assert len(waits) == 3
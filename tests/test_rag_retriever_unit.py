@@ -11,3 +11,448 @@ def test_retrieve_similar_requires_openai_api(monkeypatch):
         retriever.retrieve_similar("test")
 
 
+@pytest.mark.parametrize(
+    "storage, expected",
+    [
+        ("halfvec", "halfvec(1536)"),
+        ("matryoshka", "subvector(embedding, 1, 256)"),
+        ("binary", "binary_quantize(embedding)"),
+    ],
+)
+def test_compact_storage_uses_two_stage_search(storage, expected):
+    from rag.settings import RAGSettings
+    from rag.vector_index import index_ddl, search_sql
+
+    settings = RAGSettings(vector_storage=storage, vector_coarse_dims=256)
+    sql = search_sql(settings)
+    assert "LIMIT :candidates" in sql
+    assert expected in sql
+    assert expected in index_ddl(settings)
+    # Final ordering is always the exact full-precision distance.
+    assert sql.strip().endswith("ORDER BY embedding <=> :query_embedding\n        LIMIT :k")
+
+
+def test_unknown_vector_storage_rejected():
+    from rag.settings import RAGSettings
+    from rag.vector_index import search_sql
+
+    with pytest.raises(ValueError):
+        search_sql(RAGSettings(vector_storage="pq"))
+
+
+def test_build_index_drops_only_other_storage_indexes():
+    from types import SimpleNamespace
+
+    from rag.settings import RAGSettings
+    from rag.vector_index import INDEX_PATTERN, stale_index_names
+
+    existing = [
+        "ix_chunks_embedding_binary",
+        "ix_chunks_embedding_full",
+        "ix_chunks_embedding_full_approved",
+        "ix_chunks_embedding_matryoshka_256",
+        "ix_chunks_embedding_matryoshka_512",
+    ]
+    seen = {}
+
+    def execute(stmt, params):
+        seen.update(params)
+        return SimpleNamespace(scalars=lambda: iter(existing))
+
+    settings = RAGSettings(vector_storage="matryoshka", vector_coarse_dims=256)
+    stale = stale_index_names(SimpleNamespace(execute=execute), settings)
+    assert seen == {"pattern": INDEX_PATTERN}
+    assert stale == [
+        "ix_chunks_embedding_binary",
+        "ix_chunks_embedding_full",
+        "ix_chunks_embedding_full_approved",
+        "ix_chunks_embedding_matryoshka_512",
+    ]
+
+
+def test_local_index_search_skips_tombstoned_chunks(tmp_path):
+    import numpy as np
+
+    from rag.local_index import (
+        LocalVectorIndex,
+        _append_rows,
+        _append_tombstones,
+        _gen_dir,
+        _write_meta,
+    )
+
+    gen = _gen_dir(tmp_path, 1)
+    gen.mkdir()
+    vectors = np.eye(4, dtype=np.float32)
+    vectors[1] = [0.9, 0.1, 0, 0]
+    _append_rows(gen, [10, 11], vectors[:2], ["alpha", "beta"])
+    _append_rows(gen, [12, 13], vectors[2:], ["gamma", "délta"])
+    _append_tombstones(gen, [10])
+    _write_meta(
+        tmp_path,
+        {
+            "generation": 1,
+            "count": 4,
+            "dim": 4,
+            "deleted": 1,
+            "text_bytes": (gen / "texts.bin").stat().st_size,
+        },
+    )
+
+    index = LocalVectorIndex(tmp_path)
+    results = index.search(np.array([1, 0, 0, 0.1], dtype=np.float32), k=2)
+    assert [cid for cid, _, _ in results] == [11, 13]
+    assert results[0][1] == "beta"
+    assert results[1][1] == "délta"
+    assert results[0][2] > results[1][2]
+
+
+def test_retrieve_many_embeds_and_searches_once(monkeypatch):
+    import numpy as np
+
+    from rag import query_cache
+    from rag.settings import RAGSettings
+
+    calls = {"embed": 0, "search": 0}
+
+    def fake_embed(texts, model=None):
+        calls["embed"] += 1
+        return np.ones((len(texts), 3), dtype=np.float32)
+
+    def fake_search_many(_s, _settings, embeddings, k, filters=None):
+        calls["search"] += 1
+        return [
+            [(1, "refund policy", 0.9), (2, "shipping times", 0.8)],
+            [
+                (3, "password rotation", 0.7),
+                (4, "password length policy", 0.6),
+                (5, "log retention", 0.5),
+            ],
+        ][: len(embeddings)]
+
+    class _Session:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(query_cache, "embed_texts", fake_embed)
+    query_cache._cache_for.cache_clear()
+    monkeypatch.setattr(retriever, "vector_search_many", fake_search_many)
+    monkeypatch.setattr(retriever, "read_session", _Session)
+    monkeypatch.setattr(retriever, "get_rag_settings", lambda: RAGSettings(bm25_enable=False))
+
+    results = retriever.retrieve_many(["refund", "password length"], top_k=1)
+    assert calls == {"embed": 1, "search": 1}
+    assert [[meta["chunk_id"] for _, _, meta in hits] for hits in results] == [[1], [3]]
+
+    # BM25 fusion lets the lexical match win the second query.
+    monkeypatch.setattr(retriever, "get_rag_settings", lambda: RAGSettings(bm25_enable=True))
+    results = retriever.retrieve_many(["refund", "password length"], top_k=1)
+    assert [[meta["chunk_id"] for _, _, meta in hits] for hits in results] == [[1], [4]]
+
+
+def test_hierarchical_retrieval_searches_chunks_of_top_summaries(monkeypatch):
+    import numpy as np
+
+    from rag import query_cache
+    from rag.filters import RetrievalFilters
+    from rag.settings import RAGSettings
+
+    seen = {}
+
+    def fake_summary_search(_s, _settings, embeddings, k, filters=None):
+        seen["summary_k"] = k
+        return [[(7, "GDPR programme overview", 0.9), (3, "Retention policy", 0.8)]][
+            : len(embeddings)
+        ]
+
+    def fake_search_many(_s, _settings, embeddings, k, filters=None):
+        seen["filters"] = filters
+        return [[(70, "lawful basis register", 0.8)]]
+
+    class _Session:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(
+        query_cache, "embed_texts", lambda texts, model=None: np.ones((len(texts), 3), np.float32)
+    )
+    query_cache._cache_for.cache_clear()
+    monkeypatch.setattr(retriever, "summary_search_many", fake_summary_search)
+    monkeypatch.setattr(retriever, "vector_search_many", fake_search_many)
+    monkeypatch.setattr(retriever, "read_session", _Session)
+    monkeypatch.setattr(
+        retriever, "get_rag_settings", lambda: RAGSettings(bm25_enable=False, summary_top_docs=2)
+    )
+
+    filters = RetrievalFilters(frameworks=["gdpr"])
+    hits = retriever.retrieve_many(["gdpr posture"], top_k=1, filters=filters, mode="hierarchical")[
+        0
+    ]
+    assert seen["summary_k"] == 2
+    assert seen["filters"].document_ids == [3, 7] and seen["filters"].frameworks == ["gdpr"]
+    assert filters.document_ids is None
+    assert hits[0][2]["chunk_id"] == 70
+
+    hits = retriever.retrieve_many(["gdpr posture"], top_k=1, mode="summary")[0]
+    assert hits == [("GDPR programme overview", 0.9, {"document_id": 7, "source": "summary"})]
+
+    with pytest.raises(ValueError):
+        retriever.retrieve_many(["gdpr posture"], mode="tree")
+
+
+def test_hierarchical_batch_searches_each_query_in_its_own_documents(monkeypatch):
+    import numpy as np
+
+    from rag import query_cache
+    from rag.settings import RAGSettings
+
+    # Each query's summaries select a different document.
+    summaries = {1.0: [(1, "Access control policy", 0.9)], 2.0: [(2, "Vendor contract", 0.9)]}
+    chunks = {1: (10, "access reviews are quarterly"), 2: (20, "vendor may terminate")}
+    searches = []
+
+    def fake_summary_search(_s, _settings, embeddings, k, filters=None):
+        return [summaries[float(e[0])] for e in embeddings]
+
+    def fake_search_many(_s, _settings, embeddings, k, filters=None):
+        searches.append((len(embeddings), filters.document_ids))
+        # The chunk ranking ignores the query: only the document filter decides the hits.
+        return [[(*chunks[d], 0.5) for d in filters.document_ids] for _ in embeddings]
+
+    class _Session:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+    def fake_embed(texts, model=None):
+        return np.array([[1.0 if "access" in t else 2.0, 0, 0] for t in texts], np.float32)
+
+    monkeypatch.setattr(query_cache, "embed_texts", fake_embed)
+    query_cache._cache_for.cache_clear()
+    monkeypatch.setattr(retriever, "summary_search_many", fake_summary_search)
+    monkeypatch.setattr(retriever, "vector_search_many", fake_search_many)
+    monkeypatch.setattr(retriever, "read_session", _Session)
+    monkeypatch.setattr(retriever, "get_rag_settings", lambda: RAGSettings(bm25_enable=False))
+
+    queries = ["access reviews", "vendor termination"]
+    batched = retriever.retrieve_many(queries, top_k=5, mode="hierarchical")
+    assert [[h[2]["chunk_id"] for h in hits] for hits in batched] == [[10], [20]]
+    assert sorted(searches) == [(1, [1]), (1, [2])]
+    single = [retriever.retrieve_many([q], top_k=5, mode="hierarchical")[0] for q in queries]
+    assert batched == single
+
+
+def test_filters_are_pushed_into_the_index_scan():
+    from rag.filters import RetrievalFilters
+    from rag.settings import RAGSettings
+    from rag.vector_index import index_ddl, search_sql
+
+    filters = RetrievalFilters(document_ids=[3, 4], frameworks=["gdpr"], approved_only=True)
+    where, params = filters.to_sql()
+    assert params == {"f_document_ids": [3, 4], "f_frameworks": ["GDPR"]}
+    # The literal predicate lets Postgres pick the partial approved-only index.
+    assert "doc_status = 'APPROVED'" in where
+    assert index_ddl(RAGSettings(vector_storage="full"), approved_only=True).endswith(
+        "WHERE doc_status = 'APPROVED'"
+    )
+
+    sql = search_sql(RAGSettings(vector_storage="binary"), where=where)
+    inner = sql[sql.index("FROM (") : sql.index(") AS candidates")]
+    assert where in inner and "LIMIT :candidates" in inner
+    assert RetrievalFilters().is_empty()
+
+
+def test_query_embedding_cache_skips_api_for_repeated_queries(monkeypatch):
+    import numpy as np
+
+    from rag import query_cache
+
+    embedded = []
+
+    def fake_embed(texts, model=None):
+        embedded.extend(texts)
+        return np.arange(len(texts) * 2, dtype=np.float32).reshape(len(texts), 2)
+
+    monkeypatch.setattr(query_cache, "embed_texts", fake_embed)
+    cache = query_cache.QueryEmbeddingCache(max_entries=2, ttl_seconds=60)
+
+    first = cache.embed(["What is  our refund policy?", "password rules"])
+    again = cache.embed(["What is our refund policy? ", "What is our refund policy?"])
+    assert embedded == ["What is our refund policy?", "password rules"]
+    assert again.shape == (2, 2)
+    assert np.array_equal(again[0], first[0]) and np.array_equal(again[1], first[0])
+
+    cache.embed(["a", "b"])  # evicts the LRU entries
+    cache.embed(["password rules"])
+    assert embedded[-1] == "password rules"
+
+
+def test_rerank_stage_reorders_caches_and_falls_back(monkeypatch):
+    import threading
+
+    import numpy as np
+
+    from rag.rerank import Reranker, RerankStage
+    from rag.settings import RAGSettings
+
+    release = threading.Event()
+
+    class LengthReranker(Reranker):
+        calls = 0
+
+        def score_pairs(self, pairs):
+            LengthReranker.calls += 1
+            if any("slow" in text for _, text in pairs):
+                release.wait(5)
+            return np.array([len(text) for _, text in pairs], dtype=np.float32)
+
+    settings = RAGSettings(rerank_budget_ms=50, rerank_cache_size=100)
+    stage = RerankStage(LengthReranker(settings), settings)
+    fused = [
+        [("a", 0.9, {"chunk_id": 1}), ("ccc", 0.8, {"chunk_id": 2}), ("bb", 0.7, {"chunk_id": 3})]
+    ]
+
+    ranked = stage.rerank(["q"], fused, top_k=2)
+    assert [meta["chunk_id"] for _, _, meta in ranked[0]] == [2, 3]
+    assert ranked[0][0][2]["rerank_score"] == 3.0
+    stage.rerank(["q"], fused, top_k=2)
+    assert LengthReranker.calls == 1
+
+    slow = [[("x", 0.9, {"chunk_id": 7}), ("slow passage", 0.5, {"chunk_id": 8})]]
+    fallback = stage.rerank(["other"], slow, top_k=1)
+    assert [meta["chunk_id"] for _, _, meta in fallback[0]] == [7]
+
+    # While the timed-out batch still runs, new uncached pairs fall back without queueing.
+    calls = LengthReranker.calls
+    busy = stage.rerank(["third"], fused, top_k=1)
+    assert [meta["chunk_id"] for _, _, meta in busy[0]] == [1]
+    assert LengthReranker.calls == calls
+    # Cached pairs are still reranked while it runs.
+    assert [meta["chunk_id"] for _, _, meta in stage.rerank(["q"], fused, top_k=1)[0]] == [2]
+
+    release.set()
+    stage._executor.submit(lambda: None).result(timeout=5)
+    assert [meta["chunk_id"] for _, _, meta in stage.rerank(["third"], fused, top_k=1)[0]] == [2]
+
+
+def test_local_index_sync_drops_rows_of_an_uncommitted_sync(tmp_path, monkeypatch):
+    import contextlib
+    from datetime import datetime
+    from types import SimpleNamespace
+
+    import numpy as np
+
+    from rag import db, local_index
+    from rag.local_index import LocalVectorIndex, _append_rows, _gen_dir, _sync_incremental
+
+    gen = _gen_dir(tmp_path, 1)
+    gen.mkdir()
+    vectors = np.eye(3, dtype=np.float32)
+    _append_rows(gen, [1], vectors[:1], ["one"])
+    meta = {"generation": 1, "count": 1, "dim": 3, "hwm_id": 1, "deleted": 0, "text_bytes": 3}
+    # A failed sync appended row 2 but never wrote meta.json.
+    _append_rows(gen, [2], vectors[1:2], ["two-orphan"])
+
+    def stream(_s, where, params):
+        yield [2, 3], vectors[1:], ["two", "three"], datetime(2026, 1, 1)
+
+    class _Session:
+        def execute(self, *args, **kwargs):
+            return SimpleNamespace(fetchall=lambda: [])
+
+    monkeypatch.setattr(local_index, "_stream_chunks", stream)
+    monkeypatch.setattr(db, "db_session", lambda: contextlib.nullcontext(_Session()))
+    meta = _sync_incremental(tmp_path, meta)
+    local_index._write_meta(tmp_path, meta)
+
+    assert meta["count"] == 3 and meta["text_bytes"] == len("onetwothree")
+    index = LocalVectorIndex(tmp_path)
+    assert [index._text(r) for r in range(3)] == ["one", "two", "three"]
+    assert list(index._ids) == [1, 2, 3]
+
+
+def test_local_index_graph_excludes_tombstones_with_fixed_k(tmp_path, monkeypatch):
+    from types import SimpleNamespace
+
+    import numpy as np
+
+    from rag import local_index
+    from rag.local_index import (
+        LocalVectorIndex,
+        _append_rows,
+        _append_tombstones,
+        _gen_dir,
+        _write_meta,
+    )
+
+    calls = {"ef": [], "k": []}
+
+    class FakeGraph:
+        def __init__(self, space, dim):
+            self.deleted = set()
+
+        def load_index(self, path, max_elements):
+            self.vectors = np.memmap(
+                _gen_dir(tmp_path, 1) / "vectors.f32",
+                dtype="<f4",
+                mode="r",
+                shape=(max_elements, 4),
+            )
+
+        def mark_deleted(self, label):
+            self.deleted.add(label)
+
+        def set_ef(self, ef):
+            calls["ef"].append(ef)
+
+        def knn_query(self, q, k):
+            calls["k"].append(k)
+            scores = q @ self.vectors.T
+            scores[:, sorted(self.deleted)] = -np.inf
+            labels = np.argsort(-scores, axis=1)[:, :k]
+            return labels, 1.0 - np.take_along_axis(scores, labels, axis=1)
+
+    monkeypatch.setattr(local_index, "hnswlib", SimpleNamespace(Index=FakeGraph))
+    gen = _gen_dir(tmp_path, 1)
+    gen.mkdir()
+    vectors = np.eye(4, dtype=np.float32)
+    _append_rows(gen, [10, 11, 12, 13], vectors, ["a", "b", "c", "d"])
+    _append_tombstones(gen, [10, 11])
+    (gen / "hnsw.bin").write_bytes(b"")
+    text_bytes = (gen / "texts.bin").stat().st_size
+    _write_meta(
+        tmp_path,
+        {
+            "generation": 1,
+            "count": 4,
+            "dim": 4,
+            "deleted": 2,
+            "hnsw_count": 4,
+            "text_bytes": text_bytes,
+        },
+    )
+
+    index = LocalVectorIndex(tmp_path)
+    assert index._graph.deleted == {0, 1}
+    results = index.search(np.array([1, 0.5, 0.2, 0.1], dtype=np.float32), k=1)
+    assert [cid for cid, _, _ in results] == [12]
+    assert calls == {"ef": [64], "k": [1]}
+
+
+def test_reranker_without_score_pairs_cannot_be_built():
+    from rag.rerank import Reranker
+    from rag.settings import RAGSettings
+
+    class Incomplete(Reranker):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete(RAGSettings())
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from rag.settings import RAGSettings
+from rag.singleflight import coalesce, request_key
+
+
+def test_concurrent_identical_requests_share_one_call():
+    settings = RAGSettings(coalesce_enable=True, coalesce_redis=False)
+    calls = []
+    results = []
+
+    def slow_answer():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"answer": "42"}
+
+    def ask(question):
+        results.append(coalesce("test", request_key(question), slow_answer, settings))
+
+    threads = [
+        threading.Thread(target=ask, args=(q,))
+        for q in ["What is X?", "what  is x?", "What is X? "]
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [{"answer": "42"}] * 3
+    assert request_key("What is X?") != request_key("What is Y?")
+
+
+class _FakeLock:
+    def acquire(self, blocking=True):
+        return True
+
+    def release(self):
+        pass
+
+
+class _FakePubSub:
+    def subscribe(self, *channels):
+        pass
+
+    def close(self):
+        pass
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.published = []
+
+    def pubsub(self, **kwargs):
+        return _FakePubSub()
+
+    def lock(self, name, timeout=None):
+        return _FakeLock()
+
+    def set(self, name, value, ex=None):
+        self.published.append(name)
+
+    def publish(self, channel, message):
+        self.published.append(channel)
+
+
+def test_redis_leader_returns_unserializable_result_without_publishing(monkeypatch):
+    import rag.worker
+
+    fake = _FakeRedis()
+    monkeypatch.setattr(rag.worker, "get_redis", lambda: fake)
+    settings = RAGSettings(coalesce_enable=True, coalesce_redis=True)
+    result = {"at": object()}
+
+    assert coalesce("test", request_key("odd"), lambda: result, settings) is result
+    assert fake.published == []
+
+    answer = coalesce("test", request_key("plain"), lambda: {"answer": "42"}, settings)
+    assert answer == {"answer": "42"}
+    assert len(fake.published) == 2
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import contextlib
+from types import SimpleNamespace
+
+import rag.worker as worker
+from rag.worker import BatchIngestWorker, BatchTimeout
+
+
+class _Job:
+    def __init__(self, job_id, success_callback=None):
+        self.id = job_id
+        self.args = (f"{job_id}.txt", b"data")
+        self.kwargs = {}
+        self.timeout = 600
+        self.success_callback_timeout = 60
+        self.failure_callback_timeout = 60
+        self.started_at = self.ended_at = None
+        self.callbacks = []
+        self._success_callback = success_callback
+
+    def execute_success_callback(self, death_penalty_class, result):
+        if self._success_callback:
+            self._success_callback(result)
+        self.callbacks.append(("success", result))
+
+    def execute_failure_callback(self, death_penalty_class, *exc_info):
+        self.callbacks.append(("failure", exc_info[1]))
+
+
+def _executions(jobs):
+    return {job.id: job.id for job in jobs}
+
+
+def _worker(monkeypatch, results):
+    w = BatchIngestWorker.__new__(BatchIngestWorker)
+    w.queues = [object()]
+    w.death_penalty_class = lambda *a, **k: contextlib.nullcontext()
+    calls = {"prepare": [], "success": [], "failure": []}
+
+    def prepare_job_execution(job, remove_from_intermediate_queue=False):
+        calls["prepare"].append((job.id, remove_from_intermediate_queue))
+
+    w.prepare_job_execution = prepare_job_execution
+    w.handle_execution_ended = lambda job, queue, ttl: setattr(job, "ended_at", worker.now())
+    w.handle_job_success = lambda job, **kwargs: calls["success"].append(job.id)
+    w.handle_job_failure = lambda job, **kwargs: calls["failure"].append(job.id)
+    w.handle_exception = lambda job, *exc_info: None
+    monkeypatch.setattr(worker, "IngestCheckpoint", lambda job: None)
+    monkeypatch.setattr(worker, "observe_ingest_job", lambda *a: None)
+    monkeypatch.setattr(worker, "enqueue_summaries", lambda ids: None)
+    monkeypatch.setattr(worker, "ingest_many", results)
+    return w, calls
+
+
+def test_batch_removes_only_the_head_job_from_the_intermediate_queue(monkeypatch):
+    w, calls = _worker(monkeypatch, lambda items, ckpts: [1, ValueError("bad")])
+    jobs = [_Job("a"), _Job("b")]
+    w._perform_batch(jobs, SimpleNamespace(started_job_registry=None), _executions(jobs))
+    assert calls["prepare"] == [("a", True), ("b", False)]
+    assert calls["success"] == ["a"] and calls["failure"] == ["b"]
+    assert jobs[0].callbacks == [("success", 1)]
+    assert jobs[1].callbacks[0][0] == "failure"
+
+
+def test_failing_success_callback_fails_the_job(monkeypatch):
+    def callback(result):
+        raise RuntimeError("callback broke")
+
+    w, calls = _worker(monkeypatch, lambda items, ckpts: [1])
+    jobs = [_Job("a", callback)]
+    w._perform_batch(jobs, SimpleNamespace(started_job_registry=None), _executions(jobs))
+    assert calls["failure"] == ["a"] and not calls["success"]
+
+
+def test_batch_timeout_fails_every_job(monkeypatch):
+    def slow(items, ckpts):
+        raise BatchTimeout("Task exceeded maximum timeout value (600 seconds)")
+
+    w, calls = _worker(monkeypatch, slow)
+    jobs = [_Job("a"), _Job("b")]
+    w._perform_batch(jobs, SimpleNamespace(started_job_registry=None), _executions(jobs))
+    assert calls["failure"] == ["a", "b"]
+    assert isinstance(jobs[0].callbacks[0][1], worker.JobTimeoutException)
+
+
+def test_popped_jobs_are_registered_before_the_batch_runs(monkeypatch):
+    jobs = {job_id: _Job(job_id) for job_id in ("a", "b", "c", "d")}
+    for job in jobs.values():
+        job.func_name = worker.INGEST_FUNC_NAME
+    jobs["c"].timeout = 30
+    pending = ["b", "c", "d"]
+    pushed = []
+    queue = SimpleNamespace(
+        pop_job_id=lambda: pending.pop(0) if pending else None,
+        push_job_id=lambda job_id, at_front=False: pushed.append((job_id, at_front)),
+    )
+    w = BatchIngestWorker.__new__(BatchIngestWorker)
+    w.connection = None
+    registered = []
+    w.prepare_execution = lambda job: registered.append(job.id) or f"exec-{job.id}"
+    w.set_state = lambda state: None
+    ran = []
+    w._perform_batch = lambda batch, q, executions: ran.append(
+        ([job.id for job in batch], dict(executions), list(registered))
+    )
+    monkeypatch.setattr(worker.Job, "fetch", lambda job_id, connection=None: jobs[job_id])
+    monkeypatch.setattr(worker, "get_rag_settings", lambda: SimpleNamespace(worker_batch_jobs=8))
+
+    w.execute_job(jobs["a"], queue)
+
+    # "c" has another timeout: it goes back to the front and ends the batch before "d".
+    assert pushed == [("c", True)] and pending == ["d"]
+    assert ran == [(["a", "b"], {"a": "exec-a", "b": "exec-b"}, ["a", "b"])]
+
+
+def test_redis_clients_share_one_connection_pool(monkeypatch):
+    settings = SimpleNamespace(redis_url="redis://cache.internal:6380/2", redis_max_connections=7)
+    monkeypatch.setattr(worker, "get_rag_settings", lambda: settings)
+    worker._redis_pool.cache_clear()
+    try:
+        first, second = worker.get_redis(), worker.get_redis()
+        assert first.connection_pool is second.connection_pool
+        assert first.connection_pool.max_connections == 7
+        assert first.connection_pool.connection_kwargs["host"] == "cache.internal"
+        assert worker.get_queue().connection.connection_pool is first.connection_pool
+    finally:
+        worker._redis_pool.cache_clear()
+
+
+class _Registry:
+    def __init__(self, count):
+        self.count = count
+
+
+class _FakeQueue:
+    """The parts of an rq Queue the collector reads, backed by in-memory state instead of Redis."""
+
+    def __init__(self, job_ids):
+        self.job_ids = job_ids
+        self.count = len(job_ids)
+        self.started_job_registry = _Registry(2)
+        self.failed_job_registry = _Registry(1)
+        self.deferred_job_registry = _Registry(0)
+        self.connection = None
+
+    def get_job_ids(self, start, end):
+        return self.job_ids[start : end + 1]
+
+
+def _samples(collector):
+    return {
+        (sample.name, tuple(sample.labels.values())): sample.value
+        for family in collector.collect()
+        for sample in family.samples
+    }
+
+
+def test_queue_collector_reports_depth_and_oldest_job_age(monkeypatch):
+    from datetime import timedelta
+
+    from rq.job import Job
+
+    from rag.metrics import QueueCollector
+
+    enqueued = worker.now() - timedelta(seconds=90)
+    monkeypatch.setattr(worker, "get_queue", lambda: _FakeQueue(["j1", "j2", "j3"]))
+    head = SimpleNamespace(enqueued_at=enqueued)
+    monkeypatch.setattr(Job, "fetch", staticmethod(lambda job_id, connection=None: head))
+    samples = _samples(QueueCollector())
+    assert samples[("rag_queue_up", ())] == 1
+    assert samples[("rag_queue_jobs", ("queued",))] == 3
+    assert samples[("rag_queue_jobs", ("started",))] == 2
+    assert samples[("rag_queue_jobs", ("failed",))] == 1
+    assert 89 <= samples[("rag_queue_oldest_job_age_seconds", ())] < 120
+
+
+def test_queue_collector_reports_down_when_redis_fails(monkeypatch):
+    from rag.metrics import QueueCollector
+
+    def unavailable():
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(worker, "get_queue", unavailable)
+    assert _samples(QueueCollector()) == {("rag_queue_up", ()): 0}